@@ -0,0 +1,301 @@
+# Mock_data/generate_data.py
+"""
+Seeded synthetic dataset generator, written in the data.json store format.
+
+Produces customers, a large menu, orders with realistic item mixes and
+timestamps, and feedback with sentiments. Records are streamed to disk one at
+a time (orders and feedback go through temporary section files that are
+appended at the end), so memory stays flat from 10^3 to 10^7 customers.
+
+The data is internally consistent: each customer's loyalty_points equal the
+points of their paid orders (1 point per ₦100, flagged points_awarded), and
+last_order_date / is_first_time match their orders. Order and feedback IDs
+are unique up to MAX_RECORDS (~4.2 billion) records of each kind.
+
+Usage (from the repo root):
+    python -m Mock_data.generate_data --customers 100000 --out data_100k.json
+    CRM_DATA_FILE=data_100k.json uvicorn api.index:app
+
+Same --seed, --end-date and options always give the same file.
+"""
+import argparse
+import bisect
+import datetime
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from Mock_data.mock_data import INITIAL_PROMOS, INITIAL_SITE_SETTINGS
+from services.ids import make_id, ID_EPOCH_MS, MAX_NODE, MAX_SEQ, NODE_BITS, SEQ_BITS
+
+FIRST_NAMES = [
+    "Bola", "Ada", "Chidi", "Tunde", "Ngozi", "Emeka", "Funke", "Yemi", "Kemi", "Ifeanyi",
+    "Amaka", "Segun", "Zainab", "Musa", "Halima", "Tobi", "Ify", "Femi", "Chioma", "Dayo",
+]
+LAST_NAMES = [
+    "Alade", "Okafor", "Adeyemi", "Bello", "Eze", "Ogunleye", "Nwosu", "Ibrahim", "Balogun", "Okonkwo",
+    "Abubakar", "Oladipo", "Afolabi", "Uche", "Danjuma", "Akinola", "Obi", "Lawal", "Ayodele", "Onyeka",
+]
+PREFERENCES = ["Chocolate", "No Nuts", "Coffee Lover", "Vegan", "Fruity", "Savory", "Party Packs", "Low Sugar"]
+
+# (category, base price ₦, ingredients) - flavours are combined with these to build the menu
+CATEGORIES = [
+    ("Cupcake", 850, ["Flour", "Butter", "Sugar"]),
+    ("Cake (6-inch)", 5500, ["Flour", "Butter", "Eggs"]),
+    ("Loaf", 3200, ["Flour", "Sugar"]),
+    ("Cookie Box", 1800, ["Flour", "Butter", "Brown Sugar"]),
+    ("Platter", 2500, ["Samosa", "Spring Roll", "Puff Puff"]),
+    ("Buns", 500, ["Flour", "Sugar", "Butter"]),
+    ("Brownie", 1200, ["Cocoa", "Butter"]),
+    ("Coffee", 1500, ["Coffee"]),
+]
+FLAVOURS = [
+    ("Red Velvet", ["Cream Cheese", "Cocoa"]), ("Chocolate", ["Dark Chocolate"]), ("Vanilla", ["Vanilla"]),
+    ("Lemon", ["Lemon"]), ("Strawberry", ["Strawberry"]), ("Coconut", ["Coconut"]), ("Banana", ["Banana"]),
+    ("Caramel", ["Caramel"]), ("Hazelnut", ["Nuts"]), ("Vegan Carrot", ["Carrot", "Vegan"]),
+    ("Coffee", ["Coffee"]), ("Salted Caramel", ["Caramel", "Salt"]),
+]
+
+# Share of orders in each state; older orders are mostly done
+ORDER_STATES = [
+    ("Completed", "Paid", 0.70),
+    ("Out for Delivery", "Paid", 0.05),
+    ("Ready for Delivery", "Paid", 0.05),
+    ("Processing", "Paid", 0.08),
+    ("Pending Payment", "Unpaid", 0.12),
+]
+SENTIMENTS = [
+    ("Positive", ["Loved the {item}!", "The {item} was perfect, thank you", "Great service as always"], 0.55),
+    ("Neutral", ["The {item} was okay", "Delivery was on time", "Could you add more flavours?"], 0.25),
+    ("Negative", ["My {item} arrived late", "The {item} was too sweet", "Packaging was damaged"], 0.17),
+    ("Crisis", ["I found something in my {item}!", "Wrong order delivered and nobody answers"], 0.03),
+]
+
+
+def build_menu(size: int, rng: random.Random) -> dict:
+    menu = {}
+    combos = [(f, c) for c in CATEGORIES for f in FLAVOURS]
+    for i in range(size):
+        (flavour, flavour_ingredients), (category, base_price, base_ingredients) = combos[i % len(combos)]
+        edition = i // len(combos)
+        name = f"{flavour} {category}" + (f" No. {edition + 1}" if edition else "")
+        price = round(base_price * rng.uniform(0.8, 1.4) / 50) * 50
+        item_id = f"P{i + 1:03d}"
+        menu[item_id] = {
+            "id": item_id,
+            "name": name,
+            "price": float(price),
+            "category": category,
+            "ingredients": flavour_ingredients + base_ingredients,
+            "is_available": rng.random() > 0.1,
+            "image_url": "",
+            "loyalty_points": int(price / 100),
+        }
+    return menu
+
+
+def _weighted(rng: random.Random, table: list):
+    """Picks a row of `table`, whose last column is its probability."""
+    roll = rng.random()
+    for row in table:
+        roll -= row[-1]
+        if roll <= 0:
+            return row
+    return table[-1]
+
+
+class _SectionWriter:
+    """Writes `"key": value` pairs of one JSON object (or the items of a list) as they come."""
+
+    def __init__(self, f, is_list: bool = False):
+        self.f = f
+        self.is_list = is_list
+        self.first = True
+
+    def add(self, value, key: str = None):
+        self.f.write("\n" if self.first else ",\n")
+        self.first = False
+        if not self.is_list:
+            self.f.write(json.dumps(key) + ": ")
+        self.f.write(json.dumps(value, ensure_ascii=False))
+
+
+def generate(out_path: str, customers: int, menu_size: int, orders_per_customer: float,
+             feedback_rate: float, days: int, seed: int, end_date: datetime.date = None,
+             progress: bool = True) -> dict:
+    rng = random.Random(seed)
+    menu = build_menu(menu_size, rng)
+    menu_ids = list(menu)
+    # Zipf-like popularity: a few best sellers, a long tail
+    popularity = [1.0 / (rank + 1) ** 1.1 for rank in range(len(menu_ids))]
+    rng.shuffle(popularity)
+    cumulative, total = [], 0.0
+    for weight in popularity:
+        total += weight
+        cumulative.append(total)
+
+    # History ends at midnight of end_date so a given seed gives the same file all day
+    now = datetime.datetime.combine(end_date or datetime.date.today(), datetime.time())
+    start = now - datetime.timedelta(days=days)
+    # IDs can't encode earlier times (services.ids); fail before writing anything
+    if start.timestamp() * 1000 < ID_EPOCH_MS:
+        raise ValueError(f"history can't start before {datetime.datetime.fromtimestamp(ID_EPOCH_MS / 1000):%Y-%m-%d}: "
+                         f"use fewer --days or a later --end-date")
+    span_seconds = days * 86400
+    counts = {"customers": 0, "orders": 0, "feedback": 0}
+    order_seq = 0
+    feedback_seq = 0
+
+    workdir = tempfile.mkdtemp(prefix="crm-gen-", dir=os.path.dirname(os.path.abspath(out_path)))
+    orders_path = os.path.join(workdir, "orders.part")
+    feedback_path = os.path.join(workdir, "feedback.part")
+    started = time.perf_counter()
+    try:
+        with open(out_path, "w", encoding="utf-8") as out, \
+                open(orders_path, "w", encoding="utf-8") as orders_f, \
+                open(feedback_path, "w", encoding="utf-8") as feedback_f:
+            out.write('{"customers": {')
+            customers_w = _SectionWriter(out)
+            orders_w = _SectionWriter(orders_f)
+            feedback_w = _SectionWriter(feedback_f, is_list=True)
+
+            for i in range(customers):
+                customer_id = str(8000000000 + i)
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                joined = start + datetime.timedelta(seconds=rng.randrange(span_seconds))
+                # Geometric order counts: many one-off buyers, some regulars
+                n_orders = int(math.log(1 - rng.random()) / math.log(1 - 1 / (orders_per_customer + 1))) if orders_per_customer > 0 else 0
+                points, last_order = 0, None
+
+                for _ in range(n_orders):
+                    order_seq += 1
+                    offset = rng.randrange(max(int((now - joined).total_seconds()), 1))
+                    placed = joined + datetime.timedelta(seconds=offset)
+                    lines = {}
+                    for _ in range(1 + int(rng.expovariate(1.2))):
+                        idx = min(bisect.bisect_left(cumulative, rng.random() * total), len(menu_ids) - 1)
+                        item_id = menu_ids[idx]
+                        lines[item_id] = lines.get(item_id, 0) + rng.choice((1, 1, 1, 2, 2, 3, 6, 12))
+                    items = [{"item_id": item_id, "name": menu[item_id]["name"], "quantity": qty,
+                              "price_at_order": menu[item_id]["price"]} for item_id, qty in lines.items()]
+                    order_total = sum(it["price_at_order"] * it["quantity"] for it in items)
+                    status, payment, _ = _weighted(rng, ORDER_STATES)
+                    # Same layout as live IDs, so generated history range-scans like real orders
+                    order_id = _record_id("O", placed, order_seq)
+                    order = {
+                        "id": order_id,
+                        "customer_id": customer_id,
+                        "items": items,
+                        "status": status,
+                        "payment_status": payment,
+                        "timestamp": placed.isoformat(),
+                        "subtotal": order_total,
+                        "discount": 0.0,
+                        "promo_id": None,
+                        "total": order_total,
+                    }
+                    if payment == "Paid":
+                        order["points_awarded"] = True
+                        points += int(order_total / 100)
+                    orders_w.add(order, order_id)
+                    counts["orders"] += 1
+                    last_order = placed if last_order is None or placed > last_order else last_order
+
+                    if rng.random() < feedback_rate:
+                        feedback_seq += 1
+                        sentiment, templates, _ = _weighted(rng, SENTIMENTS)
+                        logged = placed + datetime.timedelta(hours=rng.uniform(1, 48))
+                        feedback_w.add({
+                            "log_id": _record_id("L", logged, feedback_seq),
+                            "timestamp": logged.isoformat(timespec="seconds"),
+                            "user_id": customer_id,
+                            "message": rng.choice(templates).format(item=items[0]["name"]),
+                            "sentiment": sentiment,
+                        })
+                        counts["feedback"] += 1
+
+                customers_w.add({
+                    "id": customer_id,
+                    "name": f"{first} {last}",
+                    "email": f"{first}.{last}{i}@example.com".lower(),
+                    "preferences": rng.sample(PREFERENCES, rng.randint(0, 3)),
+                    "loyalty_points": points,
+                    "last_order_date": last_order.isoformat() if last_order else None,
+                    "is_first_time": n_orders == 0,
+                }, customer_id)
+                counts["customers"] += 1
+
+                if progress and (i + 1) % 100000 == 0:
+                    print(f"  {i + 1:,} customers, {counts['orders']:,} orders ({time.perf_counter() - started:.0f}s)", file=sys.stderr)
+
+            # NEW_USER is the template identify_user_node copies for unknown ids
+            customers_w.add({"id": "NEW_USER", "name": "New Customer", "email": "", "preferences": [],
+                             "loyalty_points": 0, "last_order_date": None, "is_first_time": True}, "NEW_USER")
+            out.write('\n},\n"menu": ')
+            json.dump(menu, out, ensure_ascii=False)
+
+        # Append the streamed sections
+        with open(out_path, "a", encoding="utf-8") as out:
+            out.write(',\n"orders": {')
+            with open(orders_path, "r", encoding="utf-8") as part:
+                shutil.copyfileobj(part, out)
+            out.write('\n},\n"feedback": [')
+            with open(feedback_path, "r", encoding="utf-8") as part:
+                shutil.copyfileobj(part, out)
+            out.write('\n],\n"promos": ')
+            json.dump(INITIAL_PROMOS, out, ensure_ascii=False)
+            out.write(',\n"site_settings": ')
+            json.dump(INITIAL_SITE_SETTINGS, out, ensure_ascii=False)
+            out.write("\n}\n")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    counts["menu"] = len(menu)
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    counts["bytes"] = os.path.getsize(out_path)
+    return counts
+
+
+# A generated ID carries its record counter in the node and sequence bits and, above
+# those, in the millisecond within its second, so IDs stay unique up to this many records
+MAX_RECORDS = 1000 << (NODE_BITS + SEQ_BITS)
+
+
+def _record_id(prefix: str, moment: datetime.datetime, counter: int) -> str:
+    """Time-sortable ID for the counter-th generated record of its kind, placed at `moment`."""
+    if counter >= MAX_RECORDS:
+        raise ValueError(f"more than {MAX_RECORDS:,} records of one kind can't get unique IDs")
+    ms = int(moment.timestamp()) * 1000 + (counter >> (NODE_BITS + SEQ_BITS))
+    return make_id(prefix, ms, (counter >> SEQ_BITS) & MAX_NODE, counter & MAX_SEQ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--orders-per-customer", type=float, default=3.0, help="mean of a geometric distribution")
+    parser.add_argument("--feedback-rate", type=float, default=0.1, help="share of orders that get feedback")
+    parser.add_argument("--days", type=int, default=365, help="history length")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=None,
+                        help="last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--out", default="data_generated.json")
+    args = parser.parse_args()
+
+    try:
+        counts = generate(args.out, args.customers, args.menu_size, args.orders_per_customer,
+                          args.feedback_rate, args.days, args.seed, args.end_date)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Wrote {args.out}: {counts['customers']:,} customers, {counts['orders']:,} orders, "
+          f"{counts['feedback']:,} feedback, {counts['menu']} menu items "
+          f"({counts['bytes'] / 1e6:.1f} MB in {counts['seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
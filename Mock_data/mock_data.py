@@ -2,10 +2,13 @@
 import json
 import os
 import datetime
+import threading
 from typing import Dict, List
 
-# File to persist data
-DATA_FILE = "data.json"
+from config import CRM_CONFIG
+
+# File to persist data (CRM_DATA_FILE points load tests and benchmarks at a scratch copy)
+DATA_FILE = os.getenv("CRM_DATA_FILE", "data.json")
 
 def load_data():
     if not os.path.exists(DATA_FILE):
@@ -16,12 +19,29 @@ def load_data():
     except:
         return None
 
+_SAVE_LOCK = threading.Lock()
+
 def save_data(data):
     # Convert datetime objects to string for JSON serialization
     # This is a simple recursive helper if needed, but for now we just save the global dicts
     # We will assume the structure passed in is JSON-serializable (strings/ints/lists/dicts)
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    with _SAVE_LOCK:
+        # Other threads keep inserting while we serialize: work from shallow copies
+        # (copying a dict/list is atomic under the GIL) and retry if a record
+        # itself changed mid-dump.
+        for attempt in range(3):
+            try:
+                snapshot = {k: (dict(v) if isinstance(v, dict) else list(v) if isinstance(v, list) else v) for k, v in data.items()}
+                text = json.dumps(snapshot, indent=4)
+                break
+            except RuntimeError:
+                if attempt == 2:
+                    raise
+        # Write then rename, so readers never see a half-written file
+        tmp_path = f"{DATA_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, DATA_FILE)
 
 # --- INITIAL MOCK DATA (Fallback) ---
 INITIAL_CUSTOMERS = {
@@ -113,14 +133,19 @@ INITIAL_PROMOS = [
         "name": "Loyalty 10% Off",
         "description": "10% off any order over ₦5000 for loyalty members.",
         "target_tags": ["High Loyalty"],
-        "active": True
+        "active": True,
+        # Machine-readable conditions, evaluated by services.promotions
+        "rules": {"min_total": 5000, "loyalty_tier": "Silver"},
+        "discount": {"type": "percent", "value": 10}
     },
     {
         "id": "S002", 
         "name": "New Customer Free Coffee",
         "description": "Get a free Cold Brew with your first order.",
         "target_tags": ["New Customer"],
-        "active": True
+        "active": True,
+        "rules": {"first_order": True},
+        "discount": {"type": "free_item", "item": "Cold Brew"}
     },
 ]
 
@@ -136,44 +161,67 @@ INITIAL_SITE_SETTINGS = {
     "contact_email": "hello@ellascupcakery.com",
     "contact_instagram": "@ellas_cupcakery",
     "contact_whatsapp": "+2348012345678",
-    "contact_facebook": ""
+    "contact_facebook": "",
+    # Delivery capacity (services.delivery_slots)
+    "delivery_windows": ["10:00–12:00", "12:00–14:00", "14:00–16:00", "16:00–18:00"],
+    "delivery_riders": 2,
+    "delivery_orders_per_rider": 4,
+    "oven_units_per_window": 60,
+    "delivery_days_ahead": 30,
+    "delivery_same_day_cutoff": "12:00"
 }
 
 # --- LOAD OR INIT DATA ---
-loaded = load_data()
-
-if loaded:
-    MOCK_CUSTOMER_DB = loaded.get("customers", INITIAL_CUSTOMERS)
-    MOCK_MENU_DB = loaded.get("menu", INITIAL_MENU)
-    MOCK_ORDER_DB = loaded.get("orders", INITIAL_ORDERS)
-    MOCK_PROMO_DB = loaded.get("promos", INITIAL_PROMOS)
-    MOCK_FEEDBACK_LOG = loaded.get("feedback", [])
-    SITE_SETTINGS = loaded.get("site_settings", INITIAL_SITE_SETTINGS)
+def _initial_collections():
+    loaded = load_data()
+    if loaded:
+        return {
+            "customers": loaded.get("customers", INITIAL_CUSTOMERS),
+            "menu": loaded.get("menu", INITIAL_MENU),
+            "orders": loaded.get("orders", INITIAL_ORDERS),
+            "promos": loaded.get("promos", INITIAL_PROMOS),
+            "feedback": loaded.get("feedback", []),
+            "site_settings": loaded.get("site_settings", INITIAL_SITE_SETTINGS),
+        }
+    collections = {
+        "customers": INITIAL_CUSTOMERS,
+        "menu": INITIAL_MENU,
+        "orders": INITIAL_ORDERS,
+        "promos": INITIAL_PROMOS,
+        "feedback": [],
+        "site_settings": INITIAL_SITE_SETTINGS,
+    }
+    if STATE_STORE is None:
+        # Save immediately to create the file
+        save_data(collections)
+    return collections
+
+
+def state_db_path():
+    # Next to the data file by default, so scratch datasets get scratch databases
+    return CRM_CONFIG.STATE_DB_FILE or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "crm_state.sqlite3")
+
+
+# STATE_BACKEND=sqlite: records live in a database shared by every worker
+# (see Mock_data/state_store.py); data.json only seeds an empty database.
+STATE_STORE = None
+if CRM_CONFIG.STATE_BACKEND == "sqlite":
+    from Mock_data.state_store import SqliteStateStore
+    STATE_STORE = SqliteStateStore(state_db_path(), journal_mode=CRM_CONFIG.STATE_DB_JOURNAL_MODE)
+    COLLECTIONS = STATE_STORE.open(_initial_collections)
 else:
-    MOCK_CUSTOMER_DB = INITIAL_CUSTOMERS
-    MOCK_MENU_DB = INITIAL_MENU
-    MOCK_ORDER_DB = INITIAL_ORDERS
-    MOCK_PROMO_DB = INITIAL_PROMOS
-    MOCK_FEEDBACK_LOG = []
-    SITE_SETTINGS = INITIAL_SITE_SETTINGS
-    
-    # Save immediately to create the file
-    save_data({
-        "customers": MOCK_CUSTOMER_DB,
-        "menu": MOCK_MENU_DB,
-        "orders": MOCK_ORDER_DB,
-        "promos": MOCK_PROMO_DB,
-        "feedback": MOCK_FEEDBACK_LOG,
-        "site_settings": SITE_SETTINGS
-    })
+    COLLECTIONS = _initial_collections()
+
+MOCK_CUSTOMER_DB = COLLECTIONS["customers"]
+MOCK_MENU_DB = COLLECTIONS["menu"]
+MOCK_ORDER_DB = COLLECTIONS["orders"]
+MOCK_PROMO_DB = COLLECTIONS["promos"]
+MOCK_FEEDBACK_LOG = COLLECTIONS["feedback"]
+SITE_SETTINGS = COLLECTIONS["site_settings"]
 
 # --- HELPER TO SAVE ON UPDATES ---
 def persist_changes():
-    save_data({
-        "customers": MOCK_CUSTOMER_DB,
-        "menu": MOCK_MENU_DB,
-        "orders": MOCK_ORDER_DB,
-        "promos": MOCK_PROMO_DB,
-        "feedback": MOCK_FEEDBACK_LOG,
-        "site_settings": SITE_SETTINGS
-    })
+    if STATE_STORE is not None:
+        STATE_STORE.save(COLLECTIONS)
+        return
+    save_data(COLLECTIONS)
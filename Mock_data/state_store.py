@@ -0,0 +1,407 @@
+# Mock_data/state_store.py
+"""
+SQLite store that lets several processes share the mock DB.
+
+With STATE_BACKEND=sqlite every record of every collection (customers, menu,
+orders, promos, feedback, site_settings) is one row:
+
+    records(collection, id, data, version)     data NULL = deleted
+
+Each write bumps a global version in `meta` and stamps the rows it wrote with
+it, so a process catches up by reading `WHERE version > <last version seen>`.
+Checking for changes is a single-row read, cheap enough to do per request.
+
+Pulled rows are applied to the in-memory collections in place (records are
+updated, not replaced), so modules holding a reference to MOCK_ORDER_DB or to
+an order keep seeing current data. Changes are queued for
+services.shared_state, which publishes them as the usual events so derived
+views (stats, analytics, inventory, delivery slots) update incrementally.
+
+save() writes only records whose JSON changed since they were last written or
+pulled. transaction() takes the database write lock (BEGIN IMMEDIATE), pulls,
+and writes on exit, so a read-check-write sequence (stock, delivery capacity)
+sees every other process's committed changes and can't interleave with them.
+
+Chat sessions are shared through a small `sessions` table (see
+agents.session_store), and Idempotency-Key claims and stored responses through
+an `idempotency` table (see services.idempotency).
+
+Export a data.json snapshot:  python -m Mock_data.state_store --export data.json
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_version ON records (version);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, stamp INTEGER NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, response TEXT, expires REAL NOT NULL);
+"""
+
+# List collections are keyed by these fields (falling back to the position)
+LIST_ID_FIELDS = ("id", "log_id")
+SESSION_PRUNE_EVERY = 500
+IDEMPOTENCY_PRUNE_EVERY = 500
+
+
+def _record_id(value, index: int) -> str:
+    if isinstance(value, dict):
+        for field in LIST_ID_FIELDS:
+            if value.get(field):
+                return str(value[field])
+    return str(index)
+
+
+def _records(container):
+    """(id, value) pairs of a dict or list collection, from a copy safe against concurrent inserts."""
+    if isinstance(container, dict):
+        return list(container.items())
+    return [(_record_id(value, i), value) for i, value in enumerate(list(container))]
+
+
+def _dumps(value) -> str:
+    # A record another thread is mutating can fail mid-dump; try again
+    for attempt in range(3):
+        try:
+            return json.dumps(value, ensure_ascii=False)
+        except RuntimeError:
+            if attempt == 2:
+                raise
+
+
+class SqliteStateStore:
+    def __init__(self, path: str, journal_mode: str = "WAL", busy_timeout: float = 30.0):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.RLock()   # in-memory collections, _seen, _hashes, open transactions
+        self._seen = 0                   # highest version applied to memory
+        self._hashes = {}                # collection -> {id: hash of the JSON last written or pulled}
+        self._unpublished = []           # pulled changes not yet handed to services.shared_state
+        self._applying = None            # (collection, id) of the pulled row being applied
+        self._queue_lock = threading.Lock()
+        self._txn_depth = 0
+        self._txn_dirty = False
+        self._session_saves = 0
+        self._key_saves = 0
+
+    # --- Connections ---
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _db_version(self, conn) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    # --- Loading ---
+
+    def open(self, seed):
+        """Returns {collection: dict or list} from the database, filling it from `seed()` if it's empty."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                shapes = dict(conn.execute("SELECT substr(key, 7), value FROM meta WHERE key LIKE 'shape:%'"))
+                if not shapes:
+                    # First process against a new database (the others wait on the lock)
+                    collections = seed()
+                    conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                     [(f"shape:{name}", "list" if isinstance(c, list) else "dict") for name, c in collections.items()])
+                    self._write(conn, collections)
+                else:
+                    collections = {name: ([] if shape == "list" else {}) for name, shape in shapes.items()}
+                    for name, rid, data, version in conn.execute(
+                            "SELECT collection, id, data, version FROM records WHERE data IS NOT NULL ORDER BY version"):
+                        container = collections.get(name)
+                        if container is None:
+                            continue
+                        value = json.loads(data)
+                        if isinstance(container, list):
+                            container.append(value)
+                        else:
+                            container[rid] = value
+                        self._hashes.setdefault(name, {})[rid] = hash(data)
+                    self._seen = self._db_version(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return collections
+
+    # --- Writing ---
+
+    def _diff(self, collections: dict) -> list:
+        """Rows (collection, id, data or None) for records changed since last written or pulled."""
+        rows = []
+        for name, container in collections.items():
+            known = self._hashes.setdefault(name, {})
+            present = set()
+            for rid, value in _records(container):
+                present.add(rid)
+                text = _dumps(value)
+                if known.get(rid) != hash(text):
+                    rows.append((name, rid, text))
+            rows.extend((name, rid, None) for rid in known if rid not in present)
+        return rows
+
+    def _write(self, conn, collections: dict, rows: list = None) -> int:
+        rows = self._diff(collections) if rows is None else rows
+        if not rows:
+            return 0
+        version = self._db_version(conn) + 1
+        conn.executemany("INSERT OR REPLACE INTO records (collection, id, data, version) VALUES (?, ?, ?, ?)",
+                         [(name, rid, data, version) for name, rid, data in rows])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(version),))
+        for name, rid, data in rows:
+            known = self._hashes.setdefault(name, {})
+            if data is None:
+                known.pop(rid, None)
+            else:
+                known[rid] = hash(data)
+        # Only ever called with everything below `version` already pulled
+        self._seen = version
+        return len(rows)
+
+    def save(self, collections: dict):
+        """Writes changed records. Inside transaction() the write happens when it commits."""
+        with self._lock:
+            if self._txn_depth:
+                self._txn_dirty = True
+                return
+            conn = self._conn()
+            rows = self._diff(collections)
+            if not rows:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Catch up first so the version sequence has no gaps; our own
+                # unsaved edits win over concurrent changes to the same record
+                self._pull(conn, collections, skip={(name, rid) for name, rid, _ in rows})
+                self._write(conn, collections, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def transaction(self, collections: dict):
+        """Holds the database write lock: pulls on entry, writes changed records on exit."""
+        with self._lock:
+            if self._txn_depth:
+                self._txn_depth += 1
+                try:
+                    yield
+                finally:
+                    self._txn_depth -= 1
+                return
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            self._txn_depth, self._txn_dirty = 1, False
+            try:
+                self._pull(conn, collections)
+                yield
+                if self._txn_dirty:
+                    self._write(conn, collections)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._txn_depth = 0
+
+    # --- Reading other processes' changes ---
+
+    def pull(self, collections: dict, blocking: bool = True) -> bool:
+        """Applies changes committed by other processes. False if skipped (lock busy, blocking=False)."""
+        if not self._lock.acquire(blocking):
+            return False
+        try:
+            self._pull(self._conn(), collections)
+            return True
+        finally:
+            self._lock.release()
+
+    def _pull(self, conn, collections: dict, skip=()):
+        version = self._db_version(conn)
+        if version <= self._seen:
+            return
+        rows = conn.execute("SELECT collection, id, data FROM records WHERE version > ? ORDER BY version",
+                            (self._seen,)).fetchall()
+        for name, rid, data in rows:
+            container = collections.get(name)
+            if container is None or (name, rid) in skip:
+                continue
+            # Visible to pending_new() from before the record lands until it is drained
+            with self._queue_lock:
+                self._applying = (name, rid)
+            change = self._apply(container, name, rid, data)
+            with self._queue_lock:
+                self._applying = None
+                if change is not None:
+                    self._unpublished.append(change)
+        self._seen = version
+
+    def _apply(self, container, name: str, rid: str, data):
+        """Applies one pulled row in place. Returns (collection, id, record, previous) or None.
+
+        previous is None for a new record; record is None for a deleted one;
+        otherwise previous holds the old values of the fields that changed.
+        """
+        known = self._hashes.setdefault(name, {})
+        if data is not None and known.get(rid) == hash(data):
+            return None
+        if isinstance(container, list):
+            index = next((i for i, v in enumerate(container) if _record_id(v, i) == rid), None)
+            current = container[index] if index is not None else None
+        else:
+            current = container.get(rid)
+        if data is None:
+            known.pop(rid, None)
+            if current is None:
+                return None
+            if isinstance(container, list):
+                del container[index]
+            else:
+                del container[rid]
+            return (name, rid, None, current)
+        known[rid] = hash(data)
+        value = json.loads(data)
+        if current is None:
+            if isinstance(container, list):
+                container.append(value)
+            else:
+                container[rid] = value
+            return (name, rid, value, None)
+        if isinstance(current, dict) and isinstance(value, dict):
+            previous = {k: current.get(k) for k in set(current) | set(value) if current.get(k) != value.get(k)}
+            current.clear()
+            current.update(value)
+            return (name, rid, current, previous)
+        if isinstance(container, list):
+            container[index] = value
+        else:
+            container[rid] = value
+        return (name, rid, value, {"value": current})
+
+    def drain(self) -> list:
+        """Pulled changes since the last drain, oldest first."""
+        with self._queue_lock:
+            changes, self._unpublished = self._unpublished, []
+        return changes
+
+    def pending_new(self, name: str) -> set:
+        """IDs of records pulled into `name` as new and not drained yet."""
+        with self._queue_lock:
+            ids = {rid for collection, rid, record, previous in self._unpublished
+                   if collection == name and record is not None and previous is None}
+            if self._applying and self._applying[0] == name:
+                ids.add(self._applying[1])
+        return ids
+
+    # --- Chat sessions ---
+
+    def load_session(self, session_id: str):
+        """(stamp, data) of a stored session, or (None, None)."""
+        row = self._conn().execute("SELECT stamp, data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def session_stamp(self, session_id: str):
+        row = self._conn().execute("SELECT stamp FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_session(self, session_id: str, data: dict, ttl_seconds: float) -> int:
+        """Stores a session and returns its new stamp. Sessions idle past the TTL are pruned now and then."""
+        stamp, now = time.time_ns(), time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)", (session_id, _dumps(data), stamp, now))
+        self._session_saves += 1
+        if self._session_saves % SESSION_PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM sessions WHERE updated < ?", (now - ttl_seconds,))
+        return stamp
+
+    # --- Idempotency keys ---
+
+    def claim_key(self, key: str, fingerprint: str, claim_seconds: float):
+        """(claimed, fingerprint, response JSON) for an Idempotency-Key.
+
+        claimed is True when this caller inserted the key and should run the request.
+        Otherwise the row is another worker's: response is None while it is still
+        running. An unfinished claim older than claim_seconds (its worker died) is taken over.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM idempotency WHERE key = ? AND expires < ?", (key, now))
+        if conn.execute("INSERT OR IGNORE INTO idempotency VALUES (?, ?, NULL, ?)", (key, fingerprint, now + claim_seconds)).rowcount:
+            return True, fingerprint, None
+        row = self.read_key(key)
+        # Gone again between the two statements: expired just now, or its request failed
+        return (False, fingerprint, None) if row is None else (False, *row)
+
+    def read_key(self, key: str):
+        """(fingerprint, response JSON or None while running) of a claimed key, or None."""
+        row = self._conn().execute("SELECT fingerprint, response, expires FROM idempotency WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row and row[2] >= time.time() else None
+
+    def finish_key(self, key: str, response: str, ttl_seconds: float):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("UPDATE idempotency SET response = ?, expires = ? WHERE key = ?", (response, now + ttl_seconds, key))
+        self._key_saves += 1
+        if self._key_saves % IDEMPOTENCY_PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM idempotency WHERE expires < ?", (now,))
+
+    def release_key(self, key: str):
+        """Drops an unfinished claim so a retry can run the request again."""
+        self._conn().execute("DELETE FROM idempotency WHERE key = ? AND response IS NULL", (key,))
+
+    # --- Export ---
+
+    def export(self) -> dict:
+        """The stored collections in data.json layout."""
+        conn = self._conn()
+        shapes = dict(conn.execute("SELECT substr(key, 7), value FROM meta WHERE key LIKE 'shape:%'"))
+        data = {name: ([] if shape == "list" else {}) for name, shape in shapes.items()}
+        for name, rid, value in conn.execute(
+                "SELECT collection, id, data FROM records WHERE data IS NOT NULL ORDER BY version"):
+            if name in data:
+                if isinstance(data[name], list):
+                    data[name].append(json.loads(value))
+                else:
+                    data[name][rid] = json.loads(value)
+        return data
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shared state database tools.")
+    parser.add_argument("--db", default=None, help="Database file (default: Config.STATE_DB_FILE / next to the data file)")
+    parser.add_argument("--export", metavar="PATH", required=True, help="Write the stored collections as a data.json file")
+    args = parser.parse_args()
+    if args.db is None:
+        from Mock_data.mock_data import state_db_path
+        args.db = state_db_path()
+    exported = SqliteStateStore(args.db).export()
+    with open(args.export, "w") as f:
+        json.dump(exported, f, indent=4)
+    print(f"Exported {sum(len(c) for c in exported.values())} records from {args.db} to {args.export}")
@@ -1,25 +1,27 @@
 # agents/agent_core.py
 import os
 import json
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait, TimeoutError as FutureTimeout
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage, ToolMessage
-from operator import itemgetter
+from langchain_core.messages import HumanMessage
 
 from tools.crm_tools import ELLAS_CUPCAKERY_TOOLS
 from workflows.agent_state import AgentState
 from Mock_data.mock_data import MOCK_CUSTOMER_DB, MOCK_MENU_DB
 
 from config import CRM_CONFIG
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-
 from agents.llm_manager import robust_llm_invoke
+from agents.session_store import estimate_tokens, trim_to_tokens
+from services.customer_stats import get_customer_stats
+from services.loyalty_ledger import balance as loyalty_balance
+from services.metrics import span, run_in_context, record_guardrail
+from services.logger import get_logger
 
-print("--- LOADED STRICT MODE AGENT ---")
+logger = get_logger(__name__)
 
 # Define Protocol here if it was missing or imported
 SYSTEM_PROTOCOL = """
@@ -79,18 +81,37 @@ DECISION LOGIC:
 
 # --- LangGraph Node Functions ---
 
-def _format_history(history: list) -> str:
-    """Helper to format chat history for prompts."""
-    # ... (Implementation kept)
-    if not history:
+def _format_history(history: list, summary: str = "") -> str:
+    """
+    Helper to format chat history for prompts.
+    Keeps whole messages, newest first, within CRM_CONFIG.HISTORY_TOKEN_BUDGET.
+    """
+    if not history and not summary:
         return "No previous history."
+    budget = CRM_CONFIG.HISTORY_TOKEN_BUDGET
+    summary_text = trim_to_tokens(summary, CRM_CONFIG.SUMMARY_TOKEN_BUDGET) if summary else ""
+    budget -= estimate_tokens(summary_text)
+
     formatted = []
-    for msg in history:
+    for msg in reversed(history or []):
         # Handle dicts (from API) or Objects (internal)
         role = msg.get("role", "unknown") if isinstance(msg, dict) else getattr(msg, "type", "unknown")
         content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", "")
-        formatted.append(f"{role.upper()}: {content}")
-    return "\n".join(formatted)[-2000:]
+        line = f"{role.upper()}: {content}"
+        cost = estimate_tokens(line)
+        if cost > budget:
+            if not formatted:
+                # The latest message alone is over budget: keep its end rather than nothing.
+                formatted.append(f"{role.upper()}: ...{trim_to_tokens(content, max(budget, 0))}")
+            break
+        formatted.append(line)
+        budget -= cost
+
+    sections = []
+    if summary_text:
+        sections.append(f"Summary of earlier conversation: {summary_text}")
+    sections.extend(reversed(formatted))
+    return "\n".join(sections)
 
 
 def identify_user_node(state: AgentState) -> AgentState:
@@ -101,14 +122,14 @@ def identify_user_node(state: AgentState) -> AgentState:
         template = MOCK_CUSTOMER_DB.get("NEW_USER").copy()
         template["id"] = user_id 
         customer_profile = template
-    print(f"--- Node 1: Identified User: {customer_profile.get('name')} (ID: {user_id})")
+    logger.info("Node 1: Identified User: %s (ID: %s)", customer_profile.get('name'), user_id)
     return {"customer_profile": customer_profile, "user_id": user_id}
 
 def intent_classifier_node(state: AgentState) -> AgentState:
     """Node 2: Determines intent using Robust LLM."""
     input_query = state["input_query"]
     customer_profile = state["customer_profile"]
-    chat_history = _format_history(state.get("chat_history", []))
+    chat_history = _format_history(state.get("chat_history", []), state.get("history_summary", ""))
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", INTENT_CLASSIFIER_PROMPT),
@@ -132,11 +153,13 @@ def intent_classifier_node(state: AgentState) -> AgentState:
     greet_pat = _re.compile(r'^\s*(hi|hello|hey|good\s+(morning|afternoon|evening))\b', _re.IGNORECASE)
     if greet_pat.search(input_query) and len(input_query) < 20:
         name = customer_profile.get("name") or "Guest"
+        record_guardrail("greeting")
         return {"intent": "CONVERSATIONAL", "final_response": f"Hi {name}, what would you like to order today?"}
     
     # Exclusive Feedback Handling: never create orders for feedback
     if input_query.startswith("[FEEDBACK]"):
-        print("--- Node 2: Guardrail DETECTED FEEDBACK via UI (exclusive)")
+        logger.info("Node 2: Guardrail DETECTED FEEDBACK via UI (exclusive)")
+        record_guardrail("feedback")
         feedback_text = input_query.replace("[FEEDBACK]", "").strip()
         return {"intent": "TOOL_REQUIRED", "tools_to_run": [{"tool": "LogFeedbackAndComplaint", "args": {"message": feedback_text, "sentiment": "Neutral"}}]}
     
@@ -144,7 +167,8 @@ def intent_classifier_node(state: AgentState) -> AgentState:
     if any(k in lower_query for k in ["menu", "price", "list", "available", "cost"]):
         # But NOT if they are asking for status
         if "status" not in lower_query and "order" not in lower_query and "buy" not in lower_query:
-            print("--- Node 2: Guardrail FORCED 'GetMenuAndPrice'")
+            logger.info("Node 2: Guardrail FORCED 'GetMenuAndPrice'")
+            record_guardrail("forced_menu")
             forced_tools.append({"tool": "GetMenuAndPrice", "args": {"query": "all"}})
             
     # Force ProcessOrder (Deterministic Guardrail)
@@ -157,7 +181,7 @@ def intent_classifier_node(state: AgentState) -> AgentState:
     is_item_request = any(k in lower_query for k in item_keywords)
     
     if (("order" in lower_query or "buy" in lower_query or "want" in lower_query or "get" in lower_query) or is_item_request) and "status" not in lower_query:
-         print("--- Node 2: Guardrail DETECTED ORDER INTENT - Building deterministic args")
+         logger.info("Node 2: Guardrail DETECTED ORDER INTENT - Building deterministic args")
          # Simple heuristic to extract quantity and item names from query
          import re
          qty_match = re.search(r'\\b(\\d+)\\b', lower_query)
@@ -172,14 +196,17 @@ def intent_classifier_node(state: AgentState) -> AgentState:
                  break
          if matched_items:
              forced_tools.append({"tool": "ProcessOrder", "args": {"items": matched_items}})
-             print(f"--- Node 2: Heuristic items -> {matched_items}")
+             record_guardrail("forced_order")
+             logger.info("Node 2: Heuristic items -> %s", matched_items)
          else:
              from langchain_core.messages import HumanMessage
              prompt_val.messages.append(HumanMessage(content=f"[SYSTEM INJECTION]: Please place an order for the exact menu item mentioned: '{input_query}'."))
+             record_guardrail("order_hint_injected")
     
     # Loyalty/Points
     if any(k in lower_query for k in ["loyalty", "points", "balance"]):
-        print("--- Node 2: Guardrail FORCED 'GetCustomerProfile' for points")
+        logger.info("Node 2: Guardrail FORCED 'GetCustomerProfile' for points")
+        record_guardrail("forced_profile")
         forced_tools.append({"tool": "GetCustomerProfile", "args": {}})
     
     # (feedback handled above)
@@ -197,13 +224,14 @@ def intent_classifier_node(state: AgentState) -> AgentState:
     json_match = re.search(r'\{"([a-zA-Z0-9_]+)":\s*(\{.*?\})\}', response.content, re.DOTALL)
     
     if not response.tool_calls and json_match:
-        print("--- Node 2: JSON HALLUCINATION DETECTED. Parsing manually...")
+        logger.warning("Node 2: JSON HALLUCINATION DETECTED. Parsing manually...")
+        record_guardrail("json_recovery")
         tool_name = json_match.group(1)
         tool_args_str = json_match.group(2)
         
         try:
             tool_args = json.loads(tool_args_str)
-            print(f"--- Node 2: Recovered Tool: {tool_name} Args: {tool_args}")
+            logger.info("Node 2: Recovered Tool: %s Args: %s", tool_name, tool_args)
             
             # SCHEMA FIX: ProcessOrder expects 'items': list[dict], but LLM often gives 'item': str or flat dict
             if tool_name == "ProcessOrder":
@@ -224,20 +252,20 @@ def intent_classifier_node(state: AgentState) -> AgentState:
             return {"intent": intent, "tools_to_run": tools_to_run}
             
         except json.JSONDecodeError:
-            print("--- Node 2: Failed to parse hallucinated JSON.")
+            logger.warning("Node 2: Failed to parse hallucinated JSON.")
 
     if response.tool_calls:
-        print(f"--- Node 2: Intent: Tool Call ({response.tool_calls[0].get('name')})")
+        logger.info("Node 2: Intent: Tool Call (%s)", response.tool_calls[0].get('name'))
         tools_to_run = [{"tool": tc.get("name"), "args": tc.get("args")} for tc in response.tool_calls]
         intent = "TOOL_REQUIRED"
     else:
-        print("--- Node 2: Intent: Conversational")
+        logger.info("Node 2: Intent: Conversational")
         tools_to_run = []
         intent = "CONVERSATIONAL"
         
         # DOUBLE CHECK: If user wants to order, do NOT exit.
         if ("order" in lower_query or "buy" in lower_query) and "status" not in lower_query and len(lower_query) < 50:
-             print("--- Node 2: Suspected Missed Tool Call. Retrying with 'Please call ProcessOrder' hint.")
+             logger.warning("Node 2: Suspected Missed Tool Call. Retrying with 'Please call ProcessOrder' hint.")
              # We can't easily retry in this node structure without loops.
              # I'll rely on the updated PROMPT which I'm about to improve further.
         
@@ -246,73 +274,204 @@ def intent_classifier_node(state: AgentState) -> AgentState:
     return {"intent": intent, "tools_to_run": tools_to_run}
 
 
+# Tools that only read state can safely run side by side. Everything else
+# mutates the mock DB and is serialized per user (see _user_lock).
+READ_ONLY_TOOLS = {
+    "GetCustomerProfile", "GetMenuAndPrice", "UpdateDeliveryStatus",
+    "SuggestPersonalizedMeal", "SearchPromotions", "GetDeliveryTimes"
+}
+
+# Tools that need the user_id from state (the LLM doesn't usually generate it).
+USER_SCOPED_TOOLS = ["ProcessOrder", "UpdateCustomerProfile", "GetCustomerProfile", "LogFeedbackAndComplaint", "NotifyPaymentMade", "SuggestPersonalizedMeal", "SearchPromotions"]
+
+_TOOL_POOL = ThreadPoolExecutor(max_workers=CRM_CONFIG.TOOL_EXECUTOR_MAX_WORKERS, thread_name_prefix="tool")
+
+# Striped locks keep memory bounded no matter how many users we see.
+_USER_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _user_lock(user_id: str) -> threading.Lock:
+    return _USER_LOCKS[hash(user_id or "") % len(_USER_LOCKS)]
+
+
+# Names of the mutating tools started in the current turn (see tracking_mutations)
+_MUTATIONS = contextvars.ContextVar("crm_tool_mutations", default=None)
+
+
+@contextmanager
+def tracking_mutations():
+    """Collects the mutating tools the enclosed turn starts, even ones that fail or run past it."""
+    started = []
+    token = _MUTATIONS.set(started)
+    try:
+        yield started
+    finally:
+        _MUTATIONS.reset(token)
+
+
+def _note_mutation(tool_name: str):
+    started = _MUTATIONS.get()
+    if started is not None:
+        started.append(tool_name)
+
+
+def _prepare_tool_call(tool_call: dict, state: AgentState):
+    """
+    Normalizes the args of a single tool call.
+    Returns (tool_name, tool_args, blocked_output). blocked_output is set when the
+    call must not run at all.
+    """
+    tool_name = tool_call["tool"]
+    tool_args = tool_call["args"]
+
+    # CRITICAL FIX: Always inject user_id for tools that need it (Ordering, Profile, etc)
+    # The LLM doesn't usually generate the ID, so we must supply it from state.
+    if tool_name in USER_SCOPED_TOOLS:
+         tool_args["user_id"] = state["user_id"]
+         # Prevent accidental orders before profile is set
+         if tool_name == "ProcessOrder" and (not state["user_id"] or state["user_id"] == "NEW_USER"):
+             logger.warning("Node 3: Blocked ProcessOrder for NEW_USER")
+             return tool_name, tool_args, json.dumps({"ProcessOrder": {"error": "Please provide your name and email before placing an order."}})
+
+    # Quantity normalization: parse quantity from user text if missing or 1
+    if tool_name == "ProcessOrder" and isinstance(tool_args.get("items"), list):
+        import re
+        text = state.get("input_query", "").lower()
+        qty_num = None
+        m = re.search(r'\b(\d+)\b', text)
+        if m:
+            try:
+                qty_num = int(m.group(1))
+            except:
+                qty_num = None
+        if qty_num is None:
+            words = {
+                "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+                "eleven": 11, "twelve": 12
+            }
+            for w, n in words.items():
+                if f" {w} " in f" {text} ":
+                    qty_num = n
+                    break
+        if qty_num and qty_num > 1:
+            for it in tool_args["items"]:
+                if not isinstance(it.get("quantity"), int) or it.get("quantity", 1) == 1:
+                    it["quantity"] = qty_num
+
+    return tool_name, tool_args, None
+
+
+def _submit_after(after: Future, fn) -> Future:
+    """Submits fn to the tool pool once `after` is done, without holding a pool worker while it waits."""
+    if after is None:
+        return _TOOL_POOL.submit(fn)
+    chained = Future()
+
+    def _copy(inner: Future):
+        if chained.cancelled():
+            return
+        if inner.exception() is not None:
+            chained.set_exception(inner.exception())
+        else:
+            chained.set_result(inner.result())
+
+    def _start(_):
+        # A read that timed out while queued is cancelled here and never runs
+        if chained.set_running_or_notify_cancel():
+            _TOOL_POOL.submit(fn).add_done_callback(_copy)
+
+    after.add_done_callback(_start)
+    return chained
+
+
+def _run_tool(tool, tool_name: str, tool_args: dict, user_id: str) -> str:
+    """Runs one tool on a pool thread."""
+    try:
+        with span(f"tool:{tool_name}", kind="tool", read_only=tool_name in READ_ONLY_TOOLS):
+            if tool_name in READ_ONLY_TOOLS:
+                tool_result = tool.invoke(tool_args)
+            else:
+                _note_mutation(tool_name)
+                with _user_lock(user_id):
+                    tool_result = tool.invoke(tool_args)
+        logger.info("Node 3: Executed %s", tool_name)
+        return json.dumps({tool_name: tool_result})
+    except Exception as e:
+        error_msg = f"Tool failure: {str(e)}"
+        logger.error("Node 3: Error %s", error_msg)
+        return json.dumps({tool_name: {"error": error_msg}})
+
+
 def tool_executor_node(state: AgentState) -> AgentState:
-    """Node 3: Executes tools."""
+    """
+    Node 3: Executes tools.
+    Read-only tools run concurrently; mutating tools run one after another (in the
+    order the LLM asked for them) and reads issued after a mutation wait for it.
+    Outputs keep the order of tools_to_run.
+
+    Mutating tools always run to completion and are waited for: reporting a
+    timeout while ProcessOrder is still running would invite a retry and a
+    duplicate order. Reads give up TOOL_TIMEOUT_SECONDS after they could start.
+    Each tool is submitted to the pool only once the mutation before it is done,
+    so waiting never holds a pool worker.
+    """
     tools_to_run = state["tools_to_run"]
-    tool_output_list = []
-    
+    user_id = state["user_id"]
+    timeout = CRM_CONFIG.TOOL_TIMEOUT_SECONDS
+
     tool_map = {tool.name: tool for tool in ELLAS_CUPCAKERY_TOOLS}
 
+    # Each slot is either a ready output string or (tool_name, future, the mutation it waits for).
+    slots = []
+    last_mutation = None
+
     for tool_call in tools_to_run:
-        tool_name = tool_call["tool"]
-        tool_args = tool_call["args"]
-        
+        tool_name = tool_call.get("tool")
         try:
-            # CRITICAL FIX: Always inject user_id for tools that need it (Ordering, Profile, etc)
-            # The LLM doesn't usually generate the ID, so we must supply it from state.
-            if tool_name in ["ProcessOrder", "UpdateCustomerProfile", "GetCustomerProfile", "LogFeedbackAndComplaint", "NotifyPaymentMade"]:
-                 tool_args["user_id"] = state["user_id"]
-                 # Prevent accidental orders before profile is set
-                 if tool_name == "ProcessOrder" and (not state["user_id"] or state["user_id"] == "NEW_USER"):
-                     tool_output_list.append(json.dumps({"ProcessOrder": {"error": "Please provide your name and email before placing an order."}}))
-                     print("--- Node 3: Blocked ProcessOrder for NEW_USER")
-                     continue
-            
-            # Additional safety: Ensure items list exists for ProcessOrder
-            if tool_name == "ProcessOrder" and "items" not in tool_args:
-                 # If LLM messed up and passed just 'items' as a string or flat args, try to recover?
-                 # ideally we rely on robust_llm invocation, but let's assume valid args for now.
-                 pass
-            
-            # Quantity normalization: parse quantity from user text if missing or 1
-            if tool_name == "ProcessOrder" and isinstance(tool_args.get("items"), list):
-                import re
-                text = state.get("input_query", "").lower()
-                qty_num = None
-                m = re.search(r'\b(\d+)\b', text)
-                if m:
-                    try:
-                        qty_num = int(m.group(1))
-                    except:
-                        qty_num = None
-                if qty_num is None:
-                    words = {
-                        "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
-                        "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
-                        "eleven": 11, "twelve": 12
-                    }
-                    for w, n in words.items():
-                        if f" {w} " in f" {text} ":
-                            qty_num = n
-                            break
-                if qty_num and qty_num > 1:
-                    for it in tool_args["items"]:
-                        if not isinstance(it.get("quantity"), int) or it.get("quantity", 1) == 1:
-                            it["quantity"] = qty_num
-            
-            if tool_name in tool_map:
-                tool_result = tool_map[tool_name].invoke(tool_args)
-                tool_output_list.append(json.dumps({tool_name: tool_result}))
-                print(f"--- Node 3: Executed {tool_name}")
-            else:
-                 error_msg = f"Tool '{tool_name}' not found."
-                 tool_output_list.append(json.dumps({"error": error_msg}))
-                 print(f"--- Node 3: {error_msg}")
-                 
+            tool_name, tool_args, blocked_output = _prepare_tool_call(tool_call, state)
         except Exception as e:
             error_msg = f"Tool failure: {str(e)}"
+            slots.append(json.dumps({tool_name: {"error": error_msg}}))
+            logger.error("Node 3: Error %s", error_msg)
+            continue
+
+        if blocked_output:
+            slots.append(blocked_output)
+            continue
+
+        if tool_name not in tool_map:
+            error_msg = f"Tool '{tool_name}' not found."
+            slots.append(json.dumps({"error": error_msg}))
+            logger.warning("Node 3: %s", error_msg)
+            continue
+
+        future = _submit_after(last_mutation, run_in_context(_run_tool, tool_map[tool_name], tool_name, tool_args, user_id))
+        slots.append((tool_name, future, last_mutation))
+        if tool_name not in READ_ONLY_TOOLS:
+            last_mutation = future
+
+    tool_output_list = []
+    start = time.monotonic()
+    for slot in slots:
+        if isinstance(slot, str):
+            tool_output_list.append(slot)
+            continue
+        tool_name, future, after = slot
+        if tool_name not in READ_ONLY_TOOLS:
+            tool_output_list.append(future.result())
+            continue
+        ready = start
+        if after is not None:
+            # Mutations are waited for anyway; the read's own time starts once it can run
+            wait([after])
+            ready = time.monotonic()
+        try:
+            tool_output_list.append(future.result(timeout=max(0.0, ready + timeout - time.monotonic())))
+        except FutureTimeout:
+            future.cancel()
+            error_msg = f"Tool '{tool_name}' timed out after {timeout:.0f}s."
             tool_output_list.append(json.dumps({tool_name: {"error": error_msg}}))
-            print(f"--- Node 3: Error {error_msg}")
+            logger.warning("Node 3: %s", error_msg)
 
     return {"tool_output": tool_output_list}
 
@@ -350,7 +509,7 @@ def response_generator_node(state: AgentState) -> AgentState:
     customer_profile = state["customer_profile"]
     tool_output = state.get("tool_output", [])
     input_query = state["input_query"]
-    chat_history = _format_history(state.get("chat_history", []))
+    chat_history = _format_history(state.get("chat_history", []), state.get("history_summary", ""))
     
     # Get Bank Details from Site Settings
     from Mock_data.mock_data import SITE_SETTINGS
@@ -404,7 +563,7 @@ def response_generator_node(state: AgentState) -> AgentState:
             else:
                 final_content = f"Order Placed. ID: {process_order_result.get('order_id','Unknown')}. Total: {process_order_result.get('total_price','Unknown')}."
     elif profile_result and isinstance(profile_result, dict):
-        pts = profile_result.get("loyalty_points", 0)
+        pts = loyalty_balance(state.get("user_id")) if state.get("user_id") else profile_result.get("loyalty_points", 0)
         q = input_query.lower()
         from Mock_data.mock_data import SITE_SETTINGS
         thr = int(SITE_SETTINGS.get("offer_points_threshold", 300))
@@ -427,18 +586,9 @@ def response_generator_node(state: AgentState) -> AgentState:
         else:
             suggest = ""
             try:
-                uid = state.get("user_id")
-                from Mock_data.mock_data import MOCK_ORDER_DB
-                cnt = {}
-                for _, od in MOCK_ORDER_DB.items():
-                    if od.get("customer_id") == uid:
-                        for it in od.get("items", []):
-                            n = it.get("name")
-                            if n:
-                                cnt[n] = cnt.get(n, 0) + int(it.get("quantity", 1))
-                if cnt:
-                    top = sorted(cnt.items(), key=lambda x: x[1], reverse=True)[0][0]
-                    suggest = f"\nRecommended: {top} — would you like to repeat it?"
+                stats = get_customer_stats(state.get("user_id"))
+                if stats and stats["top_item"]:
+                    suggest = f"\nRecommended: {stats['top_item']} — would you like to repeat it?"
             except Exception:
                 suggest = ""
             final_content = "\n".join(lines) + "\n\nHere's the current menu — which would you like to order?" + suggest
@@ -469,7 +619,8 @@ def response_generator_node(state: AgentState) -> AgentState:
     # Final safety net: If the LLM *still* outputs raw JSON text for ProcessOrder, catch it here.
     if '{"ProcessOrder":' in final_content:
         import re
-        print("--- Node 4: EXECUTION LOCK TRIGGERED. Intercepting JSON text...")
+        logger.warning("Node 4: EXECUTION LOCK TRIGGERED. Intercepting JSON text...")
+        record_guardrail("execution_lock")
         
         # Regex to extract the argument block
         json_match = re.search(r'\{"ProcessOrder":\s*(\{.*?\})\s*\}', final_content, re.DOTALL)
@@ -480,7 +631,7 @@ def response_generator_node(state: AgentState) -> AgentState:
                 args = json.loads(args_str)
                 user_id = state.get("user_id")
                 
-                print(f"--- Node 4: Manually executing ProcessOrder with args: {args}")
+                logger.info("Node 4: Manually executing ProcessOrder with args: %s", args)
                 
                 # Normalize args (items list vs item)
                 if "items" not in args:
@@ -493,6 +644,7 @@ def response_generator_node(state: AgentState) -> AgentState:
 
                 # EXECUTE TOOL DIRECTLY
                 from tools.crm_tools import ProcessOrder
+                _note_mutation("ProcessOrder")
                 result = ProcessOrder.invoke({"user_id": user_id, "items": args["items"]})
                 
                 # SWAP RESPONSE TEXT
@@ -502,13 +654,13 @@ def response_generator_node(state: AgentState) -> AgentState:
                 else:
                     final_content = f"Order Placed. ID: {result.get('order_id', 'Unknown')}. Total: {result.get('total_price', 'Unknown')}."
                     
-                print(f"--- Node 4: Interceptor SWAPPED response to: {final_content}")
+                logger.info("Node 4: Interceptor SWAPPED response to: %s", final_content)
                 
             except Exception as e:
-                print(f"--- Node 4: Interceptor Failed: {e}")
+                logger.error("Node 4: Interceptor Failed: %s", e)
 
-    print("--- Node 4: Final Response Generated")
-    print(f"DEBUG: Tool Outputs used for response: {tool_output}")
-    print(f"DEBUG: Final Answer: {final_content}")
+    logger.info("Node 4: Final Response Generated")
+    logger.debug("Tool Outputs used for response: %s", tool_output, extra={"sample": True})
+    logger.debug("Final Answer: %s", final_content, extra={"sample": True})
 
     return {"final_response": final_content}
@@ -0,0 +1,237 @@
+# agents/fake_llm.py
+"""
+Offline stand-in for the hosted LLM providers.
+
+Enable with LLM_PROVIDER_MODE=fake. CRM_CONFIG.PROVIDERS is then replaced by
+FAKE_LLM_PROVIDERS entries of kind "fake", and robust_llm_invoke builds a
+FakeChatModel for each instead of a ChatOpenAI client. No network, no keys.
+
+Replies are rule-based: the last customer message is matched against the
+rules below (or a JSON script in FAKE_LLM_SCRIPT, checked first) to produce
+tool calls when tools are bound, or a short text answer otherwise.
+
+Behaviour knobs, all per process and seeded by FAKE_LLM_SEED:
+    FAKE_LLM_LATENCY_MS / FAKE_LLM_LATENCY_SIGMA   lognormal latency (median ms, sigma)
+    FAKE_LLM_ERROR_RATES                           share of calls failing with a 500, per provider
+    FAKE_LLM_RATE_LIMIT_RATES                      share of calls failing with a 429, per provider
+
+The per-provider lists are comma separated, e.g. "0.3,0" makes the first fake
+provider fail 30% of the time so failover to the second can be measured.
+
+Script format (FAKE_LLM_SCRIPT=path/to/script.json):
+    [{"match": "refund", "content": "Let me check that for you."},
+     {"match": "track (O-\\w+)", "tool_calls": [{"name": "UpdateDeliveryStatus", "args": {"order_id": "$1"}}]}]
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from config import CRM_CONFIG
+from agents.session_store import estimate_tokens
+
+_RNG = random.Random(CRM_CONFIG.FAKE_LLM_SEED)
+_RNG_LOCK = threading.Lock()
+
+_SCRIPT = None
+_SCRIPT_LOCK = threading.Lock()
+
+INJECTION_PREFIX = "[SYSTEM INJECTION]"
+
+
+class FakeProviderError(Exception):
+    """Mimics the status-coded errors raised by the OpenAI-compatible clients."""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+
+
+class FakeRateLimitError(FakeProviderError):
+    def __init__(self, message: str = "Rate limit reached, please retry later"):
+        super().__init__(message, status_code=429)
+
+
+def _load_script() -> list:
+    global _SCRIPT
+    if _SCRIPT is None:
+        with _SCRIPT_LOCK:
+            if _SCRIPT is None:
+                rules = []
+                if CRM_CONFIG.FAKE_LLM_SCRIPT:
+                    with open(CRM_CONFIG.FAKE_LLM_SCRIPT, "r", encoding="utf-8") as f:
+                        for rule in json.load(f):
+                            rules.append((re.compile(rule["match"], re.IGNORECASE), rule))
+                _SCRIPT = rules
+    return _SCRIPT
+
+
+def _substitute(value, match):
+    """Replaces $1, $2... in scripted args with the rule's regex groups."""
+    if isinstance(value, str):
+        return re.sub(r"\$(\d+)", lambda m: match.group(int(m.group(1))) or "", value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, match) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, match) for v in value]
+    return value
+
+
+def _menu_items(text: str) -> list:
+    from Mock_data.mock_data import MOCK_MENU_DB
+    qty = re.search(r"\b(\d+)\b", text)
+    quantity = int(qty.group(1)) if qty else 1
+    items = []
+    for item in MOCK_MENU_DB.values():
+        name = item.get("name", "")
+        if name and name.lower() in text:
+            items.append({"name": name, "quantity": quantity})
+    return items
+
+
+def rule_based_tool_calls(text: str) -> list:
+    """[{"name", "args"}] for a customer message, in the order the agent would call them."""
+    text = text.lower()
+    if re.search(r"\b(status|track|where is)\b", text):
+        order_id = re.search(r"\b(o-[0-9a-z]+)\b", text)
+        return [{"name": "UpdateDeliveryStatus", "args": {"order_id": order_id.group(1).upper() if order_id else ""}}]
+    if re.search(r"\b(paid|payment|transferred|sent the money)\b", text):
+        return [{"name": "NotifyPaymentMade", "args": {}}]
+    if "deliver" in text:
+        return [{"name": "GetDeliveryTimes", "args": {}}]
+    name = re.search(r"\bmy name is ([a-z][a-z .'-]{0,40})", text)
+    if name:
+        return [{"name": "UpdateCustomerProfile", "args": {"name": name.group(1).strip().title()}}]
+    if re.search(r"\b(promo|promotion|deal|discount|offer)s?\b", text):
+        return [{"name": "SearchPromotions", "args": {}}]
+    if re.search(r"\b(recommend|suggest)", text):
+        return [{"name": "SuggestPersonalizedMeal", "args": {"customer_preferences": [], "last_order_date": ""}}]
+    if re.search(r"\b(complain|bad|terrible|awful|cold|late|disappointed)\b", text):
+        return [{"name": "LogFeedbackAndComplaint", "args": {"message": text, "sentiment": "Negative"}}]
+    items = _menu_items(text)
+    if items and re.search(r"\b(order|buy|want|get|place)\b", text):
+        return [{"name": "ProcessOrder", "args": {"items": items}}]
+    if re.search(r"\b(menu|price|available)\b", text):
+        return [{"name": "GetMenuAndPrice", "args": {"query": "all"}}]
+    return []
+
+
+def rule_based_text(text: str) -> str:
+    text = text.lower()
+    if re.search(r"\b(thanks|thank you)\b", text):
+        return "You're welcome! Anything else I can get for you?"
+    return f"Happy to help with that at {CRM_CONFIG.BRAND_NAME}. What would you like to order today?"
+
+
+def _last_customer_message(messages) -> tuple:
+    """(text, order_hint): the latest human message, and whether the agent injected an order hint."""
+    hint = False
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            content = msg.content if isinstance(msg.content, str) else str(msg.content)
+            if content.startswith(INJECTION_PREFIX):
+                hint = True
+                continue
+            return content, hint
+    return "", hint
+
+
+def _tool_name(tool: dict) -> str:
+    return (tool.get("function") or {}).get("name") or tool.get("name", "")
+
+
+def _rates(spec: str, index: int) -> float:
+    values = [v.strip() for v in (spec or "").split(",") if v.strip()]
+    if not values:
+        return 0.0
+    return float(values[min(index, len(values) - 1)])
+
+
+class FakeChatModel(BaseChatModel):
+    """In-process chat model with the ChatOpenAI surface the agent uses (invoke, bind_tools)."""
+
+    provider_name: str = "Fake"
+    latency_ms: float = 0.0
+    latency_sigma: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    @classmethod
+    def for_provider(cls, provider: dict) -> "FakeChatModel":
+        index = provider.get("index", 0)
+        return cls(
+            provider_name=provider["name"],
+            latency_ms=CRM_CONFIG.FAKE_LLM_LATENCY_MS,
+            latency_sigma=CRM_CONFIG.FAKE_LLM_LATENCY_SIGMA,
+            error_rate=_rates(CRM_CONFIG.FAKE_LLM_ERROR_RATES, index),
+            rate_limit_rate=_rates(CRM_CONFIG.FAKE_LLM_RATE_LIMIT_RATES, index),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-rules"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _draw(self):
+        """(delay_seconds, failure) from the shared seeded generator."""
+        with _RNG_LOCK:
+            delay = 0.0
+            if self.latency_ms > 0:
+                delay = self.latency_ms / 1000.0
+                if self.latency_sigma > 0:
+                    delay *= math.exp(_RNG.gauss(0.0, self.latency_sigma))
+            roll = _RNG.random()
+        if roll < self.rate_limit_rate:
+            return delay, FakeRateLimitError()
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, FakeProviderError(f"{self.provider_name} internal error")
+        return delay, None
+
+    def _reply(self, messages, tools) -> AIMessage:
+        text, order_hint = _last_customer_message(messages)
+        tool_names = {_tool_name(t) for t in tools or []}
+
+        for pattern, rule in _load_script():
+            match = pattern.search(text)
+            if match:
+                calls = [c for c in _substitute(rule.get("tool_calls") or [], match) if c["name"] in tool_names]
+                return self._message(rule.get("content", "") if not calls else "", calls)
+
+        calls = []
+        if tools:
+            calls = [c for c in rule_based_tool_calls(text) if c["name"] in tool_names]
+            if not calls and order_hint and "ProcessOrder" in tool_names:
+                items = _menu_items(text.lower())
+                if items:
+                    calls = [{"name": "ProcessOrder", "args": {"items": items}}]
+        return self._message("" if calls else rule_based_text(text), calls)
+
+    def _message(self, content: str, calls: list) -> AIMessage:
+        return AIMessage(
+            content=content,
+            tool_calls=[{"name": c["name"], "args": c.get("args") or {}, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"} for c in calls],
+        )
+
+    def _generate(self, messages: List, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        delay, failure = self._draw()
+        if delay:
+            time.sleep(delay)
+        if failure is not None:
+            raise failure
+
+        message = self._reply(messages, kwargs.get("tools"))
+        tokens_in = sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages)
+        tokens_out = estimate_tokens(message.content) + 20 * len(message.tool_calls)
+        message.usage_metadata = {"input_tokens": tokens_in, "output_tokens": tokens_out, "total_tokens": tokens_in + tokens_out}
+        return ChatResult(generations=[ChatGeneration(message=message)])
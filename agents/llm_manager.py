@@ -1,9 +1,16 @@
 from langchain_openai import ChatOpenAI
 from config import CRM_CONFIG
+from services.metrics import span, record_tokens
+from services.logger import get_logger
 import time
 
+logger = get_logger(__name__)
+
 def get_llm_for_provider(provider):
     """Creates a ChatOpenAI instance for a specific provider."""
+    if provider.get("kind") == "fake":
+        from agents.fake_llm import FakeChatModel
+        return FakeChatModel.for_provider(provider)
     return ChatOpenAI(
         base_url=provider['base_url'],
         api_key=provider['key'],
@@ -28,27 +35,33 @@ def robust_llm_invoke(prompt_value, tools=None):
 
     for i, provider in enumerate(available_providers):
         try:
-            print(f"--- LLM Manager: Attempting with {provider['name']} ({provider['model']})...")
-            
-            llm = get_llm_for_provider(provider)
+            logger.info("LLM Manager: Attempting with %s (%s)...", provider['name'], provider['model'])
             
-            # Bind tools if supported structure is standard
-            if tools:
-                llm = llm.bind_tools(tools)
+            with span(f"llm:{provider['name']}", kind="llm", provider=provider['name'], model=provider['model'], attempt=i + 1) as llm_span:
+                llm = get_llm_for_provider(provider)
                 
-            # Invoke directly with the PromptValue
-            response = llm.invoke(prompt_value) 
+                # Bind tools if supported structure is standard
+                if tools:
+                    llm = llm.bind_tools(tools)
+                    
+                # Invoke directly with the PromptValue
+                response = llm.invoke(prompt_value) 
+
+                usage = getattr(response, "usage_metadata", None) or {}
+                tokens_in, tokens_out = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+                llm_span.set(tokens_in=tokens_in, tokens_out=tokens_out, tool_calls=len(getattr(response, "tool_calls", []) or []))
+                record_tokens(provider['name'], tokens_in, tokens_out)
             
-            print(f"--- LLM Manager: Success with {provider['name']}")
+            logger.info("LLM Manager: Success with %s", provider['name'])
             return response
             
         except Exception as e:
-            print(f"--- LLM Manager: Failed with {provider['name']}: {str(e)}")
+            logger.warning("LLM Manager: Failed with %s: %s", provider['name'], e)
             last_exception = e
             # Optional: Add small delay before switch
             # time.sleep(0.5)
             continue
             
     # If all failed
-    print("--- LLM Manager: All providers failed.")
+    logger.error("LLM Manager: All providers failed.")
     raise last_exception
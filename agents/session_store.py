@@ -0,0 +1,219 @@
+# agents/session_store.py
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import STATE_STORE
+from services.metrics import record_cache
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rough prompt-size estimate; good enough for budgeting without a tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Evicted turns are summarized in batches so we don't hit the summarizer every turn.
+SUMMARY_BATCH_SIZE = 4
+
+SUMMARY_PROMPT = """Update the running summary of a bakery chat.
+Keep names, items, quantities, order IDs and open questions. Drop greetings.
+Answer with the new summary only, at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Keeps the tail of `text` within max_tokens, cutting at a line or word boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    cut = tail.find("\n")
+    if cut == -1:
+        cut = tail.find(" ")
+    return tail[cut + 1:] if cut != -1 else tail
+
+
+class ConversationSession:
+    """Recent turns for one conversation plus a summary of everything older."""
+
+    def __init__(self, session_id: str, max_turns: int):
+        self.session_id = session_id
+        self.turns = deque()
+        self.max_turns = max_turns
+        self.summary = ""
+        self.pending = []          # turns pushed out of `turns`, not yet in `summary`
+        self.summarizing = False
+        self.last_seen = time.monotonic()
+        self.stamp = None          # version in the shared store this copy matches
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        """Returns (summary, recent_turns) for building a prompt."""
+        with self.lock:
+            # Turns still waiting for the summarizer are shown verbatim so nothing is lost.
+            return self.summary, list(self.pending) + list(self.turns)
+
+
+class SessionStore:
+    """
+    In-process conversation store keyed by session id (the user_id by default).
+    Sessions are evicted after SESSION_TTL_SECONDS idle, or least-recently-used
+    first once SESSION_MAX_SESSIONS is reached.
+
+    With STATE_BACKEND=sqlite each change is also written to the shared store,
+    and get() reloads a session another worker has changed since, so a
+    conversation can move between workers.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: int, max_turns: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+
+    def get(self, session_id: str) -> ConversationSession:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_seen > self.ttl_seconds:
+                del self._sessions[session_id]
+                session = None
+            record_cache("session", session is not None)
+            if session is None:
+                session = ConversationSession(session_id, self.max_turns)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            self._evict(now)
+        if STATE_STORE is not None:
+            self._load_shared(session)
+        return session
+
+    def _load_shared(self, session: ConversationSession):
+        if STATE_STORE.session_stamp(session.session_id) in (None, session.stamp):
+            return
+        stamp, data = STATE_STORE.load_session(session.session_id)
+        with session.lock:
+            session.summary = data["summary"]
+            session.turns = deque(data["turns"])
+            session.pending = data["pending"]
+            session.stamp = stamp
+
+    def _save_shared(self, session: ConversationSession):
+        if STATE_STORE is None:
+            return
+        with session.lock:
+            data = {"summary": session.summary, "turns": list(session.turns), "pending": list(session.pending)}
+        session.stamp = STATE_STORE.save_session(session.session_id, data, self.ttl_seconds)
+
+    def _evict(self, now: float):
+        # Oldest-used sessions sit at the front, so expired ones are found without a full scan.
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - oldest.last_seen > self.ttl_seconds:
+                del self._sessions[oldest_id]
+            else:
+                break
+
+    def append(self, session_id: str, role: str, content: str):
+        session = self.get(session_id)
+        with session.lock:
+            session.turns.append({"role": role, "content": content or ""})
+            while len(session.turns) > session.max_turns:
+                session.pending.append(session.turns.popleft())
+            schedule = len(session.pending) >= SUMMARY_BATCH_SIZE and not session.summarizing
+            if schedule:
+                session.summarizing = True
+        self._save_shared(session)
+        if schedule:
+            self._summarizer.submit(self._refresh_summary, session)
+
+    def seed(self, session_id: str, history: list):
+        """Loads client-sent history into an empty session (older clients still send chat_history)."""
+        session = self.get(session_id)
+        with session.lock:
+            if session.turns or session.pending or session.summary:
+                return
+        for msg in history or []:
+            role = msg.get("role", "unknown") if isinstance(msg, dict) else getattr(msg, "type", "unknown")
+            content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", "")
+            self.append(session_id, role, content)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # --- Background summarization ---
+
+    def _refresh_summary(self, session: ConversationSession):
+        try:
+            with session.lock:
+                batch = list(session.pending)
+                summary = session.summary
+            if batch:
+                new_summary = summarize(summary, batch)
+                with session.lock:
+                    session.summary = new_summary
+                    del session.pending[:len(batch)]
+                self._save_shared(session)
+        except Exception as e:
+            logger.error("Session Store: Summary refresh failed for %s: %s", session.session_id, e)
+        finally:
+            with session.lock:
+                session.summarizing = False
+                again = len(session.pending) >= SUMMARY_BATCH_SIZE
+                if again:
+                    session.summarizing = True
+            if again:
+                self._summarizer.submit(self._refresh_summary, session)
+
+
+def _compact_summary(summary: str, turns: list) -> str:
+    """Extractive fallback: one short line per turn, oldest lines dropped past the budget."""
+    lines = [summary] if summary else []
+    for turn in turns:
+        content = " ".join(turn.get("content", "").split())
+        if len(content) > 160:
+            content = content[:157] + "..."
+        lines.append(f"{turn.get('role', 'unknown').upper()}: {content}")
+    return trim_to_tokens("\n".join(lines), CRM_CONFIG.SUMMARY_TOKEN_BUDGET)
+
+
+def summarize(summary: str, turns: list) -> str:
+    """Folds `turns` into `summary`, using the LLM when enabled."""
+    if CRM_CONFIG.SESSION_LLM_SUMMARY and CRM_CONFIG.LLM_ENABLED:
+        try:
+            from langchain_core.prompts import PromptTemplate
+            from agents.llm_manager import robust_llm_invoke
+            messages = "\n".join(f"{t.get('role', 'unknown').upper()}: {t.get('content', '')}" for t in turns)
+            prompt_val = PromptTemplate.from_template(SUMMARY_PROMPT).invoke({
+                "summary": summary or "(none)",
+                "messages": messages,
+                "max_words": int(CRM_CONFIG.SUMMARY_TOKEN_BUDGET * 0.75),
+            })
+            response = robust_llm_invoke(prompt_val)
+            return trim_to_tokens(response.content.strip(), CRM_CONFIG.SUMMARY_TOKEN_BUDGET)
+        except Exception as e:
+            logger.warning("Session Store: LLM summary failed, using compact summary: %s", e)
+    return _compact_summary(summary, turns)
+
+
+SESSION_STORE = SessionStore(
+    max_sessions=CRM_CONFIG.SESSION_MAX_SESSIONS,
+    ttl_seconds=CRM_CONFIG.SESSION_TTL_SECONDS,
+    max_turns=CRM_CONFIG.SESSION_MAX_TURNS,
+)
@@ -1,16 +1,26 @@
 # api/index.py (FastAPI Serverless Entry Point)
+import datetime
+import hashlib
+import json
 import os
-from fastapi import FastAPI, Request
+import threading
+import time
+import uuid
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel
-from dotenv import load_dotenv
+from typing import Optional
 
-# Import the core components
-from workflows.crm_graph import build_crm_graph
-from workflows.agent_state import AgentState # For type hinting the state
-from agents.agent_core import identify_user_node, intent_classifier_node, tool_executor_node, response_generator_node
+# config loads the .env file; the agent stack (LangGraph/LangChain) is imported lazily
+from config import CRM_CONFIG
+from agents.session_store import SESSION_STORE
+from services.metrics import REGISTRY, span, render_prometheus
+from services.logger import get_logger, request_id_var
+from services.shared_state import sync as sync_shared_state, transaction, transactional
+from services.idempotency import IDEMPOTENCY_CACHE, IdempotencyConflict, IdempotencyInProgress
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -29,27 +39,93 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Every log line written while serving this request carries its id
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    start = time.perf_counter()
+    # Other workers' changes (STATE_BACKEND=sqlite) are applied before the request reads anything
+    sync_shared_state()
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    # Label by route template (not raw path) to keep the series count bounded
+    route = request.scope.get("route")
+    REGISTRY.observe(
+        "crm_http_request_duration_seconds", time.perf_counter() - start, "HTTP request latency by route.",
+        method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    return response
+
 # --- 2. Request/Response Models ---
 class ChatRequest(BaseModel):
     # This ID will be used to look up the customer in the mock DB
     user_id: str
     message: str
-    # Optional: for multi-turn conversations, but kept simple for initial setup
+    # Conversation history is kept server-side per session (defaults to user_id)
+    session_id: Optional[str] = None
+    # Deprecated: only used to seed a new server-side session for older clients
     chat_history: list = []
 
 class ChatResponse(BaseModel):
     user_id: str
     response: str
+
+# --- Idempotency-Key ---
+# A retried chat turn or dashboard write sent with the same Idempotency-Key header
+# gets the first request's response back (marked Idempotent-Replayed) instead of
+# running again; see services.idempotency.
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+def _idempotency_args(scope: str, key: str, request: BaseModel):
+    """(cache key, request fingerprint). Keys are per endpoint; the fingerprint catches a key reused for another body."""
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key is longer than {MAX_IDEMPOTENCY_KEY_LENGTH} characters.")
+    body = json.dumps(jsonable_encoder(request), sort_keys=True)
+    return f"{scope}:{key}", hashlib.sha256(body.encode()).hexdigest()
+
+def _replay_errors(error: Exception):
+    if isinstance(error, IdempotencyConflict):
+        return HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request.")
+    return HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed.")
+
+def _idempotent(scope: str, key: Optional[str], request: BaseModel, response: Response, func):
+    """Runs func() once per Idempotency-Key (every time without one)."""
+    if not key:
+        return func()
+    try:
+        result, replayed = IDEMPOTENCY_CACHE.run(*_idempotency_args(scope, key, request), lambda: jsonable_encoder(func()))
+    except (IdempotencyConflict, IdempotencyInProgress) as e:
+        raise _replay_errors(e)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
     
-# --- 3. Build and Compile LangGraph ---
-# The graph is compiled once on startup, making the function calls efficient.
+# --- 3. Build and Compile LangGraph (lazily) ---
+# Importing LangGraph/LangChain and compiling the graph is by far the most expensive
+# part of startup, and only /api/chat needs it. It is done once, on the first chat
+# request, so a cold start serving /api/health or /api/data/* stays cheap.
+# Set AGENT_WARMUP=true to compile it in a background thread right after startup.
 # We pass None as the global LLM is now managed dynamically by agents.llm_manager
-try:
-    crm_agent_app = build_crm_graph(None)
-    print("[OK] LangGraph CRM Agent compiled successfully.")
-except Exception as e:
-    print(f"[ERROR] Error compiling LangGraph: {e}")
-    crm_agent_app = None
+crm_agent_app = None
+_agent_lock = threading.Lock()
+
+def get_crm_agent_app():
+    """Returns the compiled agent graph, building it on first use. None if it fails to compile."""
+    global crm_agent_app
+    if crm_agent_app is None:
+        with _agent_lock:
+            if crm_agent_app is None:
+                try:
+                    from workflows.crm_graph import build_crm_graph
+                    crm_agent_app = build_crm_graph(None)
+                    logger.info("LangGraph CRM Agent compiled successfully.")
+                except Exception as e:
+                    logger.exception("Error compiling LangGraph: %s", e)
+    return crm_agent_app
+
+if CRM_CONFIG.AGENT_WARMUP:
+    threading.Thread(target=get_crm_agent_app, name="agent-warmup", daemon=True).start()
 
 
 # --- 4. API Endpoints ---
@@ -59,24 +135,107 @@ def health_check():
     """Simple endpoint for Vercel health check."""
     return {"status": "ok", "brand": os.getenv("BRAND_NAME", "Ellas Cupcakery")}
 
+@app.get("/api/metrics")
+def metrics(format: str = "prometheus"):
+    """Prometheus text exposition of stage latencies and counters (?format=json for p50/p95/p99)."""
+    if format == "json":
+        return REGISTRY.summary()
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # --- Dashboard Data Endpoints ---
-from Mock_data.mock_data import MOCK_MENU_DB, MOCK_ORDER_DB, MOCK_CUSTOMER_DB, MOCK_FEEDBACK_LOG, SITE_SETTINGS, persist_changes
+from Mock_data.mock_data import MOCK_MENU_DB, MOCK_ORDER_DB, MOCK_CUSTOMER_DB, MOCK_PROMO_DB, SITE_SETTINGS, persist_changes
+from services.events import publish, ORDER_UPDATED, CUSTOMERS_MERGED, CUSTOMER_UPDATED, MENU_UPDATED, PROMOS_UPDATED
+from services.promotions import iter_promos, rules_error
+from services.feedback_log import query_feedback, critical_feedback, feedback_counts
+from services import analytics, order_board, search_index
+from services.loyalty_ledger import award_order_points, merge_customers, set_balance, balance as loyalty_balance
+from services.inventory import apply_order_change, start_sweeper
+from services.notifications import send_email_notification, pending as pending_notifications
+from services import segmentation, images
+
+start_sweeper()
+if CRM_CONFIG.CAMPAIGNS_ENABLED:
+    segmentation.start_scheduler()
 
 @app.get("/api/data/menu")
 def get_menu_data():
-    return MOCK_MENU_DB
+    # Items with a local image also carry image_variants (srcset URLs of resized WebP/JPEG copies)
+    return {item_id: images.with_variants(item) for item_id, item in list(MOCK_MENU_DB.items())}
 
+@app.get("/api/images/{digest}/{width}.{fmt}")
+def get_image(digest: str, width: int, fmt: str):
+    """A resized menu image (services.images). The URL names the content, so it is cached for good."""
+    try:
+        path = images.render(digest, width, fmt)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=404, detail="No such image variant.")
+    return FileResponse(path, media_type=images.media_type(fmt), headers={"Cache-Control": images.CACHE_CONTROL})
+
+# Copies, not the live dicts: ProcessOrder and the dashboard write to them while the response is encoded
 @app.get("/api/data/orders")
 def get_order_data():
-    return MOCK_ORDER_DB
+    return {order_id: dict(order) for order_id, order in list(MOCK_ORDER_DB.items())}
 
 @app.get("/api/data/customers")
 def get_customer_data():
-    return MOCK_CUSTOMER_DB
+    return {customer_id: dict(customer) for customer_id, customer in list(MOCK_CUSTOMER_DB.items())}
+
+def _hours_ago(hours):
+    return time.time() - hours * 3600 if hours else None
 
 @app.get("/api/data/feedback")
-def get_feedback_data():
-    return MOCK_FEEDBACK_LOG
+def get_feedback_data(response: Response, limit: int = 100, sentiment: Optional[str] = None, user_id: Optional[str] = None,
+                      critical: Optional[bool] = None, since_hours: Optional[float] = None, before: Optional[int] = None):
+    """Newest-first slice of the feedback log. `sentiment` is comma separated; critical=true/false
+    keeps only / drops Config.CRITICAL_SENTIMENT. The X-Next-Before header is the cursor for the next page."""
+    sentiments = [s.strip() for s in sentiment.split(",") if s.strip()] if sentiment else None
+    if critical is True:
+        sentiments = CRM_CONFIG.CRITICAL_SENTIMENT
+    page = query_feedback(
+        sentiments=sentiments, user_id=user_id, since=_hours_ago(since_hours), before=before,
+        exclude_sentiments=CRM_CONFIG.CRITICAL_SENTIMENT if critical is False else None,
+        limit=max(1, min(limit, 1000)),
+    )
+    if page["next_before"] is not None:
+        response.headers["X-Next-Before"] = str(page["next_before"])
+    return page["items"]
+
+@app.get("/api/feedback/critical")
+def get_critical_feedback(limit: int = 10, since_hours: Optional[float] = None):
+    """Most recent feedback with a critical sentiment (Config.CRITICAL_SENTIMENT)."""
+    return critical_feedback(limit=max(1, min(limit, 200)), since=_hours_ago(since_hours))
+
+@app.get("/api/feedback/counts")
+def get_feedback_counts(period: str = "day", days: int = 30):
+    """Feedback counts per period ("hour", "day" or "week") and sentiment over the last `days`."""
+    return feedback_counts(period=period, since=_hours_ago(days * 24))
+
+@app.get("/api/analytics/summary")
+def get_analytics_summary(days: int = 30, top: int = 10):
+    """Dashboard KPIs from the incrementally maintained sales aggregates."""
+    return analytics.summary(days=max(1, min(days, 366)), top=max(1, min(top, 50)))
+
+@app.get("/api/search")
+def search_records(q: str = "", kinds: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """Ranked full-text search over customers, orders and feedback. `kinds` is comma separated
+    (customer, order, feedback); results are paged with limit/offset."""
+    return search_index.search(q, kinds=[k.strip() for k in kinds.split(",")] if kinds else None,
+                               limit=max(1, min(limit, 100)), offset=max(0, offset))
+
+@app.get("/api/segments")
+def get_segments(segment: Optional[str] = None, limit: int = 100):
+    """Customer segment sizes (services.segmentation); with ?segment=, also its first `limit` customer ids."""
+    result = {"counts": segmentation.segment_counts(), "campaign_messages_queued": pending_notifications()}
+    if segment:
+        if segment not in segmentation.SEGMENTS:
+            raise HTTPException(status_code=400, detail=f"Unknown segment; expected one of {', '.join(segmentation.SEGMENTS)}.")
+        result["customers"] = segmentation.segment_members(segment, limit=max(1, min(limit, 1000)))
+    return result
+
+@app.get("/api/orders/board")
+def get_order_board(limit: Optional[int] = None, closed_hours: Optional[float] = None):
+    """Orders grouped into Kanban columns, newest first, with per-column counts and caps."""
+    return order_board.board(limit=max(1, min(limit, 500)) if limit else None, closed_hours=closed_hours)
 
 class UpdateRequest(BaseModel):
     collection: str # "menu", "orders", "promos"
@@ -84,42 +243,49 @@ class UpdateRequest(BaseModel):
     updates: dict
 
 @app.post("/api/data/update")
-def update_data(request: UpdateRequest):
+def update_data(request: UpdateRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    return _idempotent("data.update", idempotency_key, request, response, lambda: _update_data(request))
+
+def _update_data(request: UpdateRequest):
     if request.collection == "menu":
-        if request.item_id in MOCK_MENU_DB:
-            MOCK_MENU_DB[request.item_id].update(request.updates)
-            persist_changes()
-            return {"status": "success", "message": f"Menu item {request.item_id} updated."}
+        with transaction():
+            if request.item_id in MOCK_MENU_DB:
+                MOCK_MENU_DB[request.item_id].update(request.updates)
+                persist_changes()
+                publish(MENU_UPDATED, item_id=request.item_id)
+                return {"status": "success", "message": f"Menu item {request.item_id} updated."}
     elif request.collection == "orders":
         if request.item_id in MOCK_ORDER_DB:
-            MOCK_ORDER_DB[request.item_id].update(request.updates)
-            persist_changes()
-            
-            # --- Email Notification Trigger ---
             new_status = request.updates.get("status")
             new_payment = request.updates.get("payment_status")
-            
-            order = MOCK_ORDER_DB[request.item_id]
-            customer_id = order.get("customer_id")
-            customer = MOCK_CUSTOMER_DB.get(customer_id)
-            
-            # Award Loyalty Points if Payment is Confirmed (and not already awarded)
-            if new_payment == 'Paid' or (new_status == 'Processing' and order.get('payment_status') == 'Paid'):
-                # Check if points already given to avoid double counting? 
-                # Ideally we need a flag on order like 'points_awarded'.
-                if not order.get('points_awarded'):
-                    total_price = order.get('total', 0)
-                    # Logic: 10 points per 1000 naira (or 1 pt per 100)
-                    points_earned = int(total_price / 100)
-                    
+
+            # Held until the order, its stock and the points are all written (no email sent inside)
+            with transaction():
+                previous = {k: MOCK_ORDER_DB[request.item_id].get(k) for k in request.updates}
+                if new_status and new_status != previous.get("status"):
+                    # When it reached its column (the board shows recently Completed orders)
+                    previous["status_changed_at"] = MOCK_ORDER_DB[request.item_id].get("status_changed_at")
+                    MOCK_ORDER_DB[request.item_id]["status_changed_at"] = datetime.datetime.now().isoformat()
+                MOCK_ORDER_DB[request.item_id].update(request.updates)
+                persist_changes()
+                publish(ORDER_UPDATED, order=MOCK_ORDER_DB[request.item_id], changes=request.updates, previous=previous)
+                # Paid commits the order's reserved stock, Cancelled puts it back on sale
+                if apply_order_change(MOCK_ORDER_DB[request.item_id], previous):
+                    persist_changes()
+
+                order = MOCK_ORDER_DB[request.item_id]
+                customer_id = order.get("customer_id")
+                customer = MOCK_CUSTOMER_DB.get(customer_id)
+
+                # Award Loyalty Points if Payment is Confirmed (the ledger awards each order once)
+                if new_payment == 'Paid' or (new_status == 'Processing' and order.get('payment_status') == 'Paid'):
                     if customer:
-                        current_points = customer.get('loyalty_points', 0)
-                        customer['loyalty_points'] = current_points + points_earned
-                        # Flag order as processed for loyalty
-                        MOCK_ORDER_DB[request.item_id]['points_awarded'] = True
-                        persist_changes()
-                        print(f"--- Loyalty: Awarded {points_earned} pts to {customer_id} for Order {request.item_id}")
+                        points_earned = award_order_points(order)
+                        if points_earned:
+                            persist_changes()
+                            logger.info("Loyalty: Awarded %s pts to %s for Order %s", points_earned, customer_id, request.item_id)
 
+            # --- Email Notification Trigger ---
             if new_status:
                 if customer and customer.get("email"):
                     subject = f"Order Update: {request.item_id}"
@@ -128,10 +294,22 @@ def update_data(request: UpdateRequest):
             # ----------------------------------
             
             return {"status": "success", "message": f"Order {request.item_id} updated."}
+    elif request.collection == "promos":
+        with transaction():
+            promo = next((p for p in iter_promos() if p.get("id") == request.item_id), None)
+            if promo:
+                error = rules_error({**promo, **request.updates})
+                if error:
+                    return {"status": "error", "message": f"Invalid promo: {error}"}
+                promo.update(request.updates)
+                persist_changes()
+                publish(PROMOS_UPDATED, promo_id=request.item_id)
+                return {"status": "success", "message": f"Promo {request.item_id} updated."}
     elif request.collection == "site_settings":
-        for k, v in request.updates.items():
-            SITE_SETTINGS[k] = v
-        persist_changes()
+        with transaction():
+            for k, v in request.updates.items():
+                SITE_SETTINGS[k] = v
+            persist_changes()
         return {"status": "success", "message": "Site settings updated."}
     
     return {"status": "error", "message": "Item or Collection not found."}
@@ -141,18 +319,37 @@ def get_site_settings():
     return SITE_SETTINGS
 
 class AddRequest(BaseModel):
-    collection: str # "menu", "customers"
+    collection: str # "menu", "customers", "promos"
     item: dict
 
 @app.post("/api/data/add")
-def add_data(request: AddRequest):
+def add_data(request: AddRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    return _idempotent("data.add", idempotency_key, request, response, lambda: _add_data(request))
+
+@transactional
+def _add_data(request: AddRequest):
     if request.collection == "menu":
         item_id = request.item.get("id")
         if item_id and item_id not in MOCK_MENU_DB:
             MOCK_MENU_DB[item_id] = request.item
             persist_changes()
+            publish(MENU_UPDATED, item_id=item_id)
             return {"status": "success", "message": f"Menu item {item_id} added."}
         return {"status": "error", "message": "Item ID already exists or missing."}
+    elif request.collection == "promos":
+        promo_id = request.item.get("id")
+        if promo_id and not any(p.get("id") == promo_id for p in iter_promos()):
+            error = rules_error(request.item)
+            if error:
+                return {"status": "error", "message": f"Invalid promo: {error}"}
+            if isinstance(MOCK_PROMO_DB, dict):
+                MOCK_PROMO_DB[promo_id] = request.item
+            else:
+                MOCK_PROMO_DB.append(request.item)
+            persist_changes()
+            publish(PROMOS_UPDATED, promo_id=promo_id)
+            return {"status": "success", "message": f"Promo {promo_id} added."}
+        return {"status": "error", "message": "Promo ID already exists or missing."}
     elif request.collection == "customers":
         customer_id = request.item.get("id")
         if customer_id:
@@ -165,14 +362,11 @@ def add_data(request: AddRequest):
                         duplicates.append((cid, cust))
             if duplicates:
                 base = dict(incoming)
-                total_points = int(base.get("loyalty_points") or 0)
                 prefs = set(base.get("preferences") or [])
                 last_dates = [base.get("last_order_date")] + [d.get("last_order_date") for _, d in duplicates]
                 for old_id, old in duplicates:
-                    total_points += int(old.get("loyalty_points") or 0)
                     for p in old.get("preferences") or []:
                         prefs.add(p)
-                base["loyalty_points"] = total_points
                 base["preferences"] = list(prefs)
                 last_dates_clean = [d for d in last_dates if d]
                 if last_dates_clean:
@@ -189,9 +383,18 @@ def add_data(request: AddRequest):
                     if old_id in MOCK_CUSTOMER_DB:
                         del MOCK_CUSTOMER_DB[old_id]
                 MOCK_CUSTOMER_DB[customer_id] = base
+                # Points move through the ledger: the incoming balance (if given) plus each duplicate's
+                if "loyalty_points" in incoming:
+                    set_balance(customer_id, int(incoming.get("loyalty_points") or 0), reason="customer record")
+                merge_customers(customer_id, [old_id for old_id, _ in duplicates])
+                publish(CUSTOMERS_MERGED, target_id=customer_id, merged_ids=[old_id for old_id, _ in duplicates])
             else:
                 MOCK_CUSTOMER_DB[customer_id] = incoming
+                if "loyalty_points" in incoming:
+                    set_balance(customer_id, int(incoming.get("loyalty_points") or 0), reason="customer record")
+            MOCK_CUSTOMER_DB[customer_id]["loyalty_points"] = loyalty_balance(customer_id)
             persist_changes()
+            publish(CUSTOMER_UPDATED, customer_id=customer_id)
             return {"status": "success", "message": f"Customer {customer_id} added/updated."}
         return {"status": "error", "message": "Customer ID missing."}
     
@@ -202,63 +405,77 @@ class DeleteRequest(BaseModel):
     item_id: str
 
 @app.post("/api/data/delete")
-def delete_data(request: DeleteRequest):
+def delete_data(request: DeleteRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    return _idempotent("data.delete", idempotency_key, request, response, lambda: _delete_data(request))
+
+@transactional
+def _delete_data(request: DeleteRequest):
     if request.collection == "menu":
         if request.item_id in MOCK_MENU_DB:
             del MOCK_MENU_DB[request.item_id]
             persist_changes()
+            publish(MENU_UPDATED, item_id=request.item_id)
             return {"status": "success", "message": f"Menu item {request.item_id} deleted."}
         return {"status": "error", "message": "Item ID not found."}
     
     return {"status": "error", "message": "Delete not supported for this collection."}
 
 
-# --- Email Notification Helper ---
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+# Replies that mean the turn didn't run; they are not replayed, so a retry tries again
+CHAT_INIT_ERROR = "System initialization error. Please check server logs."
+CHAT_ERROR_REPLY = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
 
-def send_email_notification(to_email: str, subject: str, body: str):
-    """Sends an email notification via SMTP."""
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_EMAIL")
-    smtp_password = os.getenv("SMTP_PASSWORD")
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat_endpoint(request_data: ChatRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """The main chat endpoint that runs the LangGraph agent."""
+    if not idempotency_key:
+        return _chat_turn(request_data)
+    mutated = []
 
-    if not smtp_user or not smtp_password:
-        print(f"[MOCK EMAIL] To: {to_email} | Subject: {subject} | Body: {body}")
-        return
+    def turn():
+        from agents.agent_core import tracking_mutations   # lazy, like the graph itself
+        with tracking_mutations() as started:
+            reply = jsonable_encoder(_chat_turn(request_data))
+        mutated.extend(started)
+        return reply
 
     try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        print(f"[EMAIL SENT] To: {to_email}")
-    except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send to {to_email}: {e}")
-
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request_data: ChatRequest):
-    """The main chat endpoint that runs the LangGraph agent."""
-    
-    if not crm_agent_app:
+        # A failed turn frees the key for a retry, unless it got as far as an order or other write
+        result, replayed = await IDEMPOTENCY_CACHE.run_async(
+            *_idempotency_args("chat", idempotency_key, request_data),
+            turn,
+            keep=lambda reply: bool(mutated) or reply["response"] not in (CHAT_INIT_ERROR, CHAT_ERROR_REPLY),
+        )
+    except (IdempotencyConflict, IdempotencyInProgress) as e:
+        raise _replay_errors(e)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+def _chat_turn(request_data: ChatRequest) -> ChatResponse:
+    agent_app = get_crm_agent_app()
+    if not agent_app:
         return ChatResponse(
             user_id=request_data.user_id, 
-            response="System initialization error. Please check server logs."
+            response=CHAT_INIT_ERROR
         )
 
-    # 1. Prepare the initial state for the graph
-    initial_state: AgentState = {
+    # 1. Load the conversation from the session store
+    session_id = request_data.session_id or request_data.user_id
+    if request_data.chat_history:
+        history = request_data.chat_history
+        # Older clients include the current message as the last history entry
+        if isinstance(history[-1], dict) and history[-1].get("content") == request_data.message:
+            history = history[:-1]
+        SESSION_STORE.seed(session_id, history)
+    history_summary, recent_turns = SESSION_STORE.get(session_id).snapshot()
+
+    # 2. Prepare the initial state for the graph (see workflows.agent_state.AgentState)
+    initial_state = {
         "user_id": request_data.user_id,
         "input_query": request_data.message,
-        "chat_history": request_data.chat_history,
+        "chat_history": recent_turns,
+        "history_summary": history_summary,
         "customer_profile": {},
         "tools_to_run": [],
         "tool_output": [],
@@ -266,29 +483,31 @@ async def chat_endpoint(request_data: ChatRequest):
         "final_response": "",
     }
 
-    # 2. Invoke the LangGraph (The entire agentic loop runs here)
+    # 3. Invoke the LangGraph (The entire agentic loop runs here)
     try:
         # Note: We use .invoke() for a single-turn synchronous call
-        final_state = crm_agent_app.invoke(initial_state)
+        with span("chat_turn", kind="server", user_id=request_data.user_id) as turn:
+            final_state = agent_app.invoke(initial_state)
+            turn.set(intent=final_state.get("intent", ""), tools=[t.get("tool") for t in final_state.get("tools_to_run") or []])
         
         final_response_text = final_state.get("final_response", "Sorry, I encountered an internal error.")
 
-        # 3. Return the response
+        SESSION_STORE.append(session_id, "user", request_data.message)
+        SESSION_STORE.append(session_id, "assistant", final_response_text)
+
+        # 4. Return the response
         return ChatResponse(
             user_id=request_data.user_id,
             response=final_response_text
         )
 
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"LangGraph execution error: {e}")
-        with open("server_errors.log", "a") as f:
-            f.write(f"\n--- ERROR ---\n{error_details}\n")
+        # Goes to the rotating error log via the background log listener
+        logger.exception("LangGraph execution error: %s", e)
         
         return ChatResponse(
             user_id=request_data.user_id,
-            response="I'm sorry, I'm having trouble processing your request right now. Please try again later."
+            response=CHAT_ERROR_REPLY
         )
 
 # For local development, you would run this via Uvicorn (e.g., uvicorn api.index:app --reload)
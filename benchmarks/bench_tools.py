@@ -0,0 +1,233 @@
+# benchmarks/bench_tools.py
+"""
+Micro-benchmarks for the CRM tools and persistence at several dataset sizes.
+
+For each size a synthetic dataset is generated (Mock_data.generate_data) and
+a fresh interpreter loads it through CRM_DATA_FILE, so every size starts from
+a cold process and the repo's data.json is never touched. Each case is timed
+over --repeat iterations after one warm-up call (lazy indexes get built
+there), then run once more under tracemalloc for its peak allocation.
+
+Cases: every tool in tools/crm_tools.py that touches the data (feedback and
+profile updates included), persist_changes, load_data and the add_data
+customer merge.
+
+Results are written as JSON. With --baseline, medians and peak memory are
+compared per (size, case) and the run fails when any case is slower or
+bigger than the baseline by more than --threshold (and by more than a small
+absolute noise floor).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_tools --sizes 1000,10000 --out bench_results.json
+    python -m benchmarks.bench_tools --save-baseline benchmarks/baseline_tools.json
+    python -m benchmarks.bench_tools --baseline benchmarks/baseline_tools.json --threshold 0.25
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Differences below these are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.5
+NOISE_FLOOR_KIB = 64
+
+# Fixed so every run benchmarks byte-identical datasets
+DATASET_END_DATE = datetime.date(2026, 1, 1)
+
+
+# --- Worker (runs inside the per-size interpreter) ---
+
+def _cases():
+    """{name: prepare(i) -> zero-arg callable}. prepare runs untimed."""
+    from Mock_data.mock_data import MOCK_CUSTOMER_DB, MOCK_MENU_DB, MOCK_ORDER_DB, persist_changes, load_data
+    from tools.crm_tools import (
+        GetMenuAndPrice, GetCustomerProfile, UpdateDeliveryStatus, SearchPromotions,
+        SuggestPersonalizedMeal, ProcessOrder, NotifyPaymentMade, GetDeliveryTimes,
+        LogFeedbackAndComplaint, UpdateCustomerProfile,
+    )
+    from api.index import _add_data, AddRequest
+
+    customer_ids = [cid for cid in MOCK_CUSTOMER_DB if cid != "NEW_USER"]
+    regular = max(customer_ids, key=lambda cid: MOCK_CUSTOMER_DB[cid].get("loyalty_points") or 0)
+    order_id = next(iter(MOCK_ORDER_DB))
+    item_id = next(k for k, v in MOCK_MENU_DB.items() if v.get("is_available"))
+    pending = next((o["customer_id"] for o in MOCK_ORDER_DB.values() if o.get("status") == "Pending Payment"), regular)
+    # Each merge folds a different existing customer into a new id by shared email
+    merge_sources = [MOCK_CUSTOMER_DB[cid] for cid in customer_ids[: max(1, len(customer_ids) // 2)] if MOCK_CUSTOMER_DB[cid].get("email")]
+
+    def merge(i):
+        source = merge_sources[i % len(merge_sources)]
+        request = AddRequest(collection="customers", item={"id": f"BENCH-M{i}", "email": source["email"], "name": ""})
+        return lambda: _add_data(request)
+
+    return {
+        "GetMenuAndPrice": lambda i: lambda: GetMenuAndPrice.invoke({"query": "all"}),
+        "GetCustomerProfile": lambda i: lambda: GetCustomerProfile.invoke({"user_id": regular}),
+        "UpdateDeliveryStatus": lambda i: lambda: UpdateDeliveryStatus.invoke({"order_id": order_id}),
+        "SearchPromotions": lambda i: lambda: SearchPromotions.invoke({"user_id": regular}),
+        "SuggestPersonalizedMeal": lambda i: lambda: SuggestPersonalizedMeal.invoke(
+            {"customer_preferences": ["Chocolate"], "last_order_date": "", "user_id": regular}),
+        "GetDeliveryTimes": lambda i: lambda: GetDeliveryTimes.invoke({}),
+        "ProcessOrder": lambda i: lambda: ProcessOrder.invoke(
+            {"user_id": f"BENCH-{i}", "items": [{"item_id": item_id, "quantity": 2}]}),
+        "NotifyPaymentMade": lambda i: lambda: NotifyPaymentMade.invoke({"user_id": pending}),
+        "LogFeedbackAndComplaint": lambda i: lambda: LogFeedbackAndComplaint.invoke(
+            {"user_id": regular, "message": f"Bench feedback {i}: the cupcakes were late", "sentiment": "Negative"}),
+        "UpdateCustomerProfile": lambda i: lambda: UpdateCustomerProfile.invoke({"user_id": regular, "name": f"Bench Customer {i}"}),
+        "persist_changes": lambda i: persist_changes,
+        "load_data": lambda i: load_data,
+        "add_data_merge": merge,
+    }
+
+
+def run_worker(size: int, repeat: int, budget: float, result_path: str):
+    started = time.perf_counter()
+    cases = _cases()
+    results = {"_load": {"seconds": time.perf_counter() - started}}
+
+    for name, prepare in cases.items():
+        prepare(0)()   # warm-up
+        timings = []
+        case_start = time.perf_counter()
+        for i in range(1, repeat + 1):
+            fn = prepare(i)
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+            if time.perf_counter() - case_start > budget:
+                break
+
+        fn = prepare(repeat + 1)
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        results[name] = {
+            "runs": len(timings),
+            "median_ms": statistics.median(timings),
+            "min_ms": timings[0],
+            "p95_ms": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+            "peak_kib": peak / 1024,
+        }
+
+    try:
+        import resource
+        results["_load"]["max_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:   # Windows
+        pass
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+# --- Driver ---
+
+def bench_size(size: int, args) -> dict:
+    from Mock_data.generate_data import generate
+    workdir = tempfile.mkdtemp(prefix=f"crm-bench-{size}-")
+    try:
+        data_file = os.path.join(workdir, "data.json")
+        counts = generate(data_file, size, args.menu_size, 3.0, 0.1, 365, args.seed,
+                          end_date=DATASET_END_DATE, progress=False)
+        result_file = os.path.join(workdir, "result.json")
+        env = dict(os.environ, CRM_DATA_FILE=data_file, LOG_LEVEL="ERROR", LOG_ERROR_FILE="", LLM_PROVIDER_MODE="fake")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_tools", "--worker", "--size", str(size),
+             "--repeat", str(args.repeat), "--budget", str(args.budget), "--result", result_file],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark worker for size {size} failed:\n{proc.stderr[-3000:]}")
+        with open(result_file, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        results["_load"].update({"orders": counts["orders"], "bytes": counts["bytes"]})
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """[(size, case, metric, baseline, current)] for every regression."""
+    regressions = []
+    for size, cases in current["sizes"].items():
+        for case, row in cases.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(case)
+            if case.startswith("_") or not base:
+                continue
+            for metric, floor in (("median_ms", NOISE_FLOOR_MS), ("peak_kib", NOISE_FLOOR_KIB)):
+                if row[metric] > base[metric] * (1 + threshold) and row[metric] - base[metric] > floor:
+                    regressions.append((size, case, metric, base[metric], row[metric]))
+    return regressions
+
+
+def print_results(results: dict, baseline: dict = None):
+    for size, cases in results["sizes"].items():
+        load = cases["_load"]
+        print(f"\n== {int(size):,} customers / {load['orders']:,} orders "
+              f"({load['bytes'] / 1e6:.1f} MB, loaded in {load['seconds']:.2f}s"
+              + (f", max RSS {load['max_rss_mib']:.0f} MiB" if "max_rss_mib" in load else "") + ")")
+        print(f"{'case':<26}{'runs':>6}{'median ms':>12}{'p95 ms':>10}{'peak KiB':>11}{'vs base':>10}")
+        for case, row in cases.items():
+            if case.startswith("_"):
+                continue
+            base = (baseline or {}).get("sizes", {}).get(size, {}).get(case)
+            delta = f"{row['median_ms'] / base['median_ms'] - 1:+.0%}" if base and base["median_ms"] else ""
+            print(f"{case:<26}{row['runs']:>6}{row['median_ms']:>12.3f}{row['p95_ms']:>10.3f}{row['peak_kib']:>11.1f}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated customer counts")
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20, help="timed iterations per case")
+    parser.add_argument("--budget", type=float, default=5.0, help="max seconds of timed iterations per case")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/growth, 0.25 = 25%%")
+    parser.add_argument("--save-baseline", help="also write these results as the new baseline")
+    # Internal: one size in a fresh interpreter
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.size, args.repeat, args.budget, args.result)
+        return
+
+    results = {"python": sys.version.split()[0], "repeat": args.repeat, "sizes": {}}
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"benchmarking {size:,} customers...", file=sys.stderr)
+        results["sizes"][str(size)] = bench_size(size, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for size, case, metric, before, after in regressions:
+            print(f"REGRESSION {case} @ {int(size):,}: {metric} {before:.3f} -> {after:.3f}")
+        print("OK" if not regressions else f"FAIL: {len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test: chat traffic plus dashboard polling and Kanban updates.
+
+Chat workers send a realistic mix of customer messages (greetings, menu,
+orders, status checks, payment claims, feedback, promos) to /api/chat while
+dashboard pollers read /api/data/orders and /api/data/customers, and Kanban
+workers move load-test orders across the board via /api/data/update
+(marking them Paid on the way, which awards loyalty points).
+
+Runs against the app in-process (default) or over HTTP (--url, or --serve to
+start a uvicorn server for the run). In-process runs use the offline fake LLM
+provider and a scratch copy of data.json, so the repo's data is never touched.
+A server you start yourself should be run with LLM_PROVIDER_MODE=fake.
+
+At the end it reports throughput, latency percentiles and error rates per
+endpoint, and checks data integrity:
+  * every order ID confirmed to a customer exists (and none was handed out twice)
+  * each load-test customer's loyalty points equal the points of their paid orders
+
+The run fails (exit 1) on an integrity error, on any endpoint whose error rate
+is above --max-error-rate, and on any 5xx response unless --allow-server-errors.
+
+Usage (from the repo root):
+    python -m benchmarks.load_test --duration 30 --chat-workers 16
+    python -m benchmarks.load_test --serve --duration 30 --json load_report.json
+    python -m benchmarks.load_test --url http://localhost:8000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Chat traffic mix: (weight, kind). Order turns dominate, as in production.
+CHAT_MIX = [
+    (10, "greeting"),
+    (20, "menu"),
+    (25, "order"),
+    (10, "status"),
+    (10, "payment"),
+    (10, "feedback"),
+    (10, "promo"),
+    (5, "smalltalk"),
+]
+
+KANBAN_FLOW = ["Pending Payment", "Processing", "Ready for Delivery", "Out for Delivery", "Completed"]
+
+ORDER_ID_PATTERN = re.compile(r"Order ID: (O-[\w-]+)")
+FALLBACK_REPLY = "having trouble processing your request"
+
+
+def _scenario_env(data_file: str) -> dict:
+    return {
+        "LLM_PROVIDER_MODE": "fake",
+        "CRM_DATA_FILE": data_file,
+        "LOG_LEVEL": "WARNING",
+        "LOG_ERROR_FILE": "",
+    }
+
+
+# Load orders would fill the real delivery windows within seconds; the scratch copy gets room for them
+LOAD_DELIVERY_SETTINGS = {"delivery_riders": 1000, "delivery_orders_per_rider": 10, "oven_units_per_window": 1_000_000}
+
+
+def _scratch_data_file() -> str:
+    """Copies the current data.json so the run starts from the real catalogue without mutating it."""
+    scratch = os.path.join(tempfile.mkdtemp(prefix="crm-load-"), "data.json")
+    source = os.path.join(REPO_ROOT, "data.json")
+    if os.path.exists(source):
+        shutil.copyfile(source, scratch)
+        with open(scratch, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data.setdefault("site_settings", {}).update(LOAD_DELIVERY_SETTINGS)
+        with open(scratch, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return scratch
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.server_errors = defaultdict(int)   # 5xx, or the in-process app raising
+
+    def record(self, endpoint: str, seconds: float, ok: bool, server_error: bool = False):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if server_error:
+                self.server_errors[endpoint] += 1
+
+
+def _percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadTest:
+    def __init__(self, make_client, args):
+        self.make_client = make_client
+        self.args = args
+        self.stats = Stats()
+        self.stop = threading.Event()
+        self.rng_lock = threading.Lock()
+        self.rng = random.Random(args.seed)
+        self.user_ids = [f"LOAD-{args.seed}-{i:04d}" for i in range(args.users)]
+        self.confirmed_orders = defaultdict(list)   # order_id -> [user_id, ...]
+        self.orders_lock = threading.Lock()
+        self.menu_names = []
+
+    # --- helpers ---
+
+    def _call(self, client, endpoint: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+            server_error = response.status_code >= 500
+        except Exception:
+            response, ok, server_error = None, False, True
+        elapsed = time.perf_counter() - start
+        if ok and endpoint.startswith("chat:") and FALLBACK_REPLY in response.json().get("response", ""):
+            ok = False
+        self.stats.record(endpoint, elapsed, ok, server_error)
+        return response if ok else None
+
+    def _pick(self, seq):
+        with self.rng_lock:
+            return self.rng.choice(seq)
+
+    def _chat_message(self, kind: str, user_id: str):
+        with self.orders_lock:
+            mine = [oid for oid, users in self.confirmed_orders.items() if user_id in users] if kind == "status" else []
+        with self.rng_lock:
+            rng = self.rng
+            if kind == "greeting":
+                return rng.choice(["Hi", "Hello", "Good morning", "hey"])
+            if kind == "menu":
+                return rng.choice(["Show me the menu", "What are your prices?", "What's available today?"])
+            if kind == "order":
+                return f"I'd like to order {rng.randint(1, 4)} {rng.choice(self.menu_names)}"
+            if kind == "status":
+                return f"What's the status of order {rng.choice(mine)}?" if mine else "Where is my order?"
+            if kind == "payment":
+                return rng.choice(["I have paid for my order", "I just made payment", "I transferred the money"])
+            if kind == "feedback":
+                return rng.choice([
+                    "[FEEDBACK] The cupcakes were lovely, thank you!",
+                    "My delivery was late and the cake was cold",
+                    "[FEEDBACK] Packaging could be better",
+                ])
+            if kind == "promo":
+                return rng.choice(["Do you have any deals?", "Any promotions this week?", "Can you recommend something?"])
+            return rng.choice(["Thanks!", "Thank you so much", "What time do you deliver?"])
+
+    # --- workers ---
+
+    def chat_worker(self, deadline: float):
+        client = self.make_client()
+        kinds = [kind for weight, kind in CHAT_MIX for _ in range(weight)]
+        while time.perf_counter() < deadline:
+            user_id = self._pick(self.user_ids)
+            kind = self._pick(kinds)
+            message = self._chat_message(kind, user_id)
+            response = self._call(client, f"chat:{kind}", "POST", "/api/chat", json={"user_id": user_id, "message": message})
+            if response is not None and kind == "order":
+                match = ORDER_ID_PATTERN.search(response.json().get("response", ""))
+                if match:
+                    with self.orders_lock:
+                        self.confirmed_orders[match.group(1)].append(user_id)
+
+    def dashboard_poller(self):
+        client = self.make_client()
+        while not self.stop.is_set():
+            self._call(client, "GET /api/data/orders", "GET", "/api/data/orders")
+            self._call(client, "GET /api/data/customers", "GET", "/api/data/customers")
+            self.stop.wait(self.args.poll_interval)
+
+    def kanban_worker(self):
+        client = self.make_client()
+        prefix = f"LOAD-{self.args.seed}-"
+        while not self.stop.is_set():
+            response = self._call(client, "GET /api/data/orders", "GET", "/api/data/orders")
+            movable = []
+            if response is not None:
+                movable = [o for o in response.json().values()
+                           if str(o.get("customer_id", "")).startswith(prefix) and o.get("status") in KANBAN_FLOW[:-1]]
+            if movable:
+                order = self._pick(movable)
+                next_status = KANBAN_FLOW[KANBAN_FLOW.index(order["status"]) + 1]
+                updates = {"status": next_status}
+                # Paid at the Processing step; sometimes re-sent later, like a double click
+                if next_status == "Processing" or self._pick([False] * 9 + [True]):
+                    updates["payment_status"] = "Paid"
+                self._call(client, "POST /api/data/update", "POST", "/api/data/update",
+                           json={"collection": "orders", "item_id": order["id"], "updates": updates})
+            self.stop.wait(self.args.kanban_interval)
+
+    # --- run ---
+
+    def run(self) -> dict:
+        client = self.make_client()
+        menu = client.get("/api/data/menu").json()
+        self.menu_names = [m["name"] for m in menu.values() if m.get("is_available", True)] or ["Red Velvet Cupcake"]
+        customers_before = client.get("/api/data/customers").json()
+        points_before = {uid: int((customers_before.get(uid) or {}).get("loyalty_points") or 0) for uid in self.user_ids}
+
+        deadline = time.perf_counter() + self.args.duration
+        background = [threading.Thread(target=self.dashboard_poller, daemon=True) for _ in range(self.args.pollers)]
+        background += [threading.Thread(target=self.kanban_worker, daemon=True) for _ in range(self.args.kanban_workers)]
+        chatters = [threading.Thread(target=self.chat_worker, args=(deadline,), daemon=True) for _ in range(self.args.chat_workers)]
+
+        started = time.perf_counter()
+        for t in background + chatters:
+            t.start()
+        for t in chatters:
+            t.join()
+        self.stop.set()
+        for t in background:
+            t.join()
+        wall = time.perf_counter() - started
+
+        integrity = self.check_integrity(client, points_before)
+        return self.report(wall, integrity)
+
+    def check_integrity(self, client, points_before: dict) -> dict:
+        orders = client.get("/api/data/orders").json()
+        customers = client.get("/api/data/customers").json()
+
+        confirmations = sum(len(users) for users in self.confirmed_orders.values())
+        missing = sorted(oid for oid in self.confirmed_orders if oid not in orders)
+        # An ID handed out twice means the second order overwrote the first
+        duplicated = sorted(oid for oid, users in self.confirmed_orders.items() if len(users) > 1)
+        surviving = sum(1 for oid in self.confirmed_orders if oid in orders)
+
+        loyalty_mismatches = []
+        for user_id in self.user_ids:
+            earned = sum(int((o.get("total") or 0) / 100) for o in orders.values()
+                         if o.get("customer_id") == user_id and o.get("points_awarded"))
+            actual = int((customers.get(user_id) or {}).get("loyalty_points") or 0)
+            expected = points_before[user_id] + earned
+            if user_id in customers and actual != expected:
+                loyalty_mismatches.append({"user_id": user_id, "expected": expected, "actual": actual})
+
+        unawarded = sorted(o["id"] for o in orders.values()
+                           if str(o.get("customer_id", "")).startswith(f"LOAD-{self.args.seed}-")
+                           and o.get("payment_status") == "Paid" and not o.get("points_awarded"))
+
+        return {
+            "orders_confirmed": confirmations,
+            "orders_lost": confirmations - surviving,
+            "missing_order_ids": missing,
+            "duplicate_order_ids": duplicated,
+            "loyalty_mismatches": loyalty_mismatches,
+            "paid_without_points": unawarded,
+            "ok": not (missing or duplicated or loyalty_mismatches or unawarded),
+        }
+
+    def report(self, wall: float, integrity: dict) -> dict:
+        endpoints = {}
+        total = errors = 0
+        for endpoint, samples in sorted(self.stats.latencies.items()):
+            ordered = sorted(samples)
+            count, failed = len(ordered), self.stats.errors.get(endpoint, 0)
+            total += count
+            errors += failed
+            endpoints[endpoint] = {
+                "count": count,
+                "rps": count / wall if wall else 0.0,
+                "error_rate": failed / count if count else 0.0,
+                "server_errors": self.stats.server_errors.get(endpoint, 0),
+                "p50_ms": _percentile(ordered, 0.5) * 1000,
+                "p95_ms": _percentile(ordered, 0.95) * 1000,
+                "p99_ms": _percentile(ordered, 0.99) * 1000,
+                "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            }
+        return {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("json",)},
+            "wall_seconds": wall,
+            "requests": total,
+            "rps": total / wall if wall else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "endpoints": endpoints,
+            "integrity": integrity,
+        }
+
+
+def print_report(report: dict):
+    print(f"\n{report['requests']} requests in {report['wall_seconds']:.1f}s "
+          f"-> {report['rps']:.1f} req/s, error rate {report['error_rate']:.2%}\n")
+    print(f"{'endpoint':<28}{'count':>7}{'rps':>8}{'err':>8}{'5xx':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<28}{row['count']:>7}{row['rps']:>8.1f}{row['error_rate']:>8.1%}{row['server_errors']:>6}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+    integrity = report["integrity"]
+    print(f"\nintegrity: {integrity['orders_confirmed']} orders confirmed, "
+          f"{integrity['orders_lost']} lost, {len(integrity['duplicate_order_ids'])} duplicate ids, "
+          f"{len(integrity['loyalty_mismatches'])} loyalty mismatches, "
+          f"{len(integrity['paid_without_points'])} paid without points")
+    if not integrity["ok"]:
+        print("FAIL: data integrity check failed")
+
+
+def failures(report: dict, max_error_rate: float, allow_server_errors: bool) -> list:
+    """Why the run fails: integrity, any endpoint over the error budget, any server error."""
+    reasons = [] if report["integrity"]["ok"] else ["data integrity check failed"]
+    for endpoint, row in report["endpoints"].items():
+        if row["error_rate"] > max_error_rate:
+            reasons.append(f"{endpoint}: error rate {row['error_rate']:.1%} over {max_error_rate:.1%}")
+        if row["server_errors"] and not allow_server_errors:
+            reasons.append(f"{endpoint}: {row['server_errors']} server errors")
+    return reasons
+
+
+def _in_process_client_factory():
+    from fastapi.testclient import TestClient
+    from api.index import app
+    return lambda: TestClient(app)
+
+
+def _http_client_factory(base_url: str):
+    import httpx
+    return lambda: httpx.Client(base_url=base_url, timeout=60.0)
+
+
+def _start_server(port: int, env: dict):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.index:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=dict(os.environ, **env),
+    )
+    import httpx
+    for _ in range(100):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server (default: in-process)")
+    target.add_argument("--serve", action="store_true", help="start uvicorn with the fake provider for this run")
+    parser.add_argument("--port", type=int, default=8765, help="port for --serve")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of chat traffic")
+    parser.add_argument("--chat-workers", type=int, default=8)
+    parser.add_argument("--pollers", type=int, default=2, help="dashboard tabs polling orders/customers")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--kanban-workers", type=int, default=1)
+    parser.add_argument("--kanban-interval", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=50, help="distinct simulated customers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit 1 if any endpoint's error rate is above this")
+    parser.add_argument("--allow-server-errors", action="store_true", help="don't fail on 5xx responses within the error rate")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        make_client = _http_client_factory(args.url)
+    else:
+        env = _scenario_env(_scratch_data_file())
+        if args.serve:
+            server = _start_server(args.port, env)
+            make_client = _http_client_factory(f"http://127.0.0.1:{args.port}")
+        else:
+            for key, value in env.items():
+                os.environ.setdefault(key, value)
+            sys.path.insert(0, REPO_ROOT)
+            make_client = _in_process_client_factory()
+
+    try:
+        report = LoadTest(make_client, args).run()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    reasons = failures(report, args.max_error_rate, args.allow_server_errors)
+    for reason in reasons:
+        print(f"FAIL: {reason}")
+    if not reasons:
+        print("OK")
+    sys.exit(1 if reasons else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/startup_importtime.py
+"""
+Guards the cold-start cost of the API.
+
+Runs `python -X importtime -c "import api.index"` in a fresh interpreter and
+checks that:
+  1. none of the agent stack (LangGraph, LangChain, provider SDKs) is imported, and
+  2. importing api.index costs at most FastAPI's own import time plus a budget.
+
+Usage (from the repo root):
+    python -m benchmarks.startup_importtime            # exit code 1 on regression
+    python -m benchmarks.startup_importtime --runs 5 --budget-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported once /api/chat is hit
+FORBIDDEN_PREFIXES = (
+    "langgraph", "langchain", "langchain_core", "langchain_groq", "langchain_openai",
+    "openai", "groq", "agents.agent_core", "workflows.crm_graph", "tools.crm_tools",
+)
+
+
+def import_profile(module: str) -> dict:
+    """Returns {module_name: cumulative_us} for one cold import of `module`."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    profile = {}
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def best_of(module: str, runs: int):
+    profiles = [import_profile(module) for _ in range(runs)]
+    best = min(profiles, key=lambda p: p.get(module, 0))
+    return best.get(module, 0) / 1000.0, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold imports per module; the fastest is kept")
+    parser.add_argument("--budget-ms", type=float, default=250.0,
+                        help="allowed import time of api.index on top of fastapi's")
+    args = parser.parse_args()
+
+    fastapi_ms, _ = best_of("fastapi", args.runs)
+    api_ms, profile = best_of("api.index", args.runs)
+    leaked = sorted(name for name in profile if name.startswith(FORBIDDEN_PREFIXES))
+
+    print(f"import fastapi   : {fastapi_ms:8.1f} ms")
+    print(f"import api.index : {api_ms:8.1f} ms  (budget {fastapi_ms + args.budget_ms:.1f} ms)")
+    heaviest = sorted(((us, name) for name, us in profile.items() if "." not in name), reverse=True)[:8]
+    print("heaviest top-level imports:")
+    for us, name in heaviest:
+        print(f"  {us / 1000.0:8.1f} ms  {name}")
+
+    failed = False
+    if leaked:
+        failed = True
+        print(f"FAIL: agent stack imported at startup: {', '.join(leaked[:10])}")
+    if api_ms > fastapi_ms + args.budget_ms:
+        failed = True
+        print("FAIL: api.index import time over budget")
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
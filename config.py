@@ -63,6 +63,23 @@ class Config:
         },
     ]
 
+    # Offline mode: LLM_PROVIDER_MODE=fake swaps the providers above for local
+    # rule-based fakes (agents.fake_llm) so the chat path runs without network.
+    LLM_PROVIDER_MODE = os.getenv("LLM_PROVIDER_MODE", "live").lower()
+    FAKE_LLM_PROVIDERS = int(os.getenv("FAKE_LLM_PROVIDERS", "2"))
+    FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+    FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+    FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+    # Comma separated, one value per fake provider (the last one repeats)
+    FAKE_LLM_ERROR_RATES = os.getenv("FAKE_LLM_ERROR_RATES", "0")
+    FAKE_LLM_RATE_LIMIT_RATES = os.getenv("FAKE_LLM_RATE_LIMIT_RATES", "0")
+    FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT", "")
+    if LLM_PROVIDER_MODE == "fake":
+        PROVIDERS = [
+            {"name": f"Fake-{i + 1}", "kind": "fake", "index": i, "base_url": "", "key": "fake", "model": "fake-rules"}
+            for i in range(max(FAKE_LLM_PROVIDERS, 1))
+        ]
+
     # Database/Data Source Settings
     # Use this for mock data access and potential future database connection
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/crm_db.db")
@@ -70,11 +87,119 @@ class Config:
     # API Settings
     API_HOST = "0.0.0.0"
     API_PORT = 8000
+    # Uvicorn worker processes for main.start_api_server; more than one needs STATE_BACKEND=sqlite
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+    # Compile the agent graph in the background at startup instead of on the first chat
+    AGENT_WARMUP = os.getenv("AGENT_WARMUP", "false").lower() == "true"
+
+    # Node bits of generated record IDs (services.ids). Defaults to a host+pid
+    # hash; set a distinct value per instance when running on several hosts.
+    ID_NODE = int(os.getenv("ID_NODE")) if os.getenv("ID_NODE") else None
+
+    # Observability: finished spans are appended here as JSON lines when set
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+    # Logging (see services.logger): LOG_FORMAT is "json" or "plain"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+    # Share of verbose debug dumps (whole tool outputs) that are actually written
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+    LOG_ERROR_FILE = os.getenv("LOG_ERROR_FILE", "server_errors.log")
+    LOG_ERROR_MAX_BYTES = int(os.getenv("LOG_ERROR_MAX_BYTES", str(5 * 1024 * 1024)))
+    LOG_ERROR_BACKUPS = int(os.getenv("LOG_ERROR_BACKUPS", "3"))
     
+    # Feedback log (services.feedback_log): rotated JSONL segments, next to the
+    # data file unless FEEDBACK_LOG_DIR is set
+    FEEDBACK_LOG_DIR = os.getenv("FEEDBACK_LOG_DIR", "")
+    FEEDBACK_SEGMENT_MAX_BYTES = int(os.getenv("FEEDBACK_SEGMENT_MAX_BYTES", str(1024 * 1024)))
+
+    # Sales analytics (services.analytics): days of hourly revenue kept in memory
+    ANALYTICS_HOURLY_DAYS = int(os.getenv("ANALYTICS_HOURLY_DAYS", "7"))
+    # Columnar order exports (services.columnar_orders); next to the data file by default
+    COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "")
+
+    # Loyalty ledger (services.loyalty_ledger): next to the data file unless set;
+    # balances are checkpointed every N events
+    LOYALTY_LEDGER_DIR = os.getenv("LOYALTY_LEDGER_DIR", "")
+    LOYALTY_CHECKPOINT_EVERY = int(os.getenv("LOYALTY_CHECKPOINT_EVERY", "1000"))
+
+    # Stock reservations (services.inventory): unpaid, unclaimed orders release
+    # their stock after the TTL; the sweeper checks every STOCK_SWEEP_SECONDS
+    STOCK_RESERVATION_TTL_MINUTES = float(os.getenv("STOCK_RESERVATION_TTL_MINUTES", "30"))
+    STOCK_SWEEP_SECONDS = float(os.getenv("STOCK_SWEEP_SECONDS", "30"))
+    STOCK_LOCK_STRIPES = int(os.getenv("STOCK_LOCK_STRIPES", "16"))
+
+    # Shared state (Mock_data.state_store): "json" keeps everything in data.json
+    # for a single process; "sqlite" keeps the records in STATE_DB_FILE (next to
+    # the data file by default) so several workers or instances share them.
+    # WAL needs all processes on one host; use "DELETE" on a network volume.
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "json").lower()
+    STATE_DB_FILE = os.getenv("STATE_DB_FILE", "")
+    STATE_DB_JOURNAL_MODE = os.getenv("STATE_DB_JOURNAL_MODE", "WAL").upper()
+
+    # Orders Kanban (services.order_board): orders per column, and how long
+    # Completed / Cancelled orders stay on the board
+    ORDER_BOARD_COLUMN_LIMIT = int(os.getenv("ORDER_BOARD_COLUMN_LIMIT", "50"))
+    ORDER_BOARD_CLOSED_HOURS = float(os.getenv("ORDER_BOARD_CLOSED_HOURS", "24"))
+
+    # Idempotency-Key (services.idempotency): how long a response is replayed,
+    # how many keys are kept, and how long a duplicate waits for the first request
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+
+    # Campaign email (services.notifications): queued messages are paced by a
+    # token bucket, NOTIFY_RATE_PER_SECOND on average in bursts of NOTIFY_BURST
+    NOTIFY_RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", "5"))
+    NOTIFY_BURST = int(os.getenv("NOTIFY_BURST", "20"))
+    NOTIFY_QUEUE_MAX = int(os.getenv("NOTIFY_QUEUE_MAX", "500000"))
+
+    # Customer segments and re-engagement campaigns (services.segmentation).
+    # Lapsed segments start this many days after the last order; first-timers
+    # get a follow-up FIRST_TIMER_FOLLOWUP_DAYS after their only order.
+    # CAMPAIGNS_ENABLED runs the campaign job every CAMPAIGN_INTERVAL_SECONDS.
+    SEGMENT_LAPSED_DAYS = [int(d) for d in os.getenv("SEGMENT_LAPSED_DAYS", "14,30,60").split(",") if d.strip()]
+    FIRST_TIMER_FOLLOWUP_DAYS = float(os.getenv("FIRST_TIMER_FOLLOWUP_DAYS", "7"))
+    CAMPAIGNS_ENABLED = os.getenv("CAMPAIGNS_ENABLED", "false").lower() == "true"
+    CAMPAIGN_INTERVAL_SECONDS = float(os.getenv("CAMPAIGN_INTERVAL_SECONDS", "3600"))
+    CAMPAIGN_LOG_DIR = os.getenv("CAMPAIGN_LOG_DIR", "")
+
+    # Menu images (services.images): resized WebP/JPEG variants of the images
+    # under IMAGE_SOURCE_DIR (dashboard/public by default), cached in
+    # IMAGE_CACHE_DIR (next to the data file by default). Only IMAGE_WIDTHS are served.
+    IMAGE_SOURCE_DIR = os.getenv("IMAGE_SOURCE_DIR", "")
+    IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "")
+    IMAGE_WIDTHS = [int(w) for w in os.getenv("IMAGE_WIDTHS", "160,320,480,640,960,1280").split(",") if w.strip()]
+    IMAGE_DEFAULT_WIDTH = int(os.getenv("IMAGE_DEFAULT_WIDTH", "640"))
+    IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+    IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+
     # System Statuses
     ORDER_STATUSES = ["Processing", "Ready for Delivery", "Out for Delivery", "Completed"]
     CRITICAL_SENTIMENT = ["crisis", "negative"]
 
+    # Loyalty tiers (minimum points), highest first. Promotions can target a tier.
+    LOYALTY_TIERS = [("Gold", 2000), ("Silver", 500), ("Bronze", 0)]
+    # Customers at or above this tier carry the "High Loyalty" promo tag
+    HIGH_LOYALTY_TIER = "Silver"
+
+    # Tool Execution Settings
+    # Read-only tools in a single turn run concurrently on a bounded pool;
+    # mutating tools are serialized per user. The timeout applies to read-only
+    # tools only: mutating tools (ProcessOrder...) always run to completion.
+    TOOL_EXECUTOR_MAX_WORKERS = int(os.getenv("TOOL_EXECUTOR_MAX_WORKERS", "8"))
+    TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "15"))
+
+    # Conversation Session Settings
+    # Recent turns are kept verbatim; older turns are folded into a rolling summary.
+    SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "12"))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    SESSION_LLM_SUMMARY = os.getenv("SESSION_LLM_SUMMARY", "false").lower() == "true"
+    # Prompt budget for the whole history section (summary included), in tokens.
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "500"))
+    SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "150"))
+
     # LLM availability flag: allow app to run without keys for non-LLM endpoints
     LLM_ENABLED = bool(GROQ_API_KEY or any(p.get('key') for p in PROVIDERS))
 
@@ -5,9 +5,11 @@ import MenuInventory from './components/MenuInventory';
 import OrdersList from './components/OrdersList';
 import Sidebar from './components/Sidebar';
 import FeedbackWidget from './components/FeedbackWidget';
+import AnalyticsWidget from './components/AnalyticsWidget';
 import CustomerLanding from './customer/CustomerLanding';
 import Customers from './components/Customers';
 import Settings from './components/Settings';
+import SearchBox from './components/SearchBox';
 
 function App() {
   // Check URL params for mode
@@ -65,7 +67,8 @@ function App() {
             <p style={{ opacity: 0.6 }}>Manage your store operations efficiently.</p>
           </div>
 
-          <div style={{ display: 'flex', gap: '20px' }}>
+          <div style={{ display: 'flex', gap: '20px', alignItems: 'center' }}>
+            <SearchBox onNavigate={setActiveTab} />
             <div style={{ textAlign: 'right' }}>
               <div style={{ fontSize: '0.8rem', opacity: 0.5 }}>VIEW MODE</div>
               <button
@@ -113,10 +116,7 @@ function App() {
         {activeTab === 'dashboard' && (
           <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '20px' }}>
             <FeedbackWidget />
-            <div className="widget-card">
-              <h3>Analytics Placeholder</h3>
-              <p style={{ opacity: 0.6, marginTop: '20px' }}>Charts for Top Products and Loyalty Tiers would go here.</p>
-            </div>
+            <AnalyticsWidget />
           </div>
         )}
       </main>
@@ -132,16 +132,12 @@ function NotificationBar() {
 
   useEffect(() => {
     const check = () => {
-      fetch(`${API_BASE}/api/data/orders`)
+      // Payment claims + unpaid pending orders, counted server-side (services/analytics.py)
+      fetch(`${API_BASE}/api/analytics/summary?days=1&top=1`)
         .then(res => res.json())
         .then(data => {
-          if (!data) return;
-          // Alert on: Payment Claims OR New Pending Orders
-          const alertsList = Object.values(data).filter(o =>
-            o.payment_status === 'Customer Claimed Paid' ||
-            (o.status === 'Pending Payment' && o.payment_status !== 'Paid')
-          );
-          setAlerts(alertsList.length);
+          if (!data || !data.orders) return;
+          setAlerts(data.orders.needs_attention);
         }).catch(() => { });
     };
     const i = setInterval(check, 3000);
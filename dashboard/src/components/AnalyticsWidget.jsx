@@ -0,0 +1,85 @@
+import React, { useState, useEffect } from 'react';
+
+const API_BASE = import.meta.env.VITE_API_BASE_URL || '';
+const DAYS = 30;
+const TOP_ITEMS = 5;
+
+const naira = (value) => `₦${Math.round(value || 0).toLocaleString()}`;
+
+const AnalyticsWidget = () => {
+    const [summary, setSummary] = useState(null);
+
+    useEffect(() => {
+        // The summary is read from counters kept on the server, so it's cheap to poll.
+        const load = () => fetch(`${API_BASE}/api/analytics/summary?days=${DAYS}&top=${TOP_ITEMS}`)
+            .then(res => res.json())
+            .then(setSummary)
+            .catch(err => console.error("Failed to fetch analytics:", err));
+        load();
+        const i = setInterval(load, 30000);
+        return () => clearInterval(i);
+    }, []);
+
+    if (!summary) {
+        return (
+            <div className="widget-card">
+                <h3>Sales Overview</h3>
+                <p style={{ opacity: 0.6, marginTop: '20px' }}>Loading analytics...</p>
+            </div>
+        );
+    }
+
+    const recentRevenue = summary.daily.reduce((sum, d) => sum + d.revenue, 0);
+    const today = summary.daily[summary.daily.length - 1] || { orders: 0, revenue: 0 };
+    const peak = Math.max(1, ...summary.daily.map(d => d.revenue));
+
+    const kpis = [
+        { label: 'Revenue (all time)', value: naira(summary.revenue) },
+        { label: `Revenue (${DAYS}d)`, value: naira(recentRevenue) },
+        { label: 'Avg. Order Value', value: naira(summary.average_order_value) },
+        { label: 'Orders Today', value: today.orders },
+        { label: 'Paid Orders', value: `${summary.paid_orders} / ${summary.orders.total}` },
+        { label: 'Loyalty Points Issued', value: summary.loyalty_points_issued.toLocaleString() },
+    ];
+
+    return (
+        <div className="widget-card">
+            <h3>Sales Overview</h3>
+            <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr 1fr', gap: '12px', marginTop: '15px' }}>
+                {kpis.map(kpi => (
+                    <div key={kpi.label} style={{ padding: '10px', borderRadius: '8px', background: 'rgba(255, 255, 255, 0.04)' }}>
+                        <div style={{ fontSize: '0.8rem', opacity: 0.6 }}>{kpi.label}</div>
+                        <div style={{ fontSize: '1.3rem', fontWeight: 700, marginTop: '4px' }}>{kpi.value}</div>
+                    </div>
+                ))}
+            </div>
+
+            <h4 style={{ marginTop: '20px' }}>Daily Revenue</h4>
+            <div style={{ display: 'flex', alignItems: 'flex-end', gap: '2px', height: '60px', marginTop: '8px' }}>
+                {summary.daily.map(d => (
+                    <div key={d.date} title={`${d.date}: ${naira(d.revenue)} (${d.orders} orders)`}
+                        style={{ flex: 1, height: `${(d.revenue / peak) * 100}%`, minHeight: '2px', background: 'var(--color-primary, #ff4081)' }} />
+                ))}
+            </div>
+
+            <h4 style={{ marginTop: '20px' }}>Top Products</h4>
+            <ul style={{ listStyle: 'none', padding: 0 }}>
+                {summary.top_items.map(item => (
+                    <li key={item.name} style={{ display: 'flex', justifyContent: 'space-between', padding: '6px 0', borderBottom: '1px solid var(--color-border)' }}>
+                        <span>{item.name}</span>
+                        <span style={{ opacity: 0.7 }}>{item.units} sold · {naira(item.revenue)}</span>
+                    </li>
+                ))}
+            </ul>
+
+            <h4 style={{ marginTop: '20px' }}>Order Status</h4>
+            <div style={{ display: 'flex', flexWrap: 'wrap', gap: '8px', marginTop: '8px' }}>
+                {Object.entries(summary.orders.by_status).map(([status, count]) => (
+                    <span key={status} className="badge" style={{ background: '#444' }}>{status}: {count}</span>
+                ))}
+            </div>
+        </div>
+    );
+};
+
+export default AnalyticsWidget;
@@ -1,28 +1,32 @@
 import React, { useState, useEffect } from 'react';
 
+const API_BASE = import.meta.env.VITE_API_BASE_URL || '';
+const CRITICAL_LIMIT = 10;
+const RECENT_LIMIT = 20;
+
+const fetchList = (url) =>
+    fetch(url)
+        .then(res => res.json())
+        .then(data => {
+            if (Array.isArray(data)) return data;
+            console.error("Feedback data is not an array:", data);
+            return [];
+        })
+        .catch(err => {
+            console.error("Failed to fetch feedback:", err);
+            return [];
+        });
+
 const FeedbackWidget = () => {
-    const [logs, setLogs] = useState([]);
+    const [crisisLogs, setCrisisLogs] = useState([]);
+    const [otherLogs, setOtherLogs] = useState([]);
 
     useEffect(() => {
-        fetch('http://localhost:8000/api/data/feedback')
-            .then(res => res.json())
-            .then(data => {
-                if (Array.isArray(data)) {
-                    setLogs(data);
-                } else {
-                    console.error("Feedback data is not an array:", data);
-                    setLogs([]);
-                }
-            })
-            .catch(err => {
-                console.error("Failed to fetch feedback:", err);
-                setLogs([]);
-            });
+        // Only the slices shown below are fetched; the full log stays on the server.
+        fetchList(`${API_BASE}/api/feedback/critical?limit=${CRITICAL_LIMIT}`).then(setCrisisLogs);
+        fetchList(`${API_BASE}/api/data/feedback?critical=false&limit=${RECENT_LIMIT}`).then(setOtherLogs);
     }, []);
 
-    const crisisLogs = Array.isArray(logs) ? logs.filter(l => ['crisis', 'negative'].includes((l.sentiment || '').toLowerCase())) : [];
-    const otherLogs = Array.isArray(logs) ? logs.filter(l => !['crisis', 'negative'].includes((l.sentiment || '').toLowerCase())) : [];
-
     return (
         <div>
             <h2 style={{ marginBottom: '20px' }}>Feedback & Alerts</h2>
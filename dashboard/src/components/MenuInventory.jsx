@@ -90,7 +90,8 @@ const MenuInventory = () => {
             ...product,
             ingredients: Array.isArray(product.ingredients) ? product.ingredients.join(', ') : product.ingredients,
             image_url: product.image_url || '',
-            loyalty_points: product.loyalty_points || Math.floor(product.price / 100)
+            loyalty_points: product.loyalty_points || Math.floor(product.price / 100),
+            stock: product.stock ?? ''
         });
         setShowEditModal(true);
     };
@@ -110,7 +111,9 @@ const MenuInventory = () => {
                         price: parseFloat(editingProduct.price),
                         ingredients: editingProduct.ingredients.split(',').map(i => i.trim()),
                         image_url: editingProduct.image_url,
-                        loyalty_points: parseInt(editingProduct.loyalty_points)
+                        loyalty_points: parseInt(editingProduct.loyalty_points),
+                        // Blank = not tracked (only the availability toggle applies)
+                        stock: editingProduct.stock === '' ? null : parseInt(editingProduct.stock)
                     }
                 })
             });
@@ -203,6 +206,7 @@ const MenuInventory = () => {
                             <th>Ingredients</th>
                             <th>Price (₦)</th>
                             <th>Points</th>
+                            <th>Stock</th>
                             <th>Availability</th>
                             <th>Actions</th>
                         </tr>
@@ -214,7 +218,7 @@ const MenuInventory = () => {
                                 <td>
                                     <div style={{ width: 40, height: 40, borderRadius: 4, overflow: 'hidden', backgroundColor: '#f0f0f0' }}>
                                         {item.image_url ? (
-                                            <img src={item.image_url} alt="" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                                            <img src={item.image_variants ? `${API_BASE}${item.image_variants.src}` : item.image_url} alt="" loading="lazy" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                                         ) : <span style={{ fontSize: '0.6rem', display: 'block', textAlign: 'center', paddingTop: 12 }}>No Img</span>}
                                     </div>
                                 </td>
@@ -226,6 +230,7 @@ const MenuInventory = () => {
                                 </td>
                                 <td>₦{item.price}</td>
                                 <td>{item.loyalty_points || Math.floor(item.price / 100)}</td>
+                                <td style={{ opacity: item.stock == null ? 0.5 : 1 }}>{item.stock ?? '—'}</td>
                                 <td>
                                     <div
                                         className={`toggle-switch ${item.is_available ? 'on' : ''}`}
@@ -320,6 +325,10 @@ const MenuInventory = () => {
                                     <label style={{ display: 'block', marginBottom: '5px', fontWeight: 500 }}>Loyalty Points</label>
                                     <input type="number" required value={editingProduct.loyalty_points || Math.floor(editingProduct.price / 100)} onChange={(e) => setEditingProduct({ ...editingProduct, loyalty_points: e.target.value })} style={{ width: '100%', padding: '8px' }} />
                                 </div>
+                                <div style={{ marginBottom: '15px', flex: 1 }}>
+                                    <label style={{ display: 'block', marginBottom: '5px', fontWeight: 500 }}>Stock</label>
+                                    <input type="number" min="0" placeholder="Not tracked" value={editingProduct.stock} onChange={(e) => setEditingProduct({ ...editingProduct, stock: e.target.value })} style={{ width: '100%', padding: '8px' }} />
+                                </div>
                             </div>
                             <div style={{ marginBottom: '15px' }}>
                                 <label style={{ display: 'block', marginBottom: '5px', fontWeight: 500 }}>Ingredients</label>
@@ -1,10 +1,12 @@
 import React, { useState, useEffect } from 'react';
 const API_BASE = import.meta.env.VITE_API_BASE_URL || '';
 
-const STATUSES = ['Pending Payment', 'Processing', 'Out for Delivery', 'Completed', 'Cancelled'];
+// Statuses that mean the order has been paid for
+const PAID_STATUSES = ['Processing', 'Ready for Delivery', 'Out for Delivery', 'Completed'];
 
 export default function OrdersKanban() {
-    const [orders, setOrders] = useState([]);
+    const [columns, setColumns] = useState([]);
+    const [closedHours, setClosedHours] = useState(24);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
@@ -14,13 +16,12 @@ export default function OrdersKanban() {
     }, []);
 
     const fetchOrders = () => {
-        fetch(`${API_BASE}/api/data/orders`)
+        // Grouped and sorted server-side; closed columns only cover recent orders
+        fetch(`${API_BASE}/api/orders/board`)
             .then(res => res.json())
             .then(data => {
-                // Safely handle data if it's null or not object
-                const list = data && typeof data === 'object' ? Object.values(data) : [];
-                list.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                setOrders(list);
+                setColumns(Array.isArray(data?.columns) ? data.columns : []);
+                if (data?.closed_hours) setClosedHours(data.closed_hours);
                 setLoading(false);
             })
             .catch(console.error);
@@ -43,18 +44,23 @@ export default function OrdersKanban() {
 
     if (loading) return <div>Loading Orders...</div>;
 
+    const statuses = columns.map(c => c.status);
+
     return (
         <div className="orders-board">
-            {STATUSES.map(status => (
-                <div key={status} className="kanban-column">
+            {columns.map(column => (
+                <div key={column.status} className="kanban-column">
                     <div className="kanban-header">
-                        {status}
-                        <span className="count">
-                            {orders.filter(o => o.status === status).length}
+                        {column.status}
+                        <span className="count" title={column.total !== column.count ? `${column.total} in total` : undefined}>
+                            {column.count}
                         </span>
                     </div>
+                    {['Completed', 'Cancelled'].includes(column.status) && (
+                        <div style={{ fontSize: '0.75rem', opacity: 0.6, padding: '0 12px' }}>Last {closedHours}h</div>
+                    )}
                     <div className="kanban-body">
-                        {orders.filter(o => o.status === status).map(order => (
+                        {column.orders.map(order => (
                             <div key={order.id} className="order-card">
                                 <div className="order-id">{order.id}</div>
                                 <div className="order-customer">
@@ -78,7 +84,7 @@ export default function OrdersKanban() {
                                         value={order.status}
                                         onChange={(e) => updateStatus(order.id, e.target.value,
                                             // Auto-flag payment if moving to Processing/Delivery/Completed
-                                            ['Processing', 'Out for Delivery', 'Completed'].includes(e.target.value) ? 'Paid' : order.payment_status
+                                            PAID_STATUSES.includes(e.target.value) ? 'Paid' : order.payment_status
                                         )}
                                         className="status-select"
                                         style={{
@@ -90,11 +96,9 @@ export default function OrdersKanban() {
                                             cursor: 'pointer'
                                         }}
                                     >
-                                        <option value="Pending Payment">Pending Payment</option>
-                                        <option value="Processing">Processing</option>
-                                        <option value="Out for Delivery">Out for Delivery</option>
-                                        <option value="Completed">Completed</option>
-                                        <option value="Cancelled">Cancelled</option>
+                                        {statuses.map(status => (
+                                            <option key={status} value={status}>{status}</option>
+                                        ))}
                                     </select>
 
                                     {/* Quick Actions based on status */}
@@ -106,6 +110,11 @@ export default function OrdersKanban() {
                                 </div>
                             </div>
                         ))}
+                        {column.more > 0 && (
+                            <div style={{ textAlign: 'center', fontSize: '0.8rem', opacity: 0.6, padding: '8px' }}>
+                                + {column.more} older
+                            </div>
+                        )}
                     </div>
                 </div>
             ))}
@@ -0,0 +1,84 @@
+import React, { useState, useEffect, useRef } from 'react';
+const API_BASE = import.meta.env.VITE_API_BASE_URL || '';
+
+const PAGE_SIZE = 10;
+const TAB_FOR_TYPE = { customer: 'customers', order: 'orders', feedback: 'feedback' };
+const TYPE_ICON = { customer: '👤', order: '🧾', feedback: '💬' };
+
+// Searches customers, orders and feedback server-side (/api/search) as you type
+export default function SearchBox({ onNavigate }) {
+    const [query, setQuery] = useState('');
+    const [results, setResults] = useState([]);
+    const [total, setTotal] = useState(0);
+    const [open, setOpen] = useState(false);
+    const latest = useRef('');
+
+    const fetchPage = (q, offset) => {
+        latest.current = q;
+        fetch(`${API_BASE}/api/search?q=${encodeURIComponent(q)}&limit=${PAGE_SIZE}&offset=${offset}`)
+            .then(res => res.json())
+            .then(data => {
+                if (latest.current !== q) return; // a newer query is on its way
+                setResults(prev => offset ? [...prev, ...data.results] : data.results);
+                setTotal(data.total);
+                setOpen(true);
+            })
+            .catch(console.error);
+    };
+
+    useEffect(() => {
+        const q = query.trim();
+        if (q.length < 2) {
+            setResults([]);
+            setTotal(0);
+            return;
+        }
+        const timer = setTimeout(() => fetchPage(q, 0), 250);
+        return () => clearTimeout(timer);
+    }, [query]);
+
+    const pick = (result) => {
+        setOpen(false);
+        if (onNavigate) onNavigate(TAB_FOR_TYPE[result.type]);
+    };
+
+    return (
+        <div style={{ position: 'relative', width: '320px' }}>
+            <input
+                type="search"
+                value={query}
+                onChange={e => setQuery(e.target.value)}
+                onFocus={() => results.length && setOpen(true)}
+                onKeyDown={e => e.key === 'Escape' && setOpen(false)}
+                placeholder="Search customers, orders, feedback..."
+                style={{ width: '100%', padding: '8px 12px', borderRadius: '6px', border: '1px solid #ddd' }}
+            />
+            {open && query.trim().length >= 2 && (
+                <div className="card" style={{
+                    position: 'absolute', top: '110%', left: 0, right: 0, zIndex: 20,
+                    maxHeight: '420px', overflowY: 'auto', padding: '6px'
+                }}>
+                    {results.length === 0 && <div style={{ padding: '8px', opacity: 0.6 }}>No matches</div>}
+                    {results.map(r => (
+                        <div
+                            key={`${r.type}:${r.id}`}
+                            onClick={() => pick(r)}
+                            style={{ padding: '8px', cursor: 'pointer', borderBottom: '1px solid rgba(0,0,0,0.05)' }}
+                        >
+                            <div style={{ fontWeight: 600 }}>{TYPE_ICON[r.type]} {r.title}</div>
+                            <div style={{ fontSize: '0.8rem', opacity: 0.7 }}>{r.subtitle}</div>
+                        </div>
+                    ))}
+                    {results.length < total && (
+                        <button
+                            onClick={() => fetchPage(query.trim(), results.length)}
+                            style={{ width: '100%', padding: '6px', marginTop: '4px', cursor: 'pointer', background: 'transparent', border: 'none', color: 'var(--color-primary)' }}
+                        >
+                            Show more ({total - results.length} left)
+                        </button>
+                    )}
+                </div>
+            )}
+        </div>
+    );
+}
@@ -82,6 +82,48 @@ const Settings = () => {
                         style={{ width: '100%', padding: '8px' }}
                     />
                 </div>
+                <h4 style={{ marginTop: '10px' }}>Delivery Capacity</h4>
+                <div className="form-group">
+                    <label style={{ display: 'block', fontWeight: 500, marginBottom: '5px' }}>Delivery Windows (comma separated)</label>
+                    <input
+                        type="text"
+                        name="delivery_windows"
+                        placeholder="10:00–12:00, 12:00–14:00, 14:00–16:00, 16:00–18:00"
+                        value={Array.isArray(settings.delivery_windows) ? settings.delivery_windows.join(', ') : (settings.delivery_windows || '')}
+                        onChange={handleChange}
+                        style={{ width: '100%', padding: '8px' }}
+                    />
+                </div>
+                <div style={{ display: 'flex', gap: '10px' }}>
+                    {[
+                        ['delivery_riders', 'Riders per Window', 2],
+                        ['delivery_orders_per_rider', 'Drops per Rider', 4],
+                        ['oven_units_per_window', 'Oven Units per Window', 60],
+                    ].map(([name, label, fallback]) => (
+                        <div className="form-group" key={name} style={{ flex: 1 }}>
+                            <label style={{ display: 'block', fontWeight: 500, marginBottom: '5px' }}>{label}</label>
+                            <input
+                                type="number"
+                                min="0"
+                                name={name}
+                                placeholder={fallback}
+                                value={settings[name] ?? ''}
+                                onChange={handleChange}
+                                style={{ width: '100%', padding: '8px' }}
+                            />
+                        </div>
+                    ))}
+                </div>
+                <div className="form-group">
+                    <label style={{ display: 'block', fontWeight: 500, marginBottom: '5px' }}>Same-day Cutoff</label>
+                    <input
+                        type="time"
+                        name="delivery_same_day_cutoff"
+                        value={settings.delivery_same_day_cutoff || '12:00'}
+                        onChange={handleChange}
+                        style={{ width: '100%', padding: '8px' }}
+                    />
+                </div>
                 <hr style={{ border: 'none', borderTop: '1px solid #eee', margin: '20px 0' }} />
                 <button type="submit" className="neumorphic-btn primary">Save Changes</button>
             </form>
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 const API_BASE = import.meta.env.VITE_API_BASE_URL || '';
+const CHAT_RETRIES = 2;
 
 export default function ChatWidget({ onCelebrate, currentUserId, messages, setMessages }) {
   const [input, setInput] = useState('');
@@ -15,6 +16,28 @@ export default function ChatWidget({ onCelebrate, currentUserId, messages, setMe
     scrollToBottom();
   }, [messages]);
 
+  // One key per message: a retry of the same message replays the server's first reply
+  // instead of running the turn (and any order in it) again.
+  const postMessage = async (text, idempotencyKey) => {
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const res = await fetch(`${API_BASE}/api/chat`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
+          // History lives server-side (keyed by user_id), so only the new message is sent.
+          body: JSON.stringify({
+            user_id: userId,
+            message: text,
+          }),
+        });
+        if (res.status < 500 || attempt >= CHAT_RETRIES) return res;
+      } catch (err) {
+        if (attempt >= CHAT_RETRIES) throw err;
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+    }
+  };
+
   const send = async () => {
     const text = input.trim();
     if (!text) return;
@@ -25,15 +48,7 @@ export default function ChatWidget({ onCelebrate, currentUserId, messages, setMe
     setBusy(true);
 
     try {
-      const res = await fetch(`${API_BASE}/api/chat`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          user_id: userId,
-          message: text,
-          chat_history: next.map((m) => ({ role: m.role, content: m.text })),
-        }),
-      });
+      const res = await postMessage(text, crypto.randomUUID());
       const data = await res.json();
       const reply = data && data.response ? data.response : 'No response';
 
@@ -5,6 +5,31 @@ import ChatWidget from './ChatWidget.jsx';
 
 const formatCurrency = (n) => new Intl.NumberFormat('en-NG', { style: 'currency', currency: 'NGN' }).format(n);
 
+// Resized variants from /api/data/menu (image_variants) are served by the API
+const withApiBase = (srcset) => srcset.split(', ').map((candidate) => `${API_BASE}${candidate}`).join(', ');
+// The grid cards are at most ~280px wide (full width on phones)
+const CARD_IMAGE_SIZES = '(max-width: 600px) 100vw, 280px';
+
+function ProductImage({ product }) {
+  const variants = product.variants;
+  if (!variants) return <img src={product.image} alt={product.name} loading="lazy" decoding="async" />;
+  return (
+    <picture>
+      <source type="image/webp" srcSet={withApiBase(variants.webp_srcset)} sizes={CARD_IMAGE_SIZES} />
+      <img
+        src={`${API_BASE}${variants.src}`}
+        srcSet={withApiBase(variants.jpeg_srcset)}
+        sizes={CARD_IMAGE_SIZES}
+        width={variants.width}
+        height={variants.height}
+        alt={product.name}
+        loading="lazy"
+        decoding="async"
+      />
+    </picture>
+  );
+}
+
 const imageFallbacks = {
   strawberry: '/images/red_velvet_cupcake.png',
   chocolate: '/images/chocolate_cake.png',
@@ -81,7 +106,8 @@ export default function CustomerLanding({ onAdminAccess }) {
               id: i.id,
               name: i.name,
               price: i.price,
-              image: i.image_url || guess,
+              image: i.image_variants ? `${API_BASE}${i.image_variants.src}` : (i.image_url || guess),
+              variants: i.image_variants,
               rating: 4.5 + ((idx % 4) * 0.1),
             };
           });
@@ -413,7 +439,7 @@ export default function CustomerLanding({ onAdminAccess }) {
           {(products.length ? products : []).slice(0, 10).map((p, idx) => (
             <div className="product-card" key={p.id || `p-${idx}`}>
               <div className="product-image">
-                <img src={p.image} alt={p.name} />
+                <ProductImage product={p} />
               </div>
               <div className="product-info">
                 <div className="product-name">{p.name}</div>
@@ -2,10 +2,7 @@
 import os
 import uvicorn
 from api.index import app # Import the FastAPI app for local serving
-from workflows.crm_graph import build_crm_graph
-from agents.agent_core import identify_user_node, intent_classifier_node, tool_executor_node, response_generator_node
 from config import CRM_CONFIG
-from workflows.agent_state import AgentState # For type hinting the initial state
 
 def run_local_test(user_id: str, query: str):
     """
@@ -17,6 +14,9 @@ def run_local_test(user_id: str, query: str):
     print("---------------------\n")
 
     # 1. Compile the graph (needs to be done once)
+    # Imported here so starting the API server doesn't pay for the agent stack up front
+    from workflows.crm_graph import build_crm_graph
+    from workflows.agent_state import AgentState # For type hinting the initial state
     try:
         crm_agent_app = build_crm_graph(None)
         print("[OK] LangGraph compiled successfully.")
@@ -29,6 +29,7 @@ def run_local_test(user_id: str, query: str):
         "user_id": user_id,
         "input_query": query,
         "chat_history": [],
+        "history_summary": "",
         "customer_profile": {},
         "tools_to_run": [],
         "tool_output": [],
@@ -56,7 +57,16 @@ def run_local_test(user_id: str, query: str):
 
 def start_api_server():
     """Starts the Uvicorn server to host the FastAPI application locally."""
-    print(f"\n[INFO] Starting local API server at http://{CRM_CONFIG.API_HOST}:{CRM_CONFIG.API_PORT}")
+    workers = CRM_CONFIG.API_WORKERS
+    if workers > 1 and CRM_CONFIG.STATE_BACKEND != "sqlite":
+        # Each worker would keep its own copy of data.json and overwrite the others'
+        print("[WARN] API_WORKERS > 1 needs STATE_BACKEND=sqlite; starting a single worker.")
+        workers = 1
+    print(f"\n[INFO] Starting local API server at http://{CRM_CONFIG.API_HOST}:{CRM_CONFIG.API_PORT} ({workers} worker{'s' if workers > 1 else ''})")
+    if workers > 1:
+        # Workers are separate processes, so uvicorn needs the app's import string
+        uvicorn.run("api.index:app", host=CRM_CONFIG.API_HOST, port=CRM_CONFIG.API_PORT, workers=workers)
+        return
     # Run the uvicorn server with the application instance
     uvicorn.run(app, host=CRM_CONFIG.API_HOST, port=CRM_CONFIG.API_PORT)
 
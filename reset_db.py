@@ -1,7 +1,11 @@
 
 import json
 import os
-from Mock_data.mock_data import INITIAL_MENU, INITIAL_CUSTOMERS, INITIAL_ORDERS
+import shutil
+from Mock_data.mock_data import INITIAL_MENU, INITIAL_CUSTOMERS, INITIAL_ORDERS, state_db_path
+from services.feedback_log import _log_dir
+from services.loyalty_ledger import _ledger_dir
+from services.segmentation import _campaign_dir
 
 data = {
     "menu": INITIAL_MENU,
@@ -21,4 +25,12 @@ data = {
 with open("data.json", "w") as f:
     json.dump(data, f, indent=4)
 
+# The feedback log, loyalty ledger and campaign log live next to data.json; start them over too
+for directory in (_log_dir(), _ledger_dir(), _campaign_dir()):
+    shutil.rmtree(directory, ignore_errors=True)
+# So is the shared state database (STATE_BACKEND=sqlite), which is seeded again from data.json
+for suffix in ("", "-wal", "-shm"):
+    if os.path.exists(state_db_path() + suffix):
+        os.remove(state_db_path() + suffix)
+
 print("Database reset to defaults successfully.")
@@ -0,0 +1,217 @@
+# services/analytics.py
+"""
+Sales aggregates for the dashboard, kept up to date as orders change.
+
+Maintained from order events (like services.customer_stats):
+  * order counts per (status, payment_status)
+  * booked orders/value and paid revenue per day and per hour (hourly kept
+    for ANALYTICS_HOURLY_DAYS days)
+  * units and revenue per menu item
+  * paid order count, so the average order value is a division
+  * loyalty points issued on payment (1 point per ₦100, as update_data awards)
+
+Booked numbers count every order when it's placed; revenue counts an order once
+it is Paid, on the day it was placed, and is taken back if payment is undone.
+
+summary() only reads these counters, so its cost depends on the window asked
+for, not on how many orders exist.
+
+Rebuild from scratch:  python -m services.analytics
+"""
+import datetime
+import heapq
+import threading
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import MOCK_ORDER_DB
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED
+from services.shared_state import orders_in_flight
+
+_LOCK = threading.RLock()
+_BUILT = False
+_AGG = {}
+_COUNTED = set()   # orders rebuild() counted before their ORDER_CREATED arrived
+
+# Order fields the aggregates depend on; other updates are ignored
+TRACKED_FIELDS = {"status", "payment_status", "total", "items", "timestamp"}
+
+# Orders the dashboard should flag: a payment claim to check, or unpaid and waiting
+ATTENTION_PAYMENTS = {"Customer Claimed Paid"}
+
+
+def _empty() -> dict:
+    return {
+        "by_status_payment": {},   # (status, payment_status) -> orders
+        "daily": {},               # "YYYY-MM-DD" -> {"orders", "booked", "paid_orders", "revenue"}
+        "hourly": {},              # "YYYY-MM-DDTHH" -> same
+        "hourly_cutoff": "",       # hours before this get no bucket
+        "pruned_hour": "",         # hour of the last prune
+        "items": {},               # item name -> {"units", "revenue"}
+        "orders": 0,
+        "booked": 0.0,
+        "paid_orders": 0,
+        "revenue": 0.0,
+        "loyalty_points_issued": 0,
+    }
+
+
+def _total(order: dict) -> float:
+    return float(order.get("total", 0) or 0)
+
+
+def _keys(order: dict):
+    timestamp = (order.get("timestamp") or "")[:13]
+    return timestamp[:10] or "unknown", timestamp or "unknown"
+
+
+def _period(table: dict, key: str) -> dict:
+    row = table.get(key)
+    if row is None:
+        row = table[key] = {"orders": 0, "booked": 0.0, "paid_orders": 0, "revenue": 0.0}
+    return row
+
+
+def _move(agg: dict, pair: tuple, amount: int):
+    counts = agg["by_status_payment"]
+    counts[pair] = counts.get(pair, 0) + amount
+    if not counts[pair]:
+        del counts[pair]
+
+
+def _add_order(agg: dict, order: dict, sign: int = 1):
+    """Adds an order to every aggregate (sign=-1 takes it back out)."""
+    total = _total(order) * sign
+    day, hour = _keys(order)
+    agg["orders"] += sign
+    agg["booked"] += total
+    _move(agg, (order.get("status"), order.get("payment_status")), sign)
+    paid = order.get("payment_status") == "Paid"
+    if paid:
+        agg["paid_orders"] += sign
+        agg["revenue"] += total
+        agg["loyalty_points_issued"] += sign * int(_total(order) / 100)
+    for table, key in ((agg["daily"], day), (agg["hourly"], hour)):
+        if table is agg["hourly"] and key < agg["hourly_cutoff"]:
+            continue
+        row = _period(table, key)
+        row["orders"] += sign
+        row["booked"] += total
+        if paid:
+            row["paid_orders"] += sign
+            row["revenue"] += total
+    for it in order.get("items", []):
+        name = it.get("name") or it.get("item_id")
+        if not name:
+            continue
+        quantity = int(it.get("quantity", 1)) * sign
+        price = float(it.get("price_at_order", 0) or 0)
+        row = agg["items"].setdefault(name, {"units": 0, "revenue": 0.0})
+        row["units"] += quantity
+        row["revenue"] += price * quantity
+
+
+def _prune_hourly(agg: dict):
+    now = datetime.datetime.now()
+    cutoff = (now - datetime.timedelta(days=CRM_CONFIG.ANALYTICS_HOURLY_DAYS)).strftime("%Y-%m-%dT%H")
+    agg["hourly_cutoff"] = cutoff
+    agg["pruned_hour"] = now.strftime("%Y-%m-%dT%H")
+    for key in [k for k in agg["hourly"] if k < cutoff]:
+        del agg["hourly"][key]
+
+
+def _prune_if_new_hour(agg: dict):
+    """Keeps the hourly table bounded between rebuilds: prunes once per new hour."""
+    if datetime.datetime.now().strftime("%Y-%m-%dT%H") != agg["pruned_hour"]:
+        _prune_hourly(agg)
+
+
+def rebuild() -> int:
+    """Recomputes every aggregate from MOCK_ORDER_DB."""
+    global _BUILT, _AGG
+    agg = _empty()
+    _prune_hourly(agg)
+    # Held from the snapshot on, so no event falls between it and _BUILT
+    with _LOCK:
+        orders = list(MOCK_ORDER_DB.values())
+        in_flight = orders_in_flight()
+        for order in orders:
+            _add_order(agg, order)
+        _COUNTED.clear()
+        _COUNTED.update(order.get("id") for order in orders if order.get("id") in in_flight)
+        _AGG = agg
+        _BUILT = True
+    return agg["orders"]
+
+
+def _ensure_built():
+    if not _BUILT:
+        with _LOCK:
+            if not _BUILT:
+                rebuild()
+
+
+# --- Incremental maintenance ---
+# Nothing to maintain until the first read builds the aggregates; after that,
+# ORDER_CREATED for an order the build already counted (_COUNTED) is skipped.
+
+@subscribe(ORDER_CREATED)
+def _on_order_created(order: dict, **_):
+    with _LOCK:
+        if order.get("id") in _COUNTED:
+            _COUNTED.discard(order.get("id"))
+        elif _BUILT:
+            _prune_if_new_hour(_AGG)
+            _add_order(_AGG, order)
+
+
+@subscribe(ORDER_UPDATED)
+def _on_order_updated(order: dict, changes: dict, previous: dict, **_):
+    if not previous.keys() & TRACKED_FIELDS:
+        return
+    with _LOCK:
+        if _BUILT:
+            _prune_if_new_hour(_AGG)
+            _add_order(_AGG, {**order, **previous}, -1)
+            _add_order(_AGG, order)
+
+
+# --- Reading ---
+
+def summary(days: int = 30, hours: int = 24, top: int = 10) -> dict:
+    """Dashboard KPIs: totals, status mix, top items and the last `days` / `hours` series."""
+    _ensure_built()
+    now = datetime.datetime.now()
+    day_keys = [(now - datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days - 1, -1, -1)]
+    hour_keys = [(now - datetime.timedelta(hours=i)).strftime("%Y-%m-%dT%H") for i in range(hours - 1, -1, -1)]
+    zero = {"orders": 0, "booked": 0.0, "paid_orders": 0, "revenue": 0.0}
+
+    with _LOCK:
+        agg = _AGG
+        _prune_if_new_hour(agg)
+        by_status, by_payment = {}, {}
+        attention = 0
+        for (status, payment), n in agg["by_status_payment"].items():
+            by_status[status] = by_status.get(status, 0) + n
+            by_payment[payment] = by_payment.get(payment, 0) + n
+            if payment in ATTENTION_PAYMENTS or (status == "Pending Payment" and payment != "Paid"):
+                attention += n
+        top_items = heapq.nlargest(top, agg["items"].items(), key=lambda kv: kv[1]["units"])
+        result = {
+            "orders": {"total": agg["orders"], "by_status": by_status, "by_payment": by_payment, "needs_attention": attention},
+            "booked": round(agg["booked"], 2),
+            "revenue": round(agg["revenue"], 2),
+            "paid_orders": agg["paid_orders"],
+            "average_order_value": round(agg["revenue"] / agg["paid_orders"], 2) if agg["paid_orders"] else 0.0,
+            "loyalty_points_issued": agg["loyalty_points_issued"],
+            "top_items": [{"name": name, "units": row["units"], "revenue": round(row["revenue"], 2)} for name, row in top_items],
+            "daily": [{"date": key, **agg["daily"].get(key, zero)} for key in day_keys],
+            "hourly": [{"hour": key, **agg["hourly"].get(key, zero)} for key in hour_keys],
+        }
+    return result
+
+
+if __name__ == "__main__":
+    import json
+    count = rebuild()
+    print(f"Analytics rebuilt from {count} orders.")
+    print(json.dumps({k: v for k, v in summary(days=7).items() if k not in ("hourly",)}, indent=2))
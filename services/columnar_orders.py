@@ -0,0 +1,314 @@
+# services/columnar_orders.py
+"""
+Orders and order lines as numpy columns, for cohort and trend analysis.
+
+    from services.columnar_orders import build, load, repeat_rate_by_first_month
+    orders, lines = build()                     # from MOCK_ORDER_DB
+    export(orders, lines)                       # .npy files next to data.json
+    orders, lines = load()                      # memory-mapped
+    paid = orders.where(orders.isin("payment", ["Paid"]))
+    paid.group_by("weekday", "total")           # {"Mon": 123400.0, ...}
+    lines.percentile("quantity", [50, 90, 99])
+
+Order columns:  ts (int64 ms since epoch, local time as recorded), customer,
+                status, payment (int32 category codes), total (float64),
+                lines, units (int32)
+Line columns:   order (int32 row in the order columns), ts, customer, item
+                (int32 codes), quantity (int32), price (float64)
+
+Category codes index into the string lists in categories.json. The exported
+files are a snapshot and are not kept up to date; re-run the export for a
+fresh one.
+
+Time keys (day, month, weekday, hour) are derived from ts on demand, so any
+column or time key can be used for grouping or filtering.
+
+Export / report:  python -m services.columnar_orders [export|report] [--dir DIR]
+"""
+import datetime
+import json
+import os
+
+import numpy as np
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import DATA_FILE, MOCK_MENU_DB, MOCK_ORDER_DB
+
+ORDER_COLUMNS = {"ts": np.int64, "customer": np.int32, "status": np.int32, "payment": np.int32,
+                 "total": np.float64, "lines": np.int32, "units": np.int32}
+LINE_COLUMNS = {"order": np.int32, "ts": np.int64, "customer": np.int32, "item": np.int32,
+                "quantity": np.int32, "price": np.float64}
+# Columns whose values are codes into categories[<column>]
+CATEGORICAL = {"customer", "status", "payment", "item"}
+TIME_KEYS = {"day", "month", "weekday", "hour"}
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+MS_PER_DAY = 86_400_000
+NO_TIME = np.iinfo(np.int64).min   # NaT as int64
+
+
+def _default_dir() -> str:
+    return CRM_CONFIG.COLUMNAR_DIR or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "columnar")
+
+
+class Columns:
+    """A set of equal-length numpy columns plus the shared category labels."""
+
+    def __init__(self, columns: dict, categories: dict):
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self.columns:
+            return self.columns[name]
+        if name in TIME_KEYS:
+            return self._time_key(name)
+        raise KeyError(name)
+
+    def _time_key(self, name: str) -> np.ndarray:
+        ts = np.asarray(self.columns["ts"])
+        days = ts // MS_PER_DAY
+        if name == "day":
+            return days
+        if name == "weekday":
+            return (days + 3) % 7            # 1970-01-01 was a Thursday
+        if name == "hour":
+            return (ts % MS_PER_DAY) // 3_600_000
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)   # months since 1970-01
+
+    def labels(self, name: str, codes: np.ndarray) -> list:
+        """Human-readable labels for values of a column or time key."""
+        if name in CATEGORICAL:
+            names = self.categories[name]
+            return [names[c] for c in codes]
+        if name == "day":
+            return [str(d) for d in np.asarray(codes).astype("datetime64[D]")]
+        if name == "month":
+            return [str(m) for m in np.asarray(codes).astype("datetime64[M]")]
+        if name == "weekday":
+            return [WEEKDAYS[d] for d in codes]
+        return [c.item() if hasattr(c, "item") else c for c in codes]
+
+    # --- Filters (return boolean masks; combine with & and |) ---
+
+    def isin(self, name: str, values) -> np.ndarray:
+        """Rows whose column is one of `values` (labels for categorical columns)."""
+        if name in CATEGORICAL:
+            lookup = {label: code for code, label in enumerate(self.categories[name])}
+            values = [lookup[v] for v in values if v in lookup]
+        return np.isin(self[name], np.asarray(list(values)))
+
+    def between(self, start=None, end=None) -> np.ndarray:
+        """Rows with ts in [start, end); datetimes or ISO strings."""
+        ts = np.asarray(self.columns["ts"])
+        mask = ts != NO_TIME
+        if start is not None:
+            mask &= ts >= _to_ms(start)
+        if end is not None:
+            mask &= ts < _to_ms(end)
+        return mask
+
+    def where(self, mask: np.ndarray) -> "Columns":
+        return Columns({name: np.asarray(col)[mask] for name, col in self.columns.items()}, self.categories)
+
+    # --- Aggregates ---
+
+    def group_by(self, key: str, value: str = None, agg: str = "sum") -> dict:
+        """{label: aggregate} of `value` per distinct `key`, in key order.
+
+        agg is "count" (value ignored), "sum", "mean", "min" or "max".
+        """
+        keys, inverse = np.unique(self[key], return_inverse=True)
+        if agg == "count" or value is None:
+            result = np.bincount(inverse, minlength=len(keys))
+        else:
+            values = np.asarray(self[value], dtype=np.float64)
+            if agg in ("sum", "mean"):
+                result = np.bincount(inverse, weights=values, minlength=len(keys))
+                if agg == "mean":
+                    result = result / np.bincount(inverse, minlength=len(keys))
+            elif agg in ("min", "max"):
+                result = np.full(len(keys), np.inf if agg == "min" else -np.inf)
+                (np.minimum if agg == "min" else np.maximum).at(result, inverse, values)
+            else:
+                raise ValueError(f"Unknown aggregate: {agg}")
+        return dict(zip(self.labels(key, keys), result.tolist()))
+
+    def percentile(self, name: str, q) -> list:
+        values = self[name]
+        if not len(values):
+            return [None] * len(np.atleast_1d(q))
+        return np.atleast_1d(np.percentile(values, q)).tolist()
+
+
+def _to_ms(moment) -> int:
+    if isinstance(moment, str):
+        moment = datetime.datetime.fromisoformat(moment)
+    if isinstance(moment, datetime.date) and not isinstance(moment, datetime.datetime):
+        moment = datetime.datetime.combine(moment, datetime.time())
+    # ts holds the recorded wall-clock time, so compare naive-to-naive
+    return int(np.datetime64(moment.replace(tzinfo=None), "ms").astype(np.int64))
+
+
+# --- Build / export / load ---
+
+def build(orders: dict = None) -> tuple:
+    """(orders, lines) Columns from an order dict (MOCK_ORDER_DB by default)."""
+    orders = MOCK_ORDER_DB if orders is None else orders
+    codes = {name: {} for name in CATEGORICAL}
+
+    def code(name, label):
+        table = codes[name]
+        if label not in table:
+            table[label] = len(table)
+        return table[label]
+
+    order_ids, timestamps = [], []
+    order_cols = {name: [] for name in ORDER_COLUMNS if name != "ts"}
+    line_cols = {name: [] for name in LINE_COLUMNS if name != "ts"}
+    item_names = {}
+
+    for row, order in enumerate(list(orders.values())):
+        customer = code("customer", order.get("customer_id") or "")
+        order_ids.append(order.get("id"))
+        timestamps.append(order.get("timestamp") or "")
+        order_cols["customer"].append(customer)
+        order_cols["status"].append(code("status", order.get("status") or ""))
+        order_cols["payment"].append(code("payment", order.get("payment_status") or ""))
+        order_cols["total"].append(float(order.get("total", 0) or 0))
+        items = order.get("items", [])
+        units = 0
+        for it in items:
+            item_id = it.get("item_id") or it.get("name") or ""
+            quantity = int(it.get("quantity", 1))
+            price = it.get("price_at_order")
+            if price is None:
+                # Older orders didn't record the price paid
+                price = (MOCK_MENU_DB.get(item_id) or {}).get("price", 0)
+            item_names.setdefault(item_id, it.get("name") or item_id)
+            line_cols["order"].append(row)
+            line_cols["customer"].append(customer)
+            line_cols["item"].append(code("item", item_id))
+            line_cols["quantity"].append(quantity)
+            line_cols["price"].append(float(price or 0))
+            units += quantity
+        order_cols["lines"].append(len(items))
+        order_cols["units"].append(units)
+
+    ts = np.array(timestamps, dtype="datetime64[us]").astype("datetime64[ms]").astype(np.int64)
+    order_arrays = {"ts": ts}
+    order_arrays.update({name: np.array(values, dtype=ORDER_COLUMNS[name]) for name, values in order_cols.items()})
+    line_arrays = {name: np.array(values, dtype=LINE_COLUMNS[name]) for name, values in line_cols.items()}
+    line_arrays["ts"] = ts[line_arrays["order"]]
+
+    categories = {name: list(table) for name, table in codes.items()}
+    categories["order_id"] = order_ids
+    categories["item_name"] = [item_names[item_id] for item_id in categories["item"]]
+    return Columns(order_arrays, categories), Columns(line_arrays, categories)
+
+
+def export(orders: Columns, lines: Columns, directory: str = None) -> str:
+    """Writes one .npy file per column plus categories.json; returns the directory."""
+    directory = directory or _default_dir()
+    os.makedirs(directory, exist_ok=True)
+    for prefix, table in (("orders", orders), ("lines", lines)):
+        for name, col in table.columns.items():
+            np.save(os.path.join(directory, f"{prefix}.{name}.npy"), np.asarray(col))
+    meta = {"exported_at": datetime.datetime.now().isoformat(), "source": os.path.abspath(DATA_FILE),
+            "orders": len(orders), "lines": len(lines)}
+    tmp = os.path.join(directory, "categories.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "categories": orders.categories}, f)
+    os.replace(tmp, os.path.join(directory, "categories.json"))
+    return directory
+
+
+def load(directory: str = None, mmap: bool = True) -> tuple:
+    """(orders, lines) from an export; columns are memory-mapped unless mmap=False."""
+    directory = directory or _default_dir()
+    with open(os.path.join(directory, "categories.json"), "r", encoding="utf-8") as f:
+        categories = json.load(f)["categories"]
+    mode = "r" if mmap else None
+    tables = []
+    for prefix, spec in (("orders", ORDER_COLUMNS), ("lines", LINE_COLUMNS)):
+        tables.append(Columns({name: np.load(os.path.join(directory, f"{prefix}.{name}.npy"), mmap_mode=mode)
+                               for name in spec}, categories))
+    return tuple(tables)
+
+
+# --- Common analyses ---
+
+def repeat_rate_by_first_month(orders: Columns) -> dict:
+    """{first-order month: {"customers", "repeat", "rate"}}: share of each monthly cohort that ordered again."""
+    dated = orders.where(orders.between())
+    customers = np.asarray(dated["customer"])
+    if not len(customers):
+        return {}
+    n = len(orders.categories["customer"])
+    months = dated["month"]
+    first = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first, customers, months)
+    counts = np.bincount(customers, minlength=n)
+    seen = counts > 0
+    cohort_months, inverse = np.unique(first[seen], return_inverse=True)
+    size = np.bincount(inverse)
+    repeat = np.bincount(inverse, weights=(counts[seen] > 1))
+    labels = orders.labels("month", cohort_months)
+    return {label: {"customers": int(s), "repeat": int(r), "rate": round(r / s, 4)}
+            for label, s, r in zip(labels, size, repeat)}
+
+
+def basket_size_distribution(orders: Columns, percentiles=(50, 75, 90, 99)) -> dict:
+    """Units per order: histogram {units: orders} and percentiles."""
+    units = np.asarray(orders["units"])
+    sizes, counts = np.unique(units, return_counts=True)
+    return {
+        "histogram": dict(zip(sizes.tolist(), counts.tolist())),
+        "percentiles": dict(zip(percentiles, orders.percentile("units", list(percentiles)))),
+        "mean": float(units.mean()) if len(units) else 0.0,
+    }
+
+
+def revenue_by_weekday(orders: Columns) -> dict:
+    """Paid revenue per weekday, Monday first."""
+    paid = orders.where(orders.isin("payment", ["Paid"]) & orders.between())
+    by_day = paid.group_by("weekday", "total")
+    return {day: by_day.get(day, 0.0) for day in WEEKDAYS}
+
+
+def top_items(lines: Columns, n: int = 10) -> list:
+    """[(item name, units)] of the n best sellers."""
+    units = np.bincount(np.asarray(lines["item"]), weights=np.asarray(lines["quantity"], dtype=np.float64),
+                        minlength=len(lines.categories["item"]))
+    best = np.argsort(units)[::-1][:n]
+    return [(lines.categories["item_name"][i], int(units[i])) for i in best if units[i] > 0]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export orders to numpy columns and run the standard report.")
+    parser.add_argument("command", nargs="?", choices=["export", "report"], default="export")
+    parser.add_argument("--dir", help="export directory (default: columnar/ next to the data file)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        order_table, line_table = build()
+        path = export(order_table, line_table, args.dir)
+        print(f"Exported {len(order_table)} orders / {len(line_table)} lines to {path} "
+              f"in {time.perf_counter() - started:.2f}s")
+    else:
+        order_table, line_table = load(args.dir)
+        report = {
+            "repeat_rate_by_first_month": repeat_rate_by_first_month(order_table),
+            "basket_size": basket_size_distribution(order_table),
+            "revenue_by_weekday": revenue_by_weekday(order_table),
+            "top_items": top_items(line_table),
+        }
+        print(json.dumps(report, indent=2))
+        print(f"Report over {len(order_table)} orders / {len(line_table)} lines in {time.perf_counter() - started:.3f}s")
@@ -0,0 +1,156 @@
+# services/customer_stats.py
+"""
+Per-customer purchase statistics, kept up to date as orders change.
+
+Stats are built from MOCK_ORDER_DB on first use and then maintained from order
+events, so readers (menu recommendations, personalization) get them in O(1).
+
+Rebuild from scratch:  python -m services.customer_stats
+"""
+import threading
+
+from Mock_data.mock_data import MOCK_ORDER_DB, MOCK_MENU_DB
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED, CUSTOMERS_MERGED, STATE_RELOADED
+from services.shared_state import orders_in_flight
+
+_STATS = {}
+_BUILT = False
+_COUNTED = set()   # orders rebuild() counted before their ORDER_CREATED arrived
+_LOCK = threading.RLock()
+
+
+def _empty_stats() -> dict:
+    return {
+        "order_count": 0,
+        "paid_order_count": 0,
+        "total_spend": 0.0,
+        "last_order_id": None,
+        "last_order_at": None,
+        "item_counts": {},
+        "category_counts": {},
+        "top_item": None,
+        "favourite_category": None,
+    }
+
+
+def item_categories(item_id: str) -> list:
+    """Category of a menu item; falls back to its ingredients when no category is set."""
+    menu_item = MOCK_MENU_DB.get(item_id) or {}
+    if menu_item.get("category"):
+        return [menu_item["category"]]
+    return list(menu_item.get("ingredients") or [])
+
+
+def _bump(counts: dict, key: str, amount: int, stats: dict, top_field: str):
+    counts[key] = counts.get(key, 0) + amount
+    top = stats[top_field]
+    if top is None or counts[key] > counts.get(top, 0):
+        stats[top_field] = key
+
+
+def _apply_order(stats: dict, order: dict):
+    stats["order_count"] += 1
+    timestamp = order.get("timestamp")
+    if timestamp and (stats["last_order_at"] is None or timestamp >= stats["last_order_at"]):
+        stats["last_order_at"] = timestamp
+        stats["last_order_id"] = order.get("id")
+    for it in order.get("items", []):
+        name = it.get("name")
+        if not name:
+            continue
+        quantity = int(it.get("quantity", 1))
+        _bump(stats["item_counts"], name, quantity, stats, "top_item")
+        for category in item_categories(it.get("item_id")):
+            _bump(stats["category_counts"], category, quantity, stats, "favourite_category")
+
+
+def _apply_payment(stats: dict, order: dict):
+    stats["paid_order_count"] += 1
+    stats["total_spend"] += float(order.get("total", 0) or 0)
+
+
+def _recompute_tops(stats: dict):
+    stats["top_item"] = max(stats["item_counts"], key=stats["item_counts"].get, default=None)
+    stats["favourite_category"] = max(stats["category_counts"], key=stats["category_counts"].get, default=None)
+
+
+def rebuild():
+    """Recomputes every customer's stats from MOCK_ORDER_DB."""
+    global _BUILT
+    with _LOCK:
+        _STATS.clear()
+        orders = list(MOCK_ORDER_DB.values())
+        in_flight = orders_in_flight()
+        _COUNTED.clear()
+        _COUNTED.update(order.get("id") for order in orders if order.get("id") in in_flight)
+        for order in orders:
+            stats = _STATS.setdefault(order.get("customer_id"), _empty_stats())
+            _apply_order(stats, order)
+            if order.get("payment_status") == "Paid":
+                _apply_payment(stats, order)
+        _BUILT = True
+    return len(_STATS)
+
+
+def get_customer_stats(customer_id: str):
+    """Returns the precomputed stats for a customer, or None if they have no orders."""
+    if not _BUILT:
+        rebuild()
+    return _STATS.get(customer_id)
+
+
+# --- Incremental maintenance ---
+# Before the first read there is nothing to maintain: rebuild() will see every
+# order, and skips the events of those it counted while their event was pending.
+
+@subscribe(ORDER_CREATED)
+def _on_order_created(order: dict, **_):
+    with _LOCK:
+        if order.get("id") in _COUNTED:
+            _COUNTED.discard(order.get("id"))
+        elif _BUILT:
+            _apply_order(_STATS.setdefault(order.get("customer_id"), _empty_stats()), order)
+
+
+@subscribe(ORDER_UPDATED)
+def _on_order_updated(order: dict, changes: dict, previous: dict, **_):
+    if changes.get("payment_status") != "Paid" or previous.get("payment_status") == "Paid":
+        return
+    with _LOCK:
+        if _BUILT:
+            _apply_payment(_STATS.setdefault(order.get("customer_id"), _empty_stats()), order)
+
+
+@subscribe(CUSTOMERS_MERGED)
+def _on_customers_merged(target_id: str, merged_ids: list, **_):
+    with _LOCK:
+        if not _BUILT:
+            return
+        target = _STATS.setdefault(target_id, _empty_stats())
+        for old_id in merged_ids:
+            old = _STATS.pop(old_id, None)
+            if not old:
+                continue
+            for field in ("order_count", "paid_order_count", "total_spend"):
+                target[field] += old[field]
+            for field in ("item_counts", "category_counts"):
+                for key, count in old[field].items():
+                    target[field][key] = target[field].get(key, 0) + count
+            if old["last_order_at"] and (target["last_order_at"] is None or old["last_order_at"] > target["last_order_at"]):
+                target["last_order_at"] = old["last_order_at"]
+                target["last_order_id"] = old["last_order_id"]
+        _recompute_tops(target)
+
+
+@subscribe(STATE_RELOADED)
+def _on_state_reloaded(deleted: dict, **_):
+    global _BUILT
+    # Another worker merged customers (their orders moved with them): rebuild on the next read
+    if deleted.get("customers"):
+        with _LOCK:
+            _BUILT = False
+
+
+if __name__ == "__main__":
+    count = rebuild()
+    print(f"Customer stats rebuilt for {count} customers from {len(MOCK_ORDER_DB)} orders.")
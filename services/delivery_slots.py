@@ -0,0 +1,242 @@
+# services/delivery_slots.py
+"""
+Delivery slot scheduler: per-window capacity for riders and oven.
+
+Limits come from SITE_SETTINGS (editable in the dashboard), falling back to
+DEFAULTS:
+
+    delivery_windows               ["10:00–12:00", ...]
+    delivery_riders                riders on shift per window
+    delivery_orders_per_rider      drops one rider can make in a window
+    oven_units_per_window          items the kitchen can bake for one window
+    delivery_days_ahead            how far ahead windows can be booked
+    delivery_same_day_cutoff       later than this, today's windows are closed
+
+An order occupies its `delivery_slot` ({"date", "window"}) unless it is
+Cancelled. Occupancy is a per-day list of [orders, units] per window, built
+from the orders on first use and kept current from ORDER_CREATED and
+ORDER_UPDATED (status changes, cancellations, moved slots, and orders booked
+by other workers). Each order's booking is remembered, so replayed events
+never count an order twice. ProcessOrder books through book(), which checks
+and takes capacity under one lock, so concurrent orders can't overfill a
+window, and gives the place back with release() if the order isn't stored.
+
+Rebuild from scratch:  python -m services.delivery_slots
+"""
+import datetime
+import threading
+
+from Mock_data.mock_data import MOCK_ORDER_DB, SITE_SETTINGS
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED
+
+DEFAULTS = {
+    "delivery_windows": ["10:00–12:00", "12:00–14:00", "14:00–16:00", "16:00–18:00"],
+    "delivery_riders": 2,
+    "delivery_orders_per_rider": 4,
+    "oven_units_per_window": 60,
+    "delivery_days_ahead": 30,
+    "delivery_same_day_cutoff": "12:00",
+}
+
+_LOCK = threading.RLock()
+_BUILT = False
+_OCCUPANCY = {}   # "YYYY-MM-DD" -> {window: [orders, units]}
+_BOOKED = {}      # order_id -> (date, window, units) counted in _OCCUPANCY
+_PRUNED = ""      # day _BOOKED was last pruned
+
+
+def setting(key: str):
+    value = SITE_SETTINGS.get(key)
+    return DEFAULTS[key] if value in (None, "") else value
+
+
+def windows() -> list:
+    value = setting("delivery_windows")
+    if isinstance(value, str):
+        value = [w.strip() for w in value.split(",") if w.strip()]
+    return [_normalize_window(w) for w in value]
+
+
+def _normalize_window(window: str) -> str:
+    return window.strip().replace(" ", "").replace("-", "–")
+
+
+def limits() -> dict:
+    return {
+        "orders": int(setting("delivery_riders")) * int(setting("delivery_orders_per_rider")),
+        "units": int(setting("oven_units_per_window")),
+    }
+
+
+def _units(order: dict) -> int:
+    return sum(int(it.get("quantity", 1)) for it in order.get("items", []))
+
+
+def _occupies(order: dict) -> bool:
+    return bool(order.get("delivery_slot")) and order.get("status") != "Cancelled"
+
+
+def _add(booking: tuple, sign: int):
+    date, window, units = booking
+    used = _OCCUPANCY.setdefault(date, {}).setdefault(window, [0, 0])
+    used[0] += sign
+    used[1] += sign * units
+
+
+def _sync(order: dict):
+    """Brings the order's counted booking in line with its record."""
+    slot = order.get("delivery_slot") if _occupies(order) else None
+    booking = (slot["date"], slot["window"], _units(order)) if slot else None
+    counted = _BOOKED.get(order["id"])
+    if booking == counted:
+        return
+    if counted:
+        _add(counted, -1)
+        del _BOOKED[order["id"]]
+    if booking:
+        _add(booking, 1)
+        _BOOKED[order["id"]] = booking
+
+
+def rebuild() -> int:
+    """Recomputes occupancy for today onwards from MOCK_ORDER_DB."""
+    global _BUILT
+    today = datetime.date.today().isoformat()
+    with _LOCK:
+        _OCCUPANCY.clear()
+        _BOOKED.clear()
+        for order in list(MOCK_ORDER_DB.values()):
+            if _occupies(order) and order["delivery_slot"].get("date", "") >= today:
+                _sync(order)
+        _BUILT = True
+    return len(_BOOKED)
+
+
+def _ensure_built():
+    if not _BUILT:
+        with _LOCK:
+            if not _BUILT:
+                rebuild()
+
+
+def _prune(today: str):
+    global _PRUNED
+    if _PRUNED == today:
+        return
+    for day in [d for d in _OCCUPANCY if d < today]:
+        del _OCCUPANCY[day]
+    for order_id in [o for o, booking in _BOOKED.items() if booking[0] < today]:
+        del _BOOKED[order_id]
+    _PRUNED = today
+
+
+def _open_windows(day: datetime.date, now: datetime.datetime) -> list:
+    """Windows of `day` that can still be booked at `now` (capacity aside)."""
+    if day != now.date():
+        return windows()
+    if now.strftime("%H:%M") >= setting("delivery_same_day_cutoff"):
+        return []
+    return [w for w in windows() if w.split("–")[0] > now.strftime("%H:%M")]
+
+
+def availability(days: int = None, units: int = 1, now: datetime.datetime = None) -> list:
+    """[{"date", "windows": {window: orders left}}] for days with room for an order of `units`."""
+    _ensure_built()
+    now = now or datetime.datetime.now()
+    days = days or int(setting("delivery_days_ahead"))
+    cap = limits()
+    result = []
+    with _LOCK:
+        _prune(now.date().isoformat())
+        for offset in range(days):
+            day = now.date() + datetime.timedelta(days=offset)
+            booked = _OCCUPANCY.get(day.isoformat(), {})
+            free = {}
+            for window in _open_windows(day, now):
+                orders, used_units = booked.get(window, (0, 0))
+                if orders < cap["orders"] and used_units + units <= cap["units"]:
+                    free[window] = cap["orders"] - orders
+            if free:
+                result.append({"date": day.isoformat(), "windows": free})
+    return result
+
+
+def _parse_request(requested: str):
+    """'12:00–14:00' or '2026-10-20 12:00-14:00' -> (date or None, window)."""
+    requested = requested.strip()
+    if len(requested) > 10 and requested[4] == "-" and requested[10] in " T":
+        return requested[:10], _normalize_window(requested[11:])
+    return None, _normalize_window(requested)
+
+
+def book(order: dict, requested: str = "", now: datetime.datetime = None):
+    """Books the requested window (or the earliest with room) for an order not yet stored.
+
+    Sets order["delivery_slot"] and returns None, or returns an error message.
+    """
+    _ensure_built()
+    now = now or datetime.datetime.now()
+    units = _units(order)
+    want_date, want_window = _parse_request(requested) if requested else (None, None)
+    if want_window and want_window not in windows():
+        return f"'{requested}' is not a delivery window. Windows: {', '.join(windows())}."
+    with _LOCK:
+        # Checked and taken under one lock: concurrent orders can't both get the last place
+        for day in availability(units=units, now=now):
+            if want_date and day["date"] != want_date:
+                continue
+            if want_window and want_window not in day["windows"]:
+                continue
+            window = want_window or next(iter(day["windows"]))
+            order["delivery_slot"] = {"date": day["date"], "window": window}
+            _sync(order)
+            return None
+    if want_window:
+        return f"The {want_window} window is fully booked{' on ' + want_date if want_date else ''}. Please pick another time."
+    return "All delivery windows are fully booked. Please try again later."
+
+
+def release(order_id: str) -> bool:
+    """Gives back the place booked for an order that was never stored. False if it held none."""
+    with _LOCK:
+        booking = _BOOKED.pop(order_id, None)
+        if booking:
+            _add(booking, -1)
+    return booking is not None
+
+
+def day_label(date: str, today: datetime.date = None) -> str:
+    today = today or datetime.date.today()
+    day = datetime.date.fromisoformat(date)
+    if day == today:
+        return "Today"
+    if day == today + datetime.timedelta(days=1):
+        return "Tomorrow"
+    return day.strftime("%a %d %b")
+
+
+def slot_label(slot: dict) -> str:
+    return f"{day_label(slot['date'])}, {slot['window']}"
+
+
+@subscribe(ORDER_CREATED)
+def _on_order_created(order: dict, **_):
+    if order.get("delivery_slot"):
+        with _LOCK:
+            if _BUILT:
+                _sync(order)
+
+
+@subscribe(ORDER_UPDATED)
+def _on_order_updated(order: dict, changes: dict, previous: dict, **_):
+    if not {"status", "delivery_slot", "items"} & set(previous):
+        return
+    with _LOCK:
+        if _BUILT:
+            _sync(order)
+
+
+if __name__ == "__main__":
+    print(f"Delivery occupancy rebuilt from {rebuild()} booked orders.")
+    for day in availability(days=7):
+        print(day["date"], ", ".join(f"{w} ({left} left)" for w, left in day["windows"].items()))
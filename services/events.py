@@ -0,0 +1,44 @@
+# services/events.py
+"""
+Tiny in-process event hub.
+
+Code that mutates the mock DB publishes what happened; derived views (stats,
+indexes, aggregates) subscribe and update themselves incrementally. Handlers
+run synchronously on the publishing thread and must be cheap.
+"""
+import threading
+from collections import defaultdict
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# --- Event names ---
+ORDER_CREATED = "order_created"          # order
+ORDER_UPDATED = "order_updated"          # order, changes, previous
+CUSTOMERS_MERGED = "customers_merged"    # target_id, merged_ids
+CUSTOMER_UPDATED = "customer_updated"    # customer_id (created or changed)
+MENU_UPDATED = "menu_updated"            # item_id
+PROMOS_UPDATED = "promos_updated"        # promo_id
+STATE_RELOADED = "state_reloaded"        # changed, deleted: {collection: [ids]} pulled from other workers
+
+_SUBSCRIBERS = defaultdict(list)
+_LOCK = threading.Lock()
+
+
+def subscribe(event: str):
+    """Decorator registering a handler for `event`."""
+    def register(handler):
+        with _LOCK:
+            _SUBSCRIBERS[event].append(handler)
+        return handler
+    return register
+
+
+def publish(event: str, **payload):
+    """Calls every handler for `event`. A failing handler never breaks the caller."""
+    for handler in list(_SUBSCRIBERS.get(event, ())):
+        try:
+            handler(**payload)
+        except Exception as e:
+            logger.exception("Events: handler %s failed on %s: %s", handler.__name__, event, e)
@@ -0,0 +1,364 @@
+# services/feedback_log.py
+"""
+Append-only feedback log stored as rotated JSONL segments.
+
+    from services.feedback_log import append_feedback, query_feedback
+    append_feedback({"log_id": ..., "timestamp": ..., "user_id": ..., "message": ..., "sentiment": ...})
+    query_feedback(sentiments=CRM_CONFIG.CRITICAL_SENTIMENT, limit=10)
+
+Each entry is one line in FEEDBACK_LOG_DIR/segment-NNNNNN.jsonl; a new segment
+is started once the active one passes FEEDBACK_SEGMENT_MAX_BYTES. Appending
+writes one line and updates the index, so ingestion cost doesn't grow with the
+log.
+
+The in-memory index holds only positions: the (segment, offset) of every
+entry, its time, and position lists per sentiment and per user, plus counts per
+hour bucket. Entries themselves are read from disk when queried (with a small
+cache of recent ones), newest first.
+
+Several processes (API workers with STATE_BACKEND=sqlite) can share one log:
+appends hold an exclusive flock() on LOCK_FILE, and each process indexes what
+the others appended (including new segments) before it appends or queries.
+On Windows, where there is no flock(), run one process per log.
+
+The index is built on first use by scanning the segments. Feedback still
+sitting in data.json (MOCK_FEEDBACK_LOG) is moved into the log at that point.
+"""
+import bisect
+import datetime
+import heapq
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per log
+    fcntl = None
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import DATA_FILE, MOCK_FEEDBACK_LOG, persist_changes
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+BUCKET_SECONDS = 3600
+CACHE_SIZE = 1000
+SEGMENT_PREFIX = "segment-"
+LOCK_FILE = ".lock"
+
+
+def _log_dir() -> str:
+    # Next to the data file by default, so scratch datasets get scratch logs
+    return CRM_CONFIG.FEEDBACK_LOG_DIR or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "feedback_log")
+
+
+def _epoch(timestamp: str) -> float:
+    try:
+        return datetime.datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_epoch(moment) -> float:
+    if moment is None:
+        return None
+    if isinstance(moment, datetime.datetime):
+        return moment.timestamp()
+    return float(moment)
+
+
+def _descending(positions: list, before):
+    """The ascending `positions` below `before`, newest first."""
+    top = len(positions) if before is None else bisect.bisect_left(positions, before)
+    return (positions[i] for i in range(top - 1, -1, -1))
+
+
+def _contains(positions: list, position: int) -> bool:
+    i = bisect.bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+
+class FeedbackLog:
+    def __init__(self, directory: str, segment_max_bytes: int):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.RLock()
+        self._lock_file = None           # flock()ed by appends, shared with other processes
+        self._writing_depth = 0          # nested _writing() blocks only lock and unlock at the outermost
+        self._segments = []              # segment numbers, ascending
+        self._active = None              # open file of the newest segment
+        self._active_size = 0
+        # Index: position -> where the entry lives and when it was logged
+        self._seg = array("l")
+        self._offset = array("q")
+        self._time = array("d")
+        self._by_sentiment = {}          # sentiment (lower) -> [position]
+        self._by_user = {}               # user_id -> [position]
+        self._buckets = {}               # hour bucket -> {sentiment: count}
+        self._cache = OrderedDict()      # position -> entry
+
+    # --- Loading ---
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}.jsonl")
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, LOCK_FILE), "ab")
+        with self._writing(catch_up=False):
+            for name in sorted(os.listdir(self.directory)):
+                if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl"):
+                    self._segments.append(int(name[len(SEGMENT_PREFIX):-len(".jsonl")]))
+            if not self._segments:
+                self._segments.append(1)
+            for number in self._segments[:-1]:
+                self._scan(number, 0)
+            self._open_active()
+            self._end_torn_line()
+            self._active_size = self._scan(self._segments[-1], 0)
+
+    def _open_active(self):
+        self._active = open(self._segment_path(self._segments[-1]), "ab")
+        self._active_size = 0
+
+    def _end_torn_line(self):
+        """A crash can leave a last line without its newline; end it so the next entry starts fresh."""
+        if self._active.tell():
+            with open(self._segment_path(self._segments[-1]), "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._active.write(b"\n")
+                    self._active.flush()
+
+    def _scan(self, number: int, offset: int) -> int:
+        """Indexes the complete lines of a segment from `offset`; returns where they end."""
+        with open(self._segment_path(number), "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing it
+                    break
+                try:
+                    self._index(json.loads(line), number, offset)
+                except ValueError:
+                    logger.warning("Feedback Log: Skipping unreadable line in segment %s at %s", number, offset)
+                offset += len(line)
+        return offset
+
+    def _catch_up(self):
+        """Indexes entries other processes appended since we last looked (two stat calls when none)."""
+        while True:
+            if os.path.getsize(self._segment_path(self._segments[-1])) > self._active_size:
+                self._active_size = self._scan(self._segments[-1], self._active_size)
+            if not os.path.exists(self._segment_path(self._segments[-1] + 1)):
+                return
+            # Another process started a new segment
+            self._active.close()
+            self._segments.append(self._segments[-1] + 1)
+            self._open_active()
+
+    @contextmanager
+    def _writing(self, catch_up: bool = True):
+        with self._lock:
+            outer = self._writing_depth == 0
+            if outer and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._writing_depth += 1
+            try:
+                if outer and catch_up:
+                    self._catch_up()
+                yield
+            finally:
+                self._writing_depth -= 1
+                if outer and fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _index(self, entry: dict, segment: int, offset: int):
+        position = len(self._seg)
+        ts = _epoch(entry.get("timestamp"))
+        self._seg.append(segment)
+        self._offset.append(offset)
+        self._time.append(ts)
+        sentiment = (entry.get("sentiment") or "neutral").lower()
+        self._by_sentiment.setdefault(sentiment, []).append(position)
+        self._by_user.setdefault(entry.get("user_id") or "", []).append(position)
+        bucket = self._buckets.setdefault(int(ts // BUCKET_SECONDS) * BUCKET_SECONDS, {})
+        bucket[sentiment] = bucket.get(sentiment, 0) + 1
+        return position
+
+    # --- Writing ---
+
+    def append(self, entry: dict):
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._writing():
+            if self._active_size and self._active_size + len(line) > self.segment_max_bytes:
+                self._active.close()
+                self._segments.append(self._segments[-1] + 1)
+                self._open_active()
+            offset = self._active_size
+            self._active.write(line)
+            self._active.flush()
+            self._active_size += len(line)
+            position = self._index(entry, self._segments[-1], offset)
+            self._remember(position, entry)
+
+    # --- Reading ---
+
+    def _remember(self, position: int, entry: dict):
+        self._cache[position] = entry
+        self._cache.move_to_end(position)
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _read(self, position: int) -> dict:
+        entry = self._cache.get(position)
+        if entry is None:
+            with open(self._segment_path(self._seg[position]), "rb") as f:
+                f.seek(self._offset[position])
+                entry = json.loads(f.readline())
+            self._remember(position, entry)
+        return entry
+
+    def read(self, position: int) -> dict:
+        with self._lock:
+            return self._read(position)
+
+    def entries_since(self, position: int):
+        """Yields (position, entry) for every entry from `position` on, in log order."""
+        with self._lock:
+            self._catch_up()
+            end = len(self._seg)
+        while position < end:
+            segment = self._seg[position]
+            with open(self._segment_path(segment), "rb") as f:
+                while position < end and self._seg[position] == segment:
+                    f.seek(self._offset[position])
+                    yield position, json.loads(f.readline())
+                    position += 1
+
+    def _candidates(self, sentiments, user_id, before):
+        """Positions to consider below `before`, newest first (lazily). None means every position."""
+        by_sentiment = [self._by_sentiment.get(s, []) for s in {s.lower() for s in sentiments or ()}]
+        by_user = self._by_user.get(user_id, []) if user_id is not None else None
+        if not sentiments:
+            return None if by_user is None else _descending(by_user, before)
+        # Merge the per-sentiment lists from their ends, so a page only reads as far back as it needs
+        merged = heapq.merge(*(_descending(lst, before) for lst in by_sentiment), reverse=True)
+        if by_user is None:
+            return merged
+        # Walk the shorter side, bisect for membership in the other
+        if len(by_user) < sum(map(len, by_sentiment)):
+            return (p for p in _descending(by_user, before) if any(_contains(lst, p) for lst in by_sentiment))
+        return (p for p in merged if _contains(by_user, p))
+
+    def query(self, sentiments=None, user_id=None, exclude_sentiments=None, since=None, until=None,
+              limit: int = 50, before: int = None) -> dict:
+        """Newest-first page of entries. Pass the returned `next_before` as `before` for the next page."""
+        since, until = _to_epoch(since), _to_epoch(until)
+        with self._lock:
+            self._catch_up()
+            if exclude_sentiments:
+                # Turned into an include list so excluded entries are never read
+                excluded = {s.lower() for s in exclude_sentiments}
+                sentiments = [s for s in (sentiments or self._by_sentiment) if s.lower() not in excluded]
+                if not sentiments:
+                    return {"items": [], "next_before": None}
+            positions = self._candidates(sentiments, user_id, before)
+            if positions is None:
+                total = len(self._seg)
+                top = total if before is None else min(before, total)
+                positions = range(top - 1, -1, -1)
+
+            items, next_before = [], None
+            for position in positions:
+                ts = self._time[position]
+                if until is not None and ts >= until:
+                    continue
+                # Positions are in append order, which is time order for live feedback
+                if since is not None and ts < since:
+                    break
+                if len(items) == limit:
+                    next_before = position + 1
+                    break
+                items.append(self._read(position))
+            return {"items": items, "next_before": next_before}
+
+    def counts(self, period: str = "day", since=None, until=None) -> list:
+        """[{period_start, total, <sentiment>: n}] oldest first, from the hourly buckets."""
+        since, until = _to_epoch(since), _to_epoch(until)
+        grouped = {}
+        with self._lock:
+            self._catch_up()
+            buckets = list(self._buckets.items())
+        for bucket, by_sentiment in buckets:
+            if (since is not None and bucket + BUCKET_SECONDS <= since) or (until is not None and bucket >= until):
+                continue
+            start = datetime.datetime.fromtimestamp(bucket)
+            if period == "day":
+                start = start.replace(hour=0)
+            elif period == "week":
+                start = (start - datetime.timedelta(days=start.weekday())).replace(hour=0)
+            row = grouped.setdefault(start, {"total": 0})
+            for sentiment, n in by_sentiment.items():
+                row[sentiment] = row.get(sentiment, 0) + n
+                row["total"] += n
+        return [{"period_start": start.isoformat(), **row} for start, row in sorted(grouped.items())]
+
+    def __len__(self):
+        with self._lock:
+            self._catch_up()
+            return len(self._seg)
+
+
+_LOG = None
+_LOG_LOCK = threading.Lock()
+
+
+def get_feedback_log() -> FeedbackLog:
+    global _LOG
+    if _LOG is None:
+        with _LOG_LOCK:
+            if _LOG is None:
+                log = FeedbackLog(_log_dir(), CRM_CONFIG.FEEDBACK_SEGMENT_MAX_BYTES)
+                log.load()
+                _migrate_legacy(log)
+                _LOG = log
+    return _LOG
+
+
+def _migrate_legacy(log: FeedbackLog):
+    """Moves feedback still stored in data.json into the log (once)."""
+    if not MOCK_FEEDBACK_LOG:
+        return
+    # Under the append lock, so workers starting together don't both migrate
+    with log._writing():
+        known = set()
+        if len(log):
+            known = {entry.get("log_id") for entry in log.query(limit=len(MOCK_FEEDBACK_LOG) + len(log))["items"]}
+        legacy = sorted(MOCK_FEEDBACK_LOG, key=lambda e: e.get("timestamp") or "")
+        for entry in legacy:
+            if entry.get("log_id") not in known:
+                log.append(entry)
+    del MOCK_FEEDBACK_LOG[:]
+    persist_changes()
+    logger.info("Feedback Log: Migrated %s entries from data.json to %s", len(legacy), log.directory)
+
+
+def append_feedback(entry: dict):
+    get_feedback_log().append(entry)
+
+
+def query_feedback(**filters) -> dict:
+    return get_feedback_log().query(**filters)
+
+
+def critical_feedback(limit: int = 10, since=None) -> list:
+    return get_feedback_log().query(sentiments=CRM_CONFIG.CRITICAL_SENTIMENT, limit=limit, since=since)["items"]
+
+
+def feedback_counts(period: str = "day", since=None, until=None) -> list:
+    return get_feedback_log().counts(period, since, until)
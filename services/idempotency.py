@@ -0,0 +1,204 @@
+# services/idempotency.py
+"""
+Idempotency-Key support for /api/chat and the /api/data write endpoints.
+
+A client that may retry a request (network error, double click) sends the
+same `Idempotency-Key` header each time. The first request with a key runs;
+later ones with that key get its stored response instead of running again:
+
+    response, replayed = IDEMPOTENCY_CACHE.run(key, fingerprint, func)
+    response, replayed = await IDEMPOTENCY_CACHE.run_async(key, fingerprint, func)
+
+- A duplicate that arrives while the first is still running waits for it
+  (up to IDEMPOTENCY_WAIT_SECONDS, then IdempotencyInProgress).
+- If the first raises, or its response isn't worth keeping (`keep` returns
+  False, e.g. the chat "try again later" reply), nothing is stored and the
+  next request with the key runs again.
+- Reusing a key for a different request (another fingerprint) raises
+  IdempotencyConflict.
+
+Responses are kept in memory, least recently used first out, for
+IDEMPOTENCY_TTL_SECONDS and at most IDEMPOTENCY_MAX_KEYS keys. With
+STATE_BACKEND=sqlite keys are also claimed in the shared store, so a retry
+that lands on another worker waits for or replays the first worker's response.
+Responses must be JSON-serializable for that.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import STATE_STORE
+from services.metrics import record_cache
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# How often a request waiting on another worker checks the shared store
+SHARED_POLL_SECONDS = 0.05
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+class IdempotencyInProgress(Exception):
+    """The request holding the key is still running after the wait timeout."""
+
+
+class _Entry:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+        self.stored = False          # done with a response to replay (else: failed, run again)
+        self.expires = None
+
+
+class IdempotencyCache:
+    def __init__(self, ttl_seconds: float, max_keys: int, wait_seconds: float, store=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.wait_seconds = wait_seconds
+        self.store = store
+        self._entries = OrderedDict()   # key -> _Entry, least recently used first
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Least recently used keys sit at the front, so expired ones are found without a full scan
+        # (expired keys further back are dropped when next looked up). A running entry pushed out
+        # here is still waited on by the duplicates that already hold it.
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            expired = oldest.expires is not None and oldest.expires < now
+            if not expired and len(self._entries) <= self.max_keys:
+                break
+            self._entries.popitem(last=False)
+
+    def _claim(self, key: str, fingerprint: str):
+        """(True, entry) if the caller should run the request, else (False, entry or None to poll the store)."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires < now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyConflict(key)
+                self._entries.move_to_end(key)
+                return False, entry
+            entry = self._entries[key] = _Entry(fingerprint)
+            self._evict(now)
+        if self.store is None:
+            return True, entry
+        try:
+            claimed, stored_fingerprint, response = self.store.claim_key(key, fingerprint, self.wait_seconds)
+        except Exception:
+            self._fail(key, entry)
+            raise
+        if claimed:
+            return True, entry
+        if stored_fingerprint != fingerprint:
+            self._fail(key, entry)
+            raise IdempotencyConflict(key)
+        if response is not None:
+            # Finished on another worker: keep a local copy for the next retry
+            self._finish(entry, json.loads(response))
+            return False, entry
+        # Running on another worker; local duplicates poll the store too
+        self._fail(key, entry)
+        return False, None
+
+    def _finish(self, entry: _Entry, response):
+        entry.response = response
+        entry.stored = True
+        entry.expires = time.monotonic() + self.ttl_seconds
+        entry.done.set()
+
+    def _fail(self, key: str, entry: _Entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _execute(self, key: str, entry: _Entry, func, keep):
+        try:
+            response = func()
+        except BaseException:
+            self._release(key, entry)
+            raise
+        if keep is not None and not keep(response):
+            self._release(key, entry)
+            return response
+        if self.store is not None:
+            try:
+                self.store.finish_key(key, json.dumps(response), self.ttl_seconds)
+            except Exception as e:
+                # The response is still replayed by this worker
+                logger.error("Idempotency: Could not store the response for %s: %s", key, e)
+        self._finish(entry, response)
+        return response
+
+    def _release(self, key: str, entry: _Entry):
+        if self.store is not None:
+            try:
+                self.store.release_key(key)
+            except Exception as e:
+                logger.error("Idempotency: Could not release %s: %s", key, e)
+        self._fail(key, entry)
+
+    def _wait(self, key: str, fingerprint: str, entry):
+        """Blocks until the running request finishes. (True, response) to replay, (False, None) to claim again."""
+        if entry is not None:
+            if not entry.done.wait(self.wait_seconds):
+                raise IdempotencyInProgress(key)
+            return entry.stored, entry.response
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            row = self.store.read_key(key)
+            if row is None:
+                return False, None
+            if row[0] != fingerprint:
+                raise IdempotencyConflict(key)
+            if row[1] is not None:
+                return True, json.loads(row[1])
+            time.sleep(SHARED_POLL_SECONDS)
+        raise IdempotencyInProgress(key)
+
+    def run(self, key: str, fingerprint: str, func, keep=None):
+        """(response, replayed). Runs func() unless a request with this key already did or is doing so."""
+        while True:
+            claimed, entry = self._claim(key, fingerprint)
+            if claimed:
+                record_cache("idempotency", False)
+                return self._execute(key, entry, func, keep), False
+            replayed, response = self._wait(key, fingerprint, entry)
+            if replayed:
+                record_cache("idempotency", True)
+                return response, True
+
+    async def run_async(self, key: str, fingerprint: str, func, keep=None):
+        """run() for async endpoints: func() runs on the caller's thread, waiting happens off the event loop."""
+        while True:
+            claimed, entry = self._claim(key, fingerprint)
+            if claimed:
+                record_cache("idempotency", False)
+                return self._execute(key, entry, func, keep), False
+            if entry is not None and entry.done.is_set():
+                replayed, response = entry.stored, entry.response
+            else:
+                replayed, response = await asyncio.to_thread(self._wait, key, fingerprint, entry)
+            if replayed:
+                record_cache("idempotency", True)
+                return response, True
+
+
+IDEMPOTENCY_CACHE = IdempotencyCache(
+    ttl_seconds=CRM_CONFIG.IDEMPOTENCY_TTL_SECONDS,
+    max_keys=CRM_CONFIG.IDEMPOTENCY_MAX_KEYS,
+    wait_seconds=CRM_CONFIG.IDEMPOTENCY_WAIT_SECONDS,
+    store=STATE_STORE,
+)
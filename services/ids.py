@@ -0,0 +1,164 @@
+# services/ids.py
+"""
+Monotonic, time-sortable record IDs (Snowflake layout, Crockford base32).
+
+    from services.ids import new_id
+    new_id("O")    # 'O-0B5XQ7JM6G01Z'
+
+A 64-bit value is packed as
+
+    42 bits  milliseconds since ID_EPOCH (good until ~2163)
+    10 bits  node (CRM_CONFIG.ID_NODE, or derived from host + pid)
+    12 bits  sequence within the millisecond
+
+and written as 13 base32 characters, so IDs sort as strings in creation order
+and any collection keyed by them can be range-scanned by time (id_bounds,
+scan). One process hands out up to 4096 IDs per millisecond; past that, or if
+the clock steps back, it borrows the next millisecond rather than repeating.
+
+Older records use `O-<unix seconds>` / `L-<hex>`; id_time() understands
+those too.
+"""
+import bisect
+import datetime
+import os
+import re
+import socket
+import threading
+import time
+import zlib
+
+from config import CRM_CONFIG
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"   # Crockford: no I, L, O, U
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_DECODE.update({"I": 1, "L": 1, "O": 0})
+
+ID_EPOCH_MS = 1704067200000    # 2024-01-01T00:00:00Z
+TIME_BITS, NODE_BITS, SEQ_BITS = 42, 10, 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQ = (1 << SEQ_BITS) - 1
+MAX_ID_MS = ID_EPOCH_MS + (1 << TIME_BITS) - 1
+WIDTH = 13   # ceil(64 / 5)
+
+_LEGACY_SECONDS = re.compile(r"^[A-Z]+-(\d{10})(?:-\d+)?$")
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(WIDTH):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def _decode(text: str) -> int:
+    value = 0
+    for ch in text.upper():
+        value = (value << 5) | _DECODE[ch]
+    return value
+
+
+def _default_node() -> int:
+    if CRM_CONFIG.ID_NODE is not None:
+        return CRM_CONFIG.ID_NODE & MAX_NODE
+    # Distinct per worker process on a host; set ID_NODE explicitly across hosts
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_NODE
+
+
+def make_id(prefix: str, timestamp_ms: int, node: int = 0, seq: int = 0) -> str:
+    """Builds an ID for a given time (e.g. for generated or imported records).
+
+    Raises ValueError for a time the layout can't hold (before ID_EPOCH or after ~2163):
+    it would wrap around and sort out of creation order.
+    """
+    if not ID_EPOCH_MS <= timestamp_ms <= MAX_ID_MS:
+        raise ValueError(f"timestamp {timestamp_ms} ms is outside the ID range (2024-01-01 to ~2163)")
+    value = ((timestamp_ms - ID_EPOCH_MS) << (NODE_BITS + SEQ_BITS)) | ((node & MAX_NODE) << SEQ_BITS) | (seq & MAX_SEQ)
+    return f"{prefix}-{_encode(value)}"
+
+
+class IdGenerator:
+    def __init__(self, node: int = None):
+        self.node = _default_node() if node is None else node & MAX_NODE
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._seq = 0
+
+    def next_value(self) -> tuple:
+        """(timestamp_ms, seq), strictly increasing across calls."""
+        now = time.time_ns() // 1_000_000
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms, self._seq = now, 0
+            elif self._seq < MAX_SEQ:
+                self._seq += 1
+            else:
+                self._last_ms, self._seq = self._last_ms + 1, 0
+            return self._last_ms, self._seq
+
+    def new_id(self, prefix: str) -> str:
+        timestamp_ms, seq = self.next_value()
+        return make_id(prefix, timestamp_ms, self.node, seq)
+
+
+_GENERATOR = None
+_GENERATOR_PID = None
+_GENERATOR_LOCK = threading.Lock()
+
+
+def _generator() -> IdGenerator:
+    global _GENERATOR, _GENERATOR_PID
+    # Re-derive the node after a fork (uvicorn/gunicorn workers)
+    if _GENERATOR is None or _GENERATOR_PID != os.getpid():
+        with _GENERATOR_LOCK:
+            if _GENERATOR is None or _GENERATOR_PID != os.getpid():
+                _GENERATOR, _GENERATOR_PID = IdGenerator(), os.getpid()
+    return _GENERATOR
+
+
+def new_id(prefix: str) -> str:
+    return _generator().new_id(prefix)
+
+
+def id_time(record_id: str):
+    """Creation time (UTC datetime) encoded in an ID, or None if it carries none."""
+    prefix, _, body = (record_id or "").partition("-")
+    if len(body) == WIDTH and all(ch in _DECODE for ch in body.upper()):
+        ms = (_decode(body) >> (NODE_BITS + SEQ_BITS)) + ID_EPOCH_MS
+        return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc)
+    legacy = _LEGACY_SECONDS.match(record_id or "")
+    if legacy:
+        return datetime.datetime.fromtimestamp(int(legacy.group(1)), tz=datetime.timezone.utc)
+    return None
+
+
+def _to_ms(moment) -> int:
+    if isinstance(moment, datetime.datetime):
+        if moment.tzinfo is None:
+            moment = moment.astimezone()
+        return int(moment.timestamp() * 1000)
+    return int(moment * 1000)
+
+
+def _clamp_ms(timestamp_ms: int) -> int:
+    # A bound outside the ID range covers everything (or nothing) on that side
+    return min(max(timestamp_ms, ID_EPOCH_MS), MAX_ID_MS)
+
+
+def id_bounds(prefix: str, start=None, end=None) -> tuple:
+    """(low, high) ID strings covering [start, end); datetimes or unix seconds."""
+    low = make_id(prefix, _clamp_ms(_to_ms(start))) if start is not None else f"{prefix}-{'0' * WIDTH}"
+    high = make_id(prefix, _clamp_ms(_to_ms(end))) if end is not None else f"{prefix}-{'Z' * WIDTH}"
+    return low, high
+
+
+def scan(sorted_ids: list, prefix: str, start=None, end=None) -> list:
+    """IDs from a sorted list created in [start, end), by bisection."""
+    low, high = id_bounds(prefix, start, end)
+    return sorted_ids[bisect.bisect_left(sorted_ids, low):bisect.bisect_left(sorted_ids, high)]
+
+
+def normalize_id(record_id: str) -> str:
+    """Customers type IDs in any case; new-style IDs are upper-case."""
+    return (record_id or "").strip().upper()
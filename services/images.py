@@ -0,0 +1,217 @@
+# services/images.py
+"""
+Resized WebP/JPEG variants of the menu images.
+
+Menu items point at full-size PNGs (`image_url: "/images/buns.png"`, served
+from dashboard/public). For each local image the API offers variants at the
+IMAGE_WIDTHS no wider than the original:
+
+    /api/images/<content hash>/<width>.webp
+    /api/images/<content hash>/<width>.jpg      (transparency flattened onto white)
+
+The URL carries a hash of the source file, so a variant never changes and is
+served with a one-year immutable Cache-Control; replacing the PNG gives new
+URLs. Variants are rendered on first request and kept in IMAGE_CACHE_DIR
+under the same name, written to a temporary file and renamed into place so
+concurrent workers never serve half a file.
+
+    variants("/images/buns.png")   # {"src", "webp_srcset", "jpeg_srcset", "width", "height"} or None
+    with_variants(menu_item)       # a copy of the item with "image_variants" added
+    render(digest, 320, "webp")    # path of the cached variant, rendered if needed
+
+Remote image URLs (http...) are left alone. Pillow is optional: without it
+the menu is served without variants.
+
+Pre-render every menu image (and drop variants of images no longer used):
+    python -m services.images [--prune]
+"""
+import hashlib
+import os
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # variants are off; menu items keep their original image_url
+    Image = None
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import DATA_FILE
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+URL_PREFIX = "/api/images"
+
+_LOCK = threading.Lock()
+_SOURCES = {}        # digest -> source path
+_DESCRIBED = {}      # source path -> (mtime_ns, size, digest, width, height)
+_RENDERING = {}      # variant file name -> lock held while it is rendered
+
+
+def _source_dir() -> str:
+    return CRM_CONFIG.IMAGE_SOURCE_DIR or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashboard", "public")
+
+
+def _cache_dir() -> str:
+    # Next to the data file by default, like the other derived files
+    return CRM_CONFIG.IMAGE_CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "image_cache")
+
+
+def source_path(image_url: str):
+    """Local file behind a menu image_url, or None (remote, missing, or outside the source directory)."""
+    if not image_url or "://" in image_url or image_url.startswith("//"):
+        return None
+    root = os.path.realpath(_source_dir())
+    path = os.path.realpath(os.path.join(root, image_url.split("?")[0].lstrip("/")))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _describe(path: str):
+    """(digest, width, height) of a source image, re-read only when the file changes."""
+    stat = os.stat(path)
+    known = _DESCRIBED.get(path)
+    if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+        return known[2:]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:20]
+    with Image.open(path) as img:
+        width, height = img.size
+    with _LOCK:
+        _DESCRIBED[path] = (stat.st_mtime_ns, stat.st_size, digest, width, height)
+        _SOURCES[digest] = path
+    return digest, width, height
+
+
+def _widths(original: int) -> list:
+    widths = [w for w in sorted(CRM_CONFIG.IMAGE_WIDTHS) if w <= original]
+    return widths or [original]
+
+
+def _url(digest: str, width: int, fmt: str) -> str:
+    return f"{URL_PREFIX}/{digest}/{width}.{fmt}"
+
+
+def variants(image_url: str):
+    """Variant URLs for a menu image, or None when there are none to offer."""
+    if Image is None:
+        return None
+    path = source_path(image_url)
+    if path is None:
+        return None
+    try:
+        digest, width, height = _describe(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Images: Cannot read %s: %s", path, e)
+        return None
+    widths = _widths(width)
+    default = max([w for w in widths if w <= CRM_CONFIG.IMAGE_DEFAULT_WIDTH] or widths[:1])
+    return {
+        "src": _url(digest, default, "jpg"),
+        "webp_srcset": ", ".join(f"{_url(digest, w, 'webp')} {w}w" for w in widths),
+        "jpeg_srcset": ", ".join(f"{_url(digest, w, 'jpg')} {w}w" for w in widths),
+        "width": width,
+        "height": height,
+    }
+
+
+def with_variants(item: dict) -> dict:
+    """The menu item, copied with "image_variants" when its image has any (the stored item is unchanged)."""
+    found = variants(item.get("image_url"))
+    return {**item, "image_variants": found} if found else item
+
+
+def _resized(img, width: int, fmt: str):
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    if fmt == "jpg":
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            flat = Image.new("RGB", rgba.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.getchannel("A"))
+            return flat
+        return img.convert("RGB")
+    return img if img.mode in ("RGB", "RGBA") else img.convert("RGBA")
+
+
+def render(digest: str, width: int, fmt: str) -> str:
+    """Path of the cached variant, rendering it first if needed.
+
+    KeyError for an unknown digest, ValueError for a width or format that isn't offered.
+    """
+    if Image is None:
+        raise KeyError(digest)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}")
+    name = f"{digest}-{width}.{fmt}"
+    path = os.path.join(_cache_dir(), name)
+    if os.path.exists(path):
+        return path
+    source = _SOURCES.get(digest)
+    if source is None or _describe(source)[0] != digest:
+        # Unknown to this process (another worker listed the menu) or the file has changed since
+        _scan()
+        source = _SOURCES.get(digest)
+        if source is None or _describe(source)[0] != digest:
+            raise KeyError(digest)
+    if width not in _widths(_describe(source)[1]):
+        raise ValueError(f"Width {width} is not offered for this image")
+    with _LOCK:
+        lock = _RENDERING.setdefault(name, threading.Lock())
+    with lock:
+        if not os.path.exists(path):
+            os.makedirs(_cache_dir(), exist_ok=True)
+            with Image.open(source) as img:
+                img.load()
+                out = _resized(img, width, fmt)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            quality = CRM_CONFIG.IMAGE_WEBP_QUALITY if fmt == "webp" else CRM_CONFIG.IMAGE_JPEG_QUALITY
+            out.save(tmp, FORMATS[fmt][0], quality=quality, **({"method": 4} if fmt == "webp" else {"optimize": True, "progressive": True}))
+            os.replace(tmp, path)
+    with _LOCK:
+        _RENDERING.pop(name, None)
+    return path
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+def _scan():
+    """Describes every image under the source directory."""
+    root = _source_dir()
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() in (".png", ".jpg", ".jpeg", ".webp", ".gif"):
+                try:
+                    _describe(os.path.join(directory, file_name))
+                except (OSError, ValueError) as e:
+                    logger.warning("Images: Cannot read %s: %s", file_name, e)
+
+
+if __name__ == "__main__":
+    import sys
+    from Mock_data.mock_data import MOCK_MENU_DB
+
+    if Image is None:
+        sys.exit("Pillow is not installed (pip install Pillow).")
+    used, rendered = set(), 0
+    for item in list(MOCK_MENU_DB.values()):
+        found = variants(item.get("image_url"))
+        if not found:
+            continue
+        digest = found["src"].split("/")[-2]
+        used.add(digest)
+        for fmt in FORMATS:
+            for width in _widths(found["width"]):
+                render(digest, width, fmt)
+                rendered += 1
+    print(f"{rendered} variants of {len(used)} menu images in {_cache_dir()}")
+    if "--prune" in sys.argv and os.path.isdir(_cache_dir()):
+        stale = [f for f in os.listdir(_cache_dir()) if f.split("-")[0] not in used]
+        for file_name in stale:
+            os.remove(os.path.join(_cache_dir(), file_name))
+        print(f"Removed {len(stale)} variants no menu item uses.")
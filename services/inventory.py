@@ -0,0 +1,302 @@
+# services/inventory.py
+"""
+Stock counts for menu items, with reservations held by unpaid orders.
+
+    from services.inventory import reserve, apply_order_change, available
+    error = reserve(order_id, [{"item_id": "P001", "quantity": 2}])   # all or nothing
+    apply_order_change(order, previous)   # after an update: commit on Paid,
+                                          # release on Cancelled, hold on a payment claim
+
+A menu item with a `stock` count is tracked; items without one are limited
+only by `is_available`. For a tracked item
+
+    available = stock - units reserved by open orders
+
+Orders record their reservation in `stock_state` ("reserved", "committed",
+"released") and `reserved_until`. A reservation that isn't paid for or claimed
+within STOCK_RESERVATION_TTL_MINUTES is released and its order Cancelled.
+Once the customer claims payment the reservation is held until the vendor
+confirms or cancels.
+
+Per-item counts are guarded by STOCK_LOCK_STRIPES striped locks. An order
+takes the stripes of its items in index order, so orders for different items
+don't wait on each other and multi-item orders can't deadlock. Expiry times
+sit in a heap, so sweeping only looks at reservations that are due.
+
+Reservations are rebuilt from the orders on first use. With several workers
+(STATE_BACKEND=sqlite) orders created or settled elsewhere arrive as
+ORDER_CREATED / ORDER_UPDATED, and sync_order() matches this worker's
+reservations to the order's `stock_state`.
+"""
+import datetime
+import heapq
+import threading
+import time
+from contextlib import ExitStack
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import MOCK_MENU_DB, MOCK_ORDER_DB, persist_changes
+from services.events import publish, subscribe, ORDER_CREATED, ORDER_UPDATED
+from services.shared_state import transaction
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+RESERVED, COMMITTED, RELEASED = "reserved", "committed", "released"
+
+
+def _stock(item_id: str):
+    """The item's stock count, or None if it isn't tracked (the dashboard may send strings)."""
+    stock = (MOCK_MENU_DB.get(item_id) or {}).get("stock")
+    if stock is None or stock == "":
+        return None
+    return int(stock)
+
+
+def _lines(items) -> dict:
+    """{item_id: quantity} for the tracked items of an order."""
+    lines = {}
+    for it in items:
+        item_id = it.get("item_id")
+        if item_id and _stock(item_id) is not None:
+            lines[item_id] = lines.get(item_id, 0) + int(it.get("quantity", 1))
+    return lines
+
+
+class Inventory:
+    def __init__(self, stripes: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._book = threading.Lock()    # _reservations and _expiry; taken after stripes
+        self._reserved = {}              # item_id -> units held by open reservations
+        self._reservations = {}          # order_id -> {item_id: quantity}
+        self._expiry = []                # heap of (expires_at, order_id)
+
+    def _locks_for(self, item_ids):
+        indexes = sorted({hash(item_id) % len(self._stripes) for item_id in item_ids})
+        stack = ExitStack()
+        for i in indexes:
+            stack.enter_context(self._stripes[i])
+        return stack
+
+    def available(self, item_id: str):
+        """Units that can still be ordered, or None if the item isn't tracked."""
+        stock = _stock(item_id)
+        if stock is None:
+            return None
+        return max(0, stock - self._reserved.get(item_id, 0))
+
+    def restore(self, order: dict):
+        """Re-registers a reservation recorded on an order (startup)."""
+        lines = _lines(order.get("items", []))
+        for item_id, quantity in lines.items():
+            self._reserved[item_id] = self._reserved.get(item_id, 0) + quantity
+        self._reservations[order["id"]] = lines
+        if order.get("reserved_until"):
+            expires_at = datetime.datetime.fromisoformat(order["reserved_until"]).timestamp()
+            heapq.heappush(self._expiry, (expires_at, order["id"]))
+
+    def reserve(self, order_id: str, items: list):
+        """Holds stock for every tracked line, or none of them. Returns an error message or None."""
+        lines = _lines(items)
+        if not lines:
+            return None
+        with self._locks_for(lines):
+            for item_id, quantity in lines.items():
+                left = self.available(item_id)
+                if quantity > left:
+                    name = MOCK_MENU_DB[item_id].get("name", item_id)
+                    return f"Only {left} x {name} left in stock." if left else f"Item {name} is currently Out of Stock."
+            for item_id, quantity in lines.items():
+                self._reserved[item_id] = self._reserved.get(item_id, 0) + quantity
+            with self._book:
+                self._reservations[order_id] = lines
+                heapq.heappush(self._expiry, (time.time() + self.ttl_seconds, order_id))
+        return None
+
+    def _close(self, order_id: str, deduct: bool, items: list = None) -> bool:
+        with self._book:
+            lines = self._reservations.get(order_id)
+        if lines is None and not (deduct and items):
+            return False
+        with self._locks_for(lines or _lines(items)):
+            with self._book:
+                lines = self._reservations.pop(order_id, None)
+            held = lines is not None
+            if not held:
+                if not deduct:
+                    return False
+                # Paid after its reservation lapsed: the goods are owed anyway
+                lines = _lines(items)
+            for item_id, quantity in lines.items():
+                if held:
+                    self._reserved[item_id] = max(0, self._reserved.get(item_id, 0) - quantity)
+                stock = _stock(item_id)
+                if deduct and stock is not None:
+                    MOCK_MENU_DB[item_id]["stock"] = stock - quantity
+                    if stock < quantity:
+                        logger.warning("Inventory: %s oversold by %s", item_id, quantity - stock)
+        return True
+
+    def commit(self, order: dict) -> bool:
+        if order.get("stock_state") == COMMITTED:
+            return False
+        changed = self._close(order["id"], deduct=True, items=order.get("items", []))
+        if changed:
+            order["stock_state"], order["reserved_until"] = COMMITTED, None
+        return changed
+
+    def release(self, order: dict) -> bool:
+        changed = self._close(order["id"], deduct=False)
+        if changed:
+            order["stock_state"], order["reserved_until"] = RELEASED, None
+        return changed
+
+    def hold(self, order_id: str):
+        """Stops the expiry clock (payment claimed). The stale heap entry is skipped when it comes due."""
+        order = MOCK_ORDER_DB.get(order_id)
+        if order is not None and order.get("stock_state") == RESERVED:
+            order["reserved_until"] = None
+
+    def sync_order(self, order: dict):
+        """Takes up or drops the reservation of an order another worker reserved or settled."""
+        reserved = order.get("stock_state") == RESERVED
+        lines = _lines(order.get("items", []))
+        with self._locks_for(lines):
+            with self._book:
+                held = order["id"] in self._reservations
+                if reserved and not held:
+                    self.restore(order)
+                elif held and not reserved:
+                    # Settled elsewhere: a commit's deduction arrives with the menu record
+                    for item_id, quantity in self._reservations.pop(order["id"]).items():
+                        self._reserved[item_id] = max(0, self._reserved.get(item_id, 0) - quantity)
+
+    def due(self, now: float = None) -> list:
+        """Order IDs whose reservation has expired (removed from the heap)."""
+        now = time.time() if now is None else now
+        expired, orphaned = [], []
+        with self._book:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, order_id = heapq.heappop(self._expiry)
+                if order_id not in self._reservations:
+                    continue
+                order = MOCK_ORDER_DB.get(order_id)
+                if order is None:
+                    orphaned.append(order_id)
+                elif order.get("reserved_until"):
+                    expired.append(order_id)
+        # Held for an order that was never stored (it failed after reserving): just give the stock back
+        for order_id in orphaned:
+            if self._close(order_id, deduct=False):
+                logger.warning("Inventory: Released reservation %s with no order", order_id)
+        return expired
+
+
+_INVENTORY = None
+_INVENTORY_LOCK = threading.Lock()
+
+
+def get_inventory() -> Inventory:
+    global _INVENTORY
+    if _INVENTORY is None:
+        with _INVENTORY_LOCK:
+            if _INVENTORY is None:
+                inventory = Inventory(CRM_CONFIG.STOCK_LOCK_STRIPES, CRM_CONFIG.STOCK_RESERVATION_TTL_MINUTES * 60)
+                for order in list(MOCK_ORDER_DB.values()):
+                    if order.get("stock_state") == RESERVED:
+                        inventory.restore(order)
+                _INVENTORY = inventory
+    return _INVENTORY
+
+
+def available(item_id: str):
+    return get_inventory().available(item_id)
+
+
+def reserve(order_id: str, items: list):
+    return get_inventory().reserve(order_id, items)
+
+
+def start_reservation(order: dict):
+    """Stamps a new order with its reservation (call after a successful reserve)."""
+    if _lines(order.get("items", [])):
+        order["stock_state"] = RESERVED
+        order["reserved_until"] = (datetime.datetime.now() + datetime.timedelta(minutes=CRM_CONFIG.STOCK_RESERVATION_TTL_MINUTES)).isoformat()
+
+
+def commit(order: dict) -> bool:
+    return get_inventory().commit(order)
+
+
+def release(order: dict) -> bool:
+    return get_inventory().release(order)
+
+
+def apply_order_change(order: dict, previous: dict) -> bool:
+    """Commits, releases or holds stock after an order update. True if the order record changed."""
+    inventory = get_inventory()
+    was = {k: previous.get(k, order.get(k)) for k in ("status", "payment_status")}
+    if order.get("payment_status") == "Paid":
+        return was["payment_status"] != "Paid" and inventory.commit(order)
+    if order.get("status") == "Cancelled":
+        return was["status"] != "Cancelled" and inventory.release(order)
+    if order.get("payment_status") == "Customer Claimed Paid" and order.get("reserved_until"):
+        inventory.hold(order["id"])
+        return True
+    return False
+
+
+def expire_reservations(now: float = None) -> list:
+    """Cancels orders whose reservation lapsed unpaid. Returns their IDs."""
+    inventory = get_inventory()
+    cancelled = []
+    due = inventory.due(now)
+    if not due:
+        return cancelled
+    # Another worker may have been paid for (or expired) the same order meanwhile
+    with transaction():
+        for order_id in due:
+            order = MOCK_ORDER_DB.get(order_id)
+            if order is None or order.get("payment_status") not in ("Unpaid", None) or not inventory.release(order):
+                continue
+            previous = {"status": order.get("status"), "status_changed_at": order.get("status_changed_at")}
+            order["status"] = "Cancelled"
+            order["status_changed_at"] = datetime.datetime.now().isoformat()
+            publish(ORDER_UPDATED, order=order, changes={"status": "Cancelled", "status_changed_at": order["status_changed_at"]}, previous=previous)
+            cancelled.append(order_id)
+        if cancelled:
+            persist_changes()
+    if cancelled:
+        logger.info("Inventory: Cancelled %s orders with expired reservations: %s", len(cancelled), ", ".join(cancelled))
+    return cancelled
+
+
+@subscribe(ORDER_CREATED)
+@subscribe(ORDER_UPDATED)
+def _on_order_changed(order: dict, **_):
+    # Nothing to follow until the reservations have been built
+    if _INVENTORY is not None:
+        _INVENTORY.sync_order(order)
+
+
+def _sweeper(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            expire_reservations()
+        except Exception as e:
+            logger.exception("Inventory: reservation sweep failed: %s", e)
+
+
+_SWEEPER_STARTED = False
+
+
+def start_sweeper():
+    """Background thread releasing expired reservations every STOCK_SWEEP_SECONDS."""
+    global _SWEEPER_STARTED
+    with _INVENTORY_LOCK:
+        if _SWEEPER_STARTED:
+            return
+        _SWEEPER_STARTED = True
+    threading.Thread(target=_sweeper, args=(CRM_CONFIG.STOCK_SWEEP_SECONDS,), name="stock-sweeper", daemon=True).start()
@@ -0,0 +1,138 @@
+# services/logger.py
+"""
+Non-blocking structured logging.
+
+    from services.logger import get_logger
+    logger = get_logger(__name__)
+    logger.info("Executed %s", tool_name)
+    logger.debug("Tool outputs: %s", outputs, extra={"sample": True})
+
+Records are put on an in-memory queue by the calling thread; a single
+background QueueListener does the formatting and I/O (stdout, plus a rotating
+error log). Request threads never wait on stdout or file writes.
+
+Each record carries the current request id (set by the HTTP middleware).
+Records logged with extra={"sample": True} are kept with probability
+LOG_DEBUG_SAMPLE_RATE, for the verbose dumps of whole tool outputs.
+"""
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+
+from config import CRM_CONFIG
+
+request_id_var = contextvars.ContextVar("crm_request_id", default=None)
+
+_configured = False
+_config_lock = threading.Lock()
+_listener = None
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "sample"}
+
+
+class _ContextFilter(logging.Filter):
+    """Runs on the calling thread, so it can read the request's context variables."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        if getattr(record, "sample", False) and random.random() >= CRM_CONFIG.LOG_DEBUG_SAMPLE_RATE:
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _PlainFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        rid = getattr(record, "request_id", None)
+        return f"[{rid}] {text}" if rid else text
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener with the message and traceback already rendered."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """Installs the queue handler on the 'crm' logger. Safe to call more than once."""
+    global _configured, _listener
+    if _configured:
+        return
+    with _config_lock:
+        if _configured:
+            return
+
+        if CRM_CONFIG.LOG_FORMAT == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = _PlainFormatter("%(levelname)s %(name)s: %(message)s")
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(formatter)
+        handlers = [console]
+
+        if CRM_CONFIG.LOG_ERROR_FILE:
+            try:
+                error_file = logging.handlers.RotatingFileHandler(
+                    CRM_CONFIG.LOG_ERROR_FILE, maxBytes=CRM_CONFIG.LOG_ERROR_MAX_BYTES,
+                    backupCount=CRM_CONFIG.LOG_ERROR_BACKUPS, encoding="utf-8", delay=True
+                )
+                error_file.setLevel(logging.ERROR)
+                error_file.setFormatter(JsonFormatter())
+                handlers.append(error_file)
+            except OSError as e:
+                # e.g. read-only filesystem on serverless; stdout still works
+                console.stream.write(f"Error log disabled ({CRM_CONFIG.LOG_ERROR_FILE}): {e}\n")
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(_ContextFilter())
+
+        root = logging.getLogger("crm")
+        root.setLevel(CRM_CONFIG.LOG_LEVEL)
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"crm.{name}")
@@ -0,0 +1,362 @@
+# services/loyalty_ledger.py
+"""
+Append-only loyalty points ledger with cached balances.
+
+    from services.loyalty_ledger import balance, award_order_points, merge_customers
+    award_order_points(order)          # earn: 1 point per ₦100, once per order
+    balance("0987654321")              # O(1)
+
+Every change to a customer's points is one event in LOYALTY_LEDGER_DIR/ledger.jsonl:
+
+    earn     points for a paid order (order_id)
+    redeem   points spent (negative)
+    merge    a duplicate customer's balance moved onto another (from_id)
+    adjust   manual correction, or a balance set from outside (e.g. /api/data/add)
+    opening  balance carried over from data.json when the ledger started
+
+Balances are kept in memory and updated as events are appended. Every
+LOYALTY_CHECKPOINT_EVERY events the balances are written to checkpoint.json
+together with the ledger offset they cover, so startup replays only the tail.
+replay() recomputes everything from the first event, for audits.
+
+Several processes (API workers with STATE_BACKEND=sqlite) can share one
+ledger: writers hold an exclusive lock on the file and first apply whatever
+the others appended, and reads pick up new events when the file has grown.
+The lock is flock(), so on Windows run one process per ledger.
+
+The ledger is the source of truth. Customer records keep a copy in
+`loyalty_points` (the dashboard and data.json read it); appending an event
+updates that copy, and the caller persists as usual.
+
+Audit from the command line:  python -m services.loyalty_ledger
+"""
+import datetime
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per ledger
+    fcntl = None
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import DATA_FILE, MOCK_CUSTOMER_DB, persist_changes
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+EVENT_TYPES = {"earn", "redeem", "merge", "adjust", "opening"}
+POINTS_PER_NAIRA = 1 / 100
+
+
+def _ledger_dir() -> str:
+    # Next to the data file by default, so scratch datasets get scratch ledgers
+    return CRM_CONFIG.LOYALTY_LEDGER_DIR or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "loyalty_ledger")
+
+
+def order_points(order: dict) -> int:
+    return int(float(order.get("total", 0) or 0) * POINTS_PER_NAIRA)
+
+
+class InsufficientPoints(ValueError):
+    pass
+
+
+class LoyaltyLedger:
+    def __init__(self, directory: str, checkpoint_every: int):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self._lock = threading.RLock()
+        self._file = None
+        self._offset = 0                 # bytes of ledger covered by the balances
+        self._seq = 0
+        self._since_checkpoint = 0
+        self._balances = {}              # customer_id -> points
+        self._earned_orders = set()      # orders that already have an earn event
+        self._known = set()              # customers with at least one event
+        self._writing_depth = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, "ledger.jsonl")
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.directory, "checkpoint.json")
+
+    # --- Loading ---
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        with self._writing(catch_up=False):
+            if os.path.exists(self.checkpoint_path):
+                with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                    checkpoint = json.load(f)
+                self._seq = checkpoint["seq"]
+                self._offset = checkpoint["offset"]
+                self._balances = checkpoint["balances"]
+                self._earned_orders = set(checkpoint["earned_orders"])
+                self._known = set(checkpoint["known"])
+            self._end_torn_line()
+            replayed = self._replay_from(self._offset)
+        self._since_checkpoint = replayed
+        if replayed:
+            logger.info("Loyalty Ledger: Replayed %s events after checkpoint", replayed)
+
+    def _end_torn_line(self):
+        """A crash can leave a last line without its newline; end it so the next event starts fresh."""
+        if self._file.tell():
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write(b"\n")
+                    self._file.flush()
+
+    def _replay_from(self, offset: int) -> int:
+        """Applies the events from `offset` on and moves self._offset past them."""
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing it
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning("Loyalty Ledger: Skipping unreadable line at offset %s", offset)
+                    offset += len(line)
+                    continue
+                self._apply(event)
+                offset += len(line)
+                count += 1
+        self._offset = offset
+        return count
+
+    def _refresh(self):
+        """Applies events other processes appended (a stat call when there are none)."""
+        if self._file is not None and os.path.getsize(self.path) > self._offset:
+            with self._lock:
+                self._replay_from(self._offset)
+
+    @contextmanager
+    def _writing(self, catch_up: bool = True):
+        """Exclusive across threads and processes, with every other process's events applied."""
+        with self._lock:
+            outer = self._writing_depth == 0
+            if outer and fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            self._writing_depth += 1
+            try:
+                if outer and catch_up:
+                    self._replay_from(self._offset)
+                yield
+            finally:
+                self._writing_depth -= 1
+                if outer and fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _apply(self, event: dict):
+        customer_id = event["customer_id"]
+        self._seq = max(self._seq, event.get("seq", 0))
+        self._balances[customer_id] = self._balances.get(customer_id, 0) + event["points"]
+        self._known.add(customer_id)
+        if event["type"] == "earn" and event.get("order_id"):
+            self._earned_orders.add(event["order_id"])
+        if event["type"] == "merge" and event.get("from_id"):
+            self._known.add(event["from_id"])
+            self._balances[event["from_id"]] = self._balances.get(event["from_id"], 0) - event["points"]
+
+    # --- Writing ---
+
+    def append(self, events: list):
+        """Appends events (dicts with type, customer_id, points, ...) and applies them."""
+        with self._writing():
+            now = datetime.datetime.now().isoformat()
+            lines = []
+            for event in events:
+                if event["type"] not in EVENT_TYPES:
+                    raise ValueError(f"Unknown ledger event type: {event['type']}")
+                self._seq += 1
+                event = {"seq": self._seq, "ts": now, **event}
+                lines.append((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self._apply(event)
+                self._mirror(event["customer_id"])
+                if event.get("from_id"):
+                    self._mirror(event["from_id"])
+            data = b"".join(lines)
+            self._file.write(data)
+            self._file.flush()
+            self._offset += len(data)
+            self._since_checkpoint += len(events)
+            if self._since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+
+    def _mirror(self, customer_id: str):
+        customer = MOCK_CUSTOMER_DB.get(customer_id)
+        if customer is not None:
+            customer["loyalty_points"] = self._balances.get(customer_id, 0)
+
+    def checkpoint(self):
+        with self._lock:
+            state = {"seq": self._seq, "offset": self._offset, "balances": self._balances,
+                     "earned_orders": sorted(self._earned_orders), "known": sorted(self._known)}
+            tmp = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.checkpoint_path)
+            self._since_checkpoint = 0
+
+    # --- Operations ---
+
+    def balance(self, customer_id: str) -> int:
+        self._refresh()
+        return self._balances.get(customer_id, 0)
+
+    def award_order(self, order: dict) -> int:
+        """Earn event for a paid order, once per order. Returns the points awarded (0 if already done)."""
+        order_id, customer_id = order.get("id"), order.get("customer_id")
+        with self._writing():
+            if not customer_id or order_id in self._earned_orders or order.get("points_awarded"):
+                return 0
+            points = order_points(order)
+            self.append([{"type": "earn", "customer_id": customer_id, "points": points, "order_id": order_id}])
+            order["points_awarded"] = True
+            return points
+
+    def redeem(self, customer_id: str, points: int, reason: str = ""):
+        with self._writing():
+            if points <= 0 or self.balance(customer_id) < points:
+                raise InsufficientPoints(f"{customer_id} has {self.balance(customer_id)} points, cannot redeem {points}")
+            self.append([{"type": "redeem", "customer_id": customer_id, "points": -points, "reason": reason}])
+
+    def set_balance(self, customer_id: str, points: int, reason: str = "adjust"):
+        """Adjust event bringing a balance to `points` (no event if it's already there)."""
+        with self._writing():
+            delta = int(points) - self.balance(customer_id)
+            if delta:
+                self.append([{"type": "adjust", "customer_id": customer_id, "points": delta, "reason": reason}])
+
+    def merge(self, target_id: str, source_ids: list):
+        """Moves each source customer's balance onto target_id."""
+        with self._writing():
+            events = [{"type": "merge", "customer_id": target_id, "from_id": source_id, "points": self.balance(source_id)}
+                      for source_id in source_ids if source_id != target_id]
+            if events:
+                self.append(events)
+
+    def adopt_untracked(self, customers: dict) -> int:
+        """Opening events for customers holding points the ledger has never seen."""
+        with self._writing():
+            events = [{"type": "opening", "customer_id": cid, "points": int(c.get("loyalty_points") or 0)}
+                      for cid, c in list(customers.items())
+                      if cid not in self._known and int(c.get("loyalty_points") or 0)]
+            if events:
+                self.append(events)
+                self.checkpoint()
+            return len(events)
+
+    # --- Audit ---
+
+    def history(self, customer_id: str, limit: int = 100) -> list:
+        """Events touching a customer, newest first (scans the ledger)."""
+        with self._lock:
+            self._file.flush()
+        matches = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if customer_id in (event.get("customer_id"), event.get("from_id")):
+                    matches.append(event)
+        return matches[::-1][:limit]
+
+    def replay(self) -> dict:
+        """Balances recomputed from the first event."""
+        with self._lock:
+            self._file.flush()
+            fresh = LoyaltyLedger(self.directory, self.checkpoint_every)
+            fresh._replay_from(0)
+        return fresh._balances
+
+    def audit(self, customers: dict) -> dict:
+        """Differences between cached balances, a full replay and the customer records."""
+        replayed = self.replay()
+        with self._lock:
+            cached = dict(self._balances)
+        ids = set(cached) | set(replayed)
+        return {
+            "events": self._seq,
+            "replay_mismatches": {cid: (cached.get(cid, 0), replayed.get(cid, 0))
+                                  for cid in ids if cached.get(cid, 0) != replayed.get(cid, 0)},
+            "record_mismatches": {cid: (int(c.get("loyalty_points") or 0), cached.get(cid, 0))
+                                  for cid, c in list(customers.items())
+                                  if int(c.get("loyalty_points") or 0) != cached.get(cid, 0)},
+        }
+
+
+_LEDGER = None
+_LEDGER_LOCK = threading.Lock()
+
+
+def get_loyalty_ledger() -> LoyaltyLedger:
+    global _LEDGER
+    if _LEDGER is None:
+        with _LEDGER_LOCK:
+            if _LEDGER is None:
+                ledger = LoyaltyLedger(_ledger_dir(), CRM_CONFIG.LOYALTY_CHECKPOINT_EVERY)
+                ledger.load()
+                _reconcile(ledger)
+                _LEDGER = ledger
+    return _LEDGER
+
+
+def _reconcile(ledger: LoyaltyLedger):
+    """Brings data.json in line with the ledger at startup."""
+    adopted = ledger.adopt_untracked(MOCK_CUSTOMER_DB)
+    if adopted:
+        logger.info("Loyalty Ledger: Opened balances for %s customers from data.json", adopted)
+    stale = [cid for cid, c in list(MOCK_CUSTOMER_DB.items())
+             if int(c.get("loyalty_points") or 0) != ledger.balance(cid)]
+    for cid in stale:
+        MOCK_CUSTOMER_DB[cid]["loyalty_points"] = ledger.balance(cid)
+    if stale:
+        logger.warning("Loyalty Ledger: Corrected loyalty_points on %s customer records from the ledger", len(stale))
+        persist_changes()
+
+
+def balance(customer_id: str) -> int:
+    return get_loyalty_ledger().balance(customer_id)
+
+
+def award_order_points(order: dict) -> int:
+    return get_loyalty_ledger().award_order(order)
+
+
+def merge_customers(target_id: str, source_ids: list):
+    get_loyalty_ledger().merge(target_id, source_ids)
+
+
+def set_balance(customer_id: str, points: int, reason: str = "adjust"):
+    get_loyalty_ledger().set_balance(customer_id, points, reason)
+
+
+def redeem_points(customer_id: str, points: int, reason: str = ""):
+    get_loyalty_ledger().redeem(customer_id, points, reason)
+
+
+if __name__ == "__main__":
+    import time
+    started = time.perf_counter()
+    report = get_loyalty_ledger().audit(MOCK_CUSTOMER_DB)
+    print(f"Replayed {report['events']} events in {time.perf_counter() - started:.2f}s")
+    print(f"Replay mismatches: {len(report['replay_mismatches'])}, record mismatches: {len(report['record_mismatches'])}")
+    for cid, (cached, replayed) in list(report["replay_mismatches"].items())[:20]:
+        print(f"  {cid}: cached {cached}, replayed {replayed}")
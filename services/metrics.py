@@ -0,0 +1,279 @@
+# services/metrics.py
+"""
+Timing spans and Prometheus-style metrics for the chat pipeline.
+
+    with span("intent_classifier", kind="node"):
+        ...
+
+Every span lands in the `crm_stage_duration_seconds` histogram (labelled by
+stage and kind) and in a small reservoir used for p50/p95/p99. Spans nest
+through a context variable, so graph nodes, tool calls and provider calls of
+one chat turn share a trace id. Set TRACE_EXPORT_PATH to also write finished
+spans as OpenTelemetry-style JSON lines (written by a background thread).
+
+render_prometheus() produces the text served at /api/metrics.
+"""
+import contextvars
+import functools
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import CRM_CONFIG
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds. Covers in-memory tools (ms) up to slow provider calls (tens of seconds).
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 2048
+
+TRACE_EXPORT_PATH = CRM_CONFIG.TRACE_EXPORT_PATH
+
+_current_span = contextvars.ContextVar("crm_current_span", default=None)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def quantiles(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # name -> {label_key: Histogram}
+        self._counters = {}     # name -> {label_key: float}
+        self._help = {}
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, help_text: str = "", **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def summary(self) -> dict:
+        """{metric: [{labels, count, mean, p50, p95, p99}]} for JSON consumers."""
+        with self._lock:
+            out = {}
+            for name, series in self._histograms.items():
+                rows = []
+                for key, hist in series.items():
+                    q = hist.quantiles()
+                    rows.append({
+                        "labels": dict(key),
+                        "count": hist.count,
+                        "mean": hist.sum / hist.count if hist.count else 0.0,
+                        "p50": q[0.5], "p95": q[0.95], "p99": q[0.99],
+                    })
+                out[name] = rows
+            for name, series in self._counters.items():
+                out[name] = [{"labels": dict(key), "value": value} for key, value in series.items()]
+            return out
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+                # Recent-window quantiles as a companion summary
+                qname = name.replace("_duration_seconds", "_latency_quantile_seconds")
+                lines.append(f"# TYPE {qname} summary")
+                for key, hist in series.items():
+                    for q, value in hist.quantiles().items():
+                        lines.append(f"{qname}{_format_labels(key, (('quantile', str(q)),))} {value}")
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# --- Span export (OpenTelemetry-style JSON lines) ---
+
+_export_queue = queue.SimpleQueue()
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _export_worker(path: str):
+    while True:
+        batch = [_export_queue.get()]
+        while len(batch) < 256:
+            try:
+                batch.append(_export_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(s) + "\n" for s in batch))
+        except OSError as e:
+            logger.error("Metrics: span export to %s failed: %s", path, e)
+
+
+def _export(span_record: dict):
+    global _exporter_started
+    if not TRACE_EXPORT_PATH:
+        return
+    if not _exporter_started:
+        with _exporter_lock:
+            if not _exporter_started:
+                threading.Thread(target=_export_worker, args=(TRACE_EXPORT_PATH,), name="span-exporter", daemon=True).start()
+                _exporter_started = True
+    _export_queue.put(span_record)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    def __init__(self, name: str, kind: str, parent, attributes: dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = "OK"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Times a block as a stage of the current trace."""
+    current = Span(name, kind, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.status = "ERROR"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(token)
+        REGISTRY.observe("crm_stage_duration_seconds", elapsed, "Time spent per pipeline stage.", stage=name, kind=kind)
+        if current.status == "ERROR":
+            REGISTRY.inc("crm_stage_errors_total", 1, "Stages that raised.", stage=name, kind=kind)
+        _export({
+            "traceId": current.trace_id,
+            "spanId": current.span_id,
+            "parentSpanId": current.parent_id or "",
+            "name": name,
+            "kind": kind,
+            "startTimeUnixNano": start_ns,
+            "endTimeUnixNano": start_ns + int(elapsed * 1e9),
+            "attributes": current.attributes,
+            "status": {"code": current.status},
+        })
+
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+
+def traced_node(name: str, fn):
+    """Wraps a LangGraph node function in a span."""
+    @functools.wraps(fn)
+    def wrapper(state):
+        with span(name, kind="node"):
+            return fn(state)
+    return wrapper
+
+
+def run_in_context(fn, *args):
+    """Submit-able callable that keeps the caller's trace in a pool thread."""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn, *args)
+
+
+# --- Counters used across the pipeline ---
+
+def record_tokens(provider: str, input_tokens: int, output_tokens: int):
+    REGISTRY.inc("crm_llm_tokens_total", input_tokens, "LLM tokens by provider and direction.", provider=provider, direction="in")
+    REGISTRY.inc("crm_llm_tokens_total", output_tokens, "LLM tokens by provider and direction.", provider=provider, direction="out")
+
+
+def record_cache(cache: str, hit: bool):
+    REGISTRY.inc("crm_cache_requests_total", 1, "Cache lookups by result.", cache=cache, result="hit" if hit else "miss")
+
+
+def record_guardrail(decision: str):
+    REGISTRY.inc("crm_guardrail_decisions_total", 1, "Deterministic guardrail decisions in the intent classifier.", decision=decision)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
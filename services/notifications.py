@@ -0,0 +1,153 @@
+# services/notifications.py
+"""
+Customer email: one-off notifications and throttled campaign messages.
+
+    send_email_notification(to, subject, body)         # now, on the caller's thread (order updates)
+    enqueue(to, subject, body, campaign="lapsed_30")   # queued for the sender thread
+    enqueue(..., on_done=lambda sent: ...)             # told whether it went out
+
+Queued messages go out through a token bucket: at most NOTIFY_RATE_PER_SECOND
+on average, in bursts of up to NOTIFY_BURST, so a campaign to a large segment
+stays inside the SMTP provider's limits. The queue holds NOTIFY_QUEUE_MAX
+messages in memory; enqueue() returns False when it is full, and messages
+still queued when the process exits are not sent (their on_done never runs).
+
+Without SMTP_EMAIL / SMTP_PASSWORD messages are logged instead of sent.
+"""
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from config import CRM_CONFIG
+from services.metrics import REGISTRY
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def send_email_notification(to_email: str, subject: str, body: str) -> bool:
+    """Sends an email notification via SMTP."""
+    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+    smtp_port = int(os.getenv("SMTP_PORT", "587"))
+    smtp_user = os.getenv("SMTP_EMAIL")
+    smtp_password = os.getenv("SMTP_PASSWORD")
+
+    if not smtp_user or not smtp_password:
+        logger.info("[MOCK EMAIL] To: %s | Subject: %s | Body: %s", to_email, subject, body)
+        return True
+
+    try:
+        msg = MIMEMultipart()
+        msg['From'] = smtp_user
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        with smtplib.SMTP(smtp_server, smtp_port) as server:
+            server.starttls()
+            server.login(smtp_user, smtp_password)
+            server.send_message(msg)
+        logger.info("[EMAIL SENT] To: %s", to_email)
+        return True
+    except Exception as e:
+        logger.error("[EMAIL ERROR] Failed to send to %s: %s", to_email, e)
+        return False
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. take() spends one or says how long to wait."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """0 if a token was spent, else seconds until one is available."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+# --- Campaign queue ---
+
+_QUEUE = queue.Queue(maxsize=CRM_CONFIG.NOTIFY_QUEUE_MAX)
+_BUCKET = TokenBucket(CRM_CONFIG.NOTIFY_RATE_PER_SECOND, CRM_CONFIG.NOTIFY_BURST)
+_SENDER_LOCK = threading.Lock()
+_SENDER_STARTED = False
+
+
+def _count(campaign: str, result: str):
+    REGISTRY.inc("crm_campaign_messages_total", 1, "Campaign messages by campaign and result.", campaign=campaign, result=result)
+
+
+def _sender():
+    while True:
+        to_email, subject, body, campaign, on_done = _QUEUE.get()
+        sent = False
+        try:
+            _BUCKET.acquire()
+            sent = send_email_notification(to_email, subject, body)
+            _count(campaign, "sent" if sent else "failed")
+        except Exception as e:
+            logger.exception("Notifications: campaign message to %s failed: %s", to_email, e)
+        try:
+            if on_done is not None:
+                on_done(sent)
+        except Exception as e:
+            logger.exception("Notifications: on_done for %s failed: %s", to_email, e)
+        finally:
+            _QUEUE.task_done()
+
+
+def _start_sender():
+    global _SENDER_STARTED
+    with _SENDER_LOCK:
+        if _SENDER_STARTED:
+            return
+        _SENDER_STARTED = True
+    threading.Thread(target=_sender, name="notification-sender", daemon=True).start()
+
+
+def enqueue(to_email: str, subject: str, body: str, campaign: str = "", on_done=None) -> bool:
+    """Queues a message for the throttled sender. False if the queue is full.
+
+    on_done(sent: bool) is called on the sender thread once the message has been tried.
+    """
+    _start_sender()
+    try:
+        _QUEUE.put_nowait((to_email, subject, body, campaign, on_done))
+    except queue.Full:
+        _count(campaign, "dropped")
+        return False
+    _count(campaign, "queued")
+    return True
+
+
+def pending() -> int:
+    """Messages queued and not yet sent."""
+    return _QUEUE.qsize()
+
+
+def drain():
+    """Blocks until every queued message has been tried (and its on_done has run)."""
+    _QUEUE.join()
@@ -0,0 +1,129 @@
+# services/order_board.py
+"""
+Orders grouped by status for the dashboard Kanban board.
+
+A status index keeps, per status, the orders as a sorted list of
+(sort key, order_id), maintained from order events. board() slices the
+newest ORDER_BOARD_COLUMN_LIMIT entries off the end of each list, so a
+refresh costs the same however many orders have ever been completed.
+
+Columns are 'Pending Payment', Config.ORDER_STATUSES and 'Cancelled'. Open
+columns are sorted by when the order was placed (`timestamp`). Closed columns
+(Completed, Cancelled) are sorted by when the order got there
+(`status_changed_at`, falling back to `timestamp` for older orders) and only
+show the last ORDER_BOARD_CLOSED_HOURS.
+
+Rebuild from scratch:  python -m services.order_board
+"""
+import bisect
+import datetime
+import threading
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import MOCK_ORDER_DB
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED
+
+COLUMNS = ["Pending Payment", *CRM_CONFIG.ORDER_STATUSES, "Cancelled"]
+CLOSED = {"Completed", "Cancelled"}
+
+_LOCK = threading.RLock()
+_BUILT = False
+_INDEX = {}       # status -> sorted [(sort key, order_id)]
+_PLACED = {}      # order_id -> (status, sort key) as indexed
+
+
+def _entry(order: dict) -> tuple:
+    status = order.get("status") or "Pending Payment"
+    key = order.get("timestamp") or ""
+    if status in CLOSED:
+        key = order.get("status_changed_at") or key
+    return status, key
+
+
+def _place(order: dict):
+    """Moves the order to its current column and position (no-op if unchanged)."""
+    status, key = _entry(order)
+    placed = _PLACED.get(order["id"])
+    if placed == (status, key):
+        return
+    if placed:
+        entries = _INDEX[placed[0]]
+        i = bisect.bisect_left(entries, (placed[1], order["id"]))
+        if i < len(entries) and entries[i] == (placed[1], order["id"]):
+            del entries[i]
+    bisect.insort(_INDEX.setdefault(status, []), (key, order["id"]))
+    _PLACED[order["id"]] = (status, key)
+
+
+def rebuild() -> int:
+    """Recomputes the status index from MOCK_ORDER_DB."""
+    global _BUILT
+    with _LOCK:
+        _INDEX.clear()
+        _PLACED.clear()
+        for order in list(MOCK_ORDER_DB.values()):
+            status, key = _entry(order)
+            _INDEX.setdefault(status, []).append((key, order["id"]))
+            _PLACED[order["id"]] = (status, key)
+        for entries in _INDEX.values():
+            entries.sort()
+        _BUILT = True
+    return len(_PLACED)
+
+
+def _ensure_built():
+    if not _BUILT:
+        with _LOCK:
+            if not _BUILT:
+                rebuild()
+
+
+# --- Incremental maintenance ---
+
+@subscribe(ORDER_CREATED)
+def _on_order_created(order: dict, **_):
+    with _LOCK:
+        if _BUILT:
+            _place(order)
+
+
+@subscribe(ORDER_UPDATED)
+def _on_order_updated(order: dict, changes: dict, previous: dict, **_):
+    if not {"status", "timestamp", "status_changed_at"} & set(previous):
+        return
+    with _LOCK:
+        if _BUILT:
+            _place(order)
+
+
+# --- Reading ---
+
+def board(limit: int = None, closed_hours: float = None, now: datetime.datetime = None) -> dict:
+    """{"columns": [{status, count, total, more, orders}]}, newest first in each column.
+
+    count is what the column covers (closed columns: the last closed_hours),
+    total every order with that status, more how many of `count` didn't fit.
+    """
+    _ensure_built()
+    limit = limit or CRM_CONFIG.ORDER_BOARD_COLUMN_LIMIT
+    closed_hours = closed_hours or CRM_CONFIG.ORDER_BOARD_CLOSED_HOURS
+    now = now or datetime.datetime.now()
+    cutoff = (now - datetime.timedelta(hours=closed_hours)).isoformat()
+    columns = []
+    with _LOCK:
+        for status in COLUMNS:
+            entries = _INDEX.get(status, [])
+            start = bisect.bisect_left(entries, (cutoff,)) if status in CLOSED else 0
+            count = len(entries) - start
+            shown = entries[max(start, len(entries) - limit):]
+            # Copies: the response is serialized after the lock is released
+            orders = [dict(MOCK_ORDER_DB[order_id]) for _, order_id in reversed(shown) if order_id in MOCK_ORDER_DB]
+            columns.append({"status": status, "count": count, "total": len(entries),
+                            "more": count - len(shown), "orders": orders})
+    return {"columns": columns, "closed_hours": closed_hours, "limit": limit}
+
+
+if __name__ == "__main__":
+    print(f"Order board index rebuilt from {rebuild()} orders.")
+    for column in board()["columns"]:
+        print(f"{column['status']}: {column['count']} ({column['total']} in total)")
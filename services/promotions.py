@@ -0,0 +1,223 @@
+# services/promotions.py
+"""
+Promotion eligibility engine.
+
+Promos in MOCK_PROMO_DB carry machine-readable `rules` and a `discount`:
+
+    "rules": {
+        "min_total": 5000,                 # cart subtotal (₦) at least this
+        "first_order": True,               # customer has no previous orders
+        "loyalty_tier": "Silver",          # customer tier at or above (CRM_CONFIG.LOYALTY_TIERS)
+        "starts_at": "2025-12-01", "ends_at": "2025-12-31T23:59:59",
+        "item_ids": ["P001", "P002"]       # cart contains any of these
+    },
+    "discount": {"type": "percent", "value": 10}    # or "amount" (₦), or "free_item" + "item"
+
+Active promos are compiled once and indexed by target tag. Evaluating a
+customer (and optionally a cart) only looks at promos for that customer's tags
+plus untargeted ones, in a single pass.
+"""
+import datetime
+import threading
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import MOCK_PROMO_DB
+from services.customer_stats import get_customer_stats
+from services.events import subscribe, PROMOS_UPDATED
+from services.logger import get_logger
+from services.loyalty_ledger import balance as loyalty_balance
+from services.metrics import record_cache
+
+logger = get_logger(__name__)
+
+_ENGINE = None
+_LOCK = threading.Lock()
+
+DISCOUNT_TYPES = ("percent", "amount", "free_item")
+
+
+def iter_promos():
+    """MOCK_PROMO_DB may be a list (defaults) or a dict keyed by id (data.json)."""
+    return list(MOCK_PROMO_DB.values()) if isinstance(MOCK_PROMO_DB, dict) else list(MOCK_PROMO_DB)
+
+
+def loyalty_tier(points: int) -> str:
+    for name, minimum in CRM_CONFIG.LOYALTY_TIERS:
+        if points >= minimum:
+            return name
+    return CRM_CONFIG.LOYALTY_TIERS[-1][0]
+
+
+def _tier_minimum(name: str) -> int:
+    return dict(CRM_CONFIG.LOYALTY_TIERS).get(name, 0)
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    # Rules are compared against naive local time
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def rules_error(promo: dict):
+    """Why a promo can't be compiled (e.g. a bad starts_at or discount), or None if it can."""
+    try:
+        _CompiledPromo(promo)
+    except (TypeError, ValueError, KeyError) as exc:
+        return str(exc)
+    return None
+
+
+def customer_context(customer: dict) -> dict:
+    """Everything the rules need to know about a customer, computed once per evaluation."""
+    customer = customer or {}
+    points = loyalty_balance(customer["id"]) if customer.get("id") else int(customer.get("loyalty_points") or 0)
+    stats = get_customer_stats(customer.get("id")) if customer.get("id") else None
+    first_order = not stats or stats["order_count"] == 0
+    tier = loyalty_tier(points)
+
+    tags = {p.lower() for p in customer.get("preferences") or []}
+    tags.add(f"{tier} tier".lower())
+    if first_order:
+        tags.add("new customer")
+    if points >= _tier_minimum(CRM_CONFIG.HIGH_LOYALTY_TIER):
+        tags.add("high loyalty")
+    return {"points": points, "first_order": first_order, "tier": tier, "tags": tags}
+
+
+class _CompiledPromo:
+    def __init__(self, promo: dict):
+        rules = promo.get("rules") or {}
+        discount = promo.get("discount") or {}
+        self.promo = promo
+        self.id = promo.get("id")
+        self.min_total = float(rules["min_total"]) if rules.get("min_total") is not None else None
+        self.first_order = bool(rules.get("first_order"))
+        self.min_points = _tier_minimum(rules["loyalty_tier"]) if rules.get("loyalty_tier") else None
+        self.tier_name = rules.get("loyalty_tier")
+        self.starts_at = _parse_time(rules.get("starts_at"))
+        self.ends_at = _parse_time(rules.get("ends_at"))
+        self.item_ids = set(rules.get("item_ids") or [])
+        self.discount_type = discount.get("type")
+        self.discount_value = float(discount.get("value") or 0)
+        self.free_item = discount.get("item")
+        # A bad discount would otherwise reach ProcessOrder as a negative or inflated total
+        if self.discount_type not in DISCOUNT_TYPES:
+            raise ValueError(f"discount type must be one of {', '.join(DISCOUNT_TYPES)}, not {self.discount_type!r}")
+        if self.discount_type == "percent" and not 0 <= self.discount_value <= 100:
+            raise ValueError(f"percent discount must be between 0 and 100, not {self.discount_value:g}")
+        if self.discount_type == "amount" and self.discount_value < 0:
+            raise ValueError(f"amount discount can't be negative ({self.discount_value:g})")
+        if self.discount_type == "free_item" and not self.free_item:
+            raise ValueError("free_item discount needs an item")
+
+    def evaluate(self, ctx: dict, cart: dict, now: datetime.datetime):
+        """Returns (eligible, discount_amount, unmet_conditions)."""
+        unmet = []
+        if self.starts_at and now < self.starts_at:
+            return False, 0.0, ["not started yet"]
+        if self.ends_at and now > self.ends_at:
+            return False, 0.0, ["expired"]
+        if self.first_order and not ctx["first_order"]:
+            return False, 0.0, ["first order only"]
+        if self.min_points is not None and ctx["points"] < self.min_points:
+            return False, 0.0, [f"{self.tier_name} tier or above"]
+
+        # Cart conditions: without a cart we report them instead of failing
+        base = 0.0
+        if cart is None:
+            if self.min_total is not None:
+                unmet.append(f"order total over ₦{self.min_total:,.0f}")
+            if self.item_ids:
+                unmet.append("includes a qualifying item")
+            return True, 0.0, unmet
+
+        subtotal = cart["subtotal"]
+        if self.min_total is not None and subtotal < self.min_total:
+            return False, 0.0, [f"order total over ₦{self.min_total:,.0f}"]
+        if self.item_ids:
+            base = sum(line["price"] * line["quantity"] for line in cart["items"] if line["item_id"] in self.item_ids)
+            if not base:
+                return False, 0.0, ["includes a qualifying item"]
+        else:
+            base = subtotal
+
+        if self.discount_type == "percent":
+            amount = base * self.discount_value / 100
+        elif self.discount_type == "amount":
+            amount = min(self.discount_value, base)
+        else:
+            amount = 0.0
+        return True, round(min(max(amount, 0.0), base), 2), unmet
+
+
+class PromotionEngine:
+    def __init__(self, promos: list):
+        self.by_tag = {}
+        self.untargeted = []
+        for promo in promos:
+            if not promo.get("active"):
+                continue
+            try:
+                compiled = _CompiledPromo(promo)
+            except (TypeError, ValueError, KeyError) as exc:
+                logger.warning("Promotions: skipping invalid promo %s: %s", promo.get("id"), exc)
+                continue
+            tags = promo.get("target_tags") or []
+            if not tags:
+                self.untargeted.append(compiled)
+            for tag in tags:
+                self.by_tag.setdefault(tag.lower(), []).append(compiled)
+
+    def candidates(self, tags: set) -> list:
+        seen = {}
+        for tag in tags:
+            for compiled in self.by_tag.get(tag, ()):
+                seen[compiled.id] = compiled
+        for compiled in self.untargeted:
+            seen[compiled.id] = compiled
+        return list(seen.values())
+
+    def evaluate(self, customer: dict, cart: dict = None, extra_tags: list = None) -> list:
+        """All eligible promos for a customer (and cart), best discount first."""
+        ctx = customer_context(customer)
+        tags = ctx["tags"] | {t.lower() for t in extra_tags or []}
+        now = datetime.datetime.now()
+        eligible = []
+        for compiled in self.candidates(tags):
+            ok, amount, unmet = compiled.evaluate(ctx, cart, now)
+            if ok:
+                eligible.append({"promo": compiled.promo, "discount": amount, "conditions": unmet, "free_item": compiled.free_item})
+        eligible.sort(key=lambda e: (e["discount"], e["free_item"] is not None), reverse=True)
+        return eligible
+
+
+def get_engine() -> PromotionEngine:
+    global _ENGINE
+    engine = _ENGINE
+    record_cache("promotions", engine is not None)
+    if engine is None:
+        with _LOCK:
+            if _ENGINE is None:
+                _ENGINE = PromotionEngine(iter_promos())
+            engine = _ENGINE
+    return engine
+
+
+def eligible_promotions(customer: dict, cart: dict = None, extra_tags: list = None) -> list:
+    return get_engine().evaluate(customer, cart, extra_tags)
+
+
+def best_promotion(customer: dict, cart: dict):
+    """The single promo to apply to a cart (promos don't stack), or None."""
+    eligible = eligible_promotions(customer, cart)
+    return eligible[0] if eligible else None
+
+
+@subscribe(PROMOS_UPDATED)
+def _on_promos_updated(**_):
+    global _ENGINE
+    _ENGINE = None
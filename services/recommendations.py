@@ -0,0 +1,231 @@
+# services/recommendations.py
+"""
+Precomputed recommendation model behind SuggestPersonalizedMeal.
+
+The model holds, per menu item position:
+- a preference tag -> items inverted index (ingredient/category words),
+- an item x item co-purchase matrix built from MOCK_ORDER_DB,
+- item popularity (units sold).
+
+It is built once (vectorized), kept current from ORDER_CREATED events and
+rebuilt lazily when the menu changes. Answering a request is a handful of
+numpy operations over the menu, independent of order history size. Items
+whose stock is tracked are checked against services.inventory on every
+request, so sold-out items (stock all sold or reserved) are never suggested.
+
+Batch rebuild:  python -m services.recommendations
+"""
+import re
+import threading
+
+import numpy as np
+
+from Mock_data.mock_data import MOCK_MENU_DB, MOCK_ORDER_DB
+from services.customer_stats import get_customer_stats
+from services.events import subscribe, ORDER_CREATED, MENU_UPDATED
+from services.inventory import available as stock_available
+from services.shared_state import orders_in_flight
+
+# Orders are folded into the co-purchase matrix in chunks to bound memory.
+ORDER_CHUNK_SIZE = 20000
+
+# Score weights
+PREFERENCE_WEIGHT = 1.0
+CO_PURCHASE_WEIGHT = 0.6
+REPEAT_WEIGHT = 0.3
+POPULARITY_WEIGHT = 0.1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_MODEL = None
+_STALE = True
+_LOCK = threading.RLock()
+
+
+def _tokens(text: str) -> list:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class _Model:
+    def __init__(self):
+        self.item_ids = list(MOCK_MENU_DB.keys())
+        self.item_pos = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        self.name_pos = {MOCK_MENU_DB[item_id].get("name"): i for i, item_id in enumerate(self.item_ids)}
+        n = len(self.item_ids)
+
+        self.available = np.fromiter((bool(MOCK_MENU_DB[i].get("is_available")) for i in self.item_ids), dtype=bool, count=n)
+        # Stock comes and goes with every order and reservation, so these are looked up per request
+        self.tracked = [(pos, item_id) for pos, item_id in enumerate(self.item_ids) if stock_available(item_id) is not None]
+
+        # Preference tag -> item positions
+        tag_lists = {}
+        for pos, item_id in enumerate(self.item_ids):
+            item = MOCK_MENU_DB[item_id]
+            tags = set()
+            for text in list(item.get("ingredients") or []) + [item.get("category") or ""]:
+                tags.add(text.lower().strip())
+                tags.update(_tokens(text))
+            tags.discard("")
+            for tag in tags:
+                tag_lists.setdefault(tag, []).append(pos)
+        self.tag_index = {tag: np.array(positions, dtype=np.int32) for tag, positions in tag_lists.items()}
+
+        self.popularity = np.zeros(n, dtype=np.float64)
+        self.co_purchase = np.zeros((n, n), dtype=np.float32)
+        orders = list(MOCK_ORDER_DB.values())
+        in_flight = orders_in_flight()
+        # Counted here before their ORDER_CREATED arrived: the event is skipped
+        self.counted = {order.get("id") for order in orders if order.get("id") in in_flight}
+        self._build_from_orders(orders)
+
+    def _build_from_orders(self, orders: list):
+        n = len(self.item_ids)
+        if not n:
+            return
+        for start in range(0, len(orders), ORDER_CHUNK_SIZE):
+            chunk = orders[start:start + ORDER_CHUNK_SIZE]
+            rows, cols, qty = [], [], []
+            for row, order in enumerate(chunk):
+                for it in order.get("items", []):
+                    pos = self.item_pos.get(it.get("item_id"))
+                    if pos is not None:
+                        rows.append(row)
+                        cols.append(pos)
+                        qty.append(int(it.get("quantity", 1)))
+            if not rows:
+                continue
+            cols = np.asarray(cols, dtype=np.int32)
+            self.popularity += np.bincount(cols, weights=np.asarray(qty, dtype=np.float64), minlength=n)
+            baskets = np.zeros((len(chunk), n), dtype=np.float32)
+            baskets[np.asarray(rows, dtype=np.int32), cols] = 1.0
+            self.co_purchase += baskets.T @ baskets
+        np.fill_diagonal(self.co_purchase, 0.0)
+
+    def add_order(self, order: dict):
+        positions, qty = [], []
+        for it in order.get("items", []):
+            pos = self.item_pos.get(it.get("item_id"))
+            if pos is not None:
+                positions.append(pos)
+                qty.append(int(it.get("quantity", 1)))
+        if not positions:
+            return
+        np.add.at(self.popularity, positions, qty)
+        basket = np.unique(positions)
+        self.co_purchase[np.ix_(basket, basket)] += 1.0
+        self.co_purchase[basket, basket] = 0.0
+
+    def recommend(self, customer_id: str, preferences: list, k: int) -> list:
+        n = len(self.item_ids)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float64)
+        allowed = self.available.copy()
+        for pos, item_id in self.tracked:
+            if stock_available(item_id) == 0:
+                allowed[pos] = False
+        pref_hits = {}
+
+        for pref in preferences or []:
+            words = _tokens(pref)
+            if not words:
+                continue
+            if words[0] == "no" and len(words) > 1:
+                # "No Nuts" excludes anything tagged with nuts
+                for word in words[1:]:
+                    hit = self.tag_index.get(word)
+                    if hit is not None:
+                        allowed[hit] = False
+                continue
+            hit = self.tag_index.get(pref.lower().strip())
+            if hit is None:
+                hits = [self.tag_index[w] for w in words if w in self.tag_index]
+                hit = np.unique(np.concatenate(hits)) if hits else None
+            if hit is not None:
+                scores[hit] += PREFERENCE_WEIGHT
+                for pos in hit.tolist():
+                    pref_hits.setdefault(pos, pref)
+
+        history = np.zeros(n, dtype=np.float64)
+        stats = get_customer_stats(customer_id) if customer_id else None
+        if stats:
+            for name, count in stats["item_counts"].items():
+                pos = self.name_pos.get(name)
+                if pos is not None:
+                    history[pos] = count
+        if history.any():
+            weights = history / history.sum()
+            co = weights @ self.co_purchase
+            if co.max() > 0:
+                scores += CO_PURCHASE_WEIGHT * co / co.max()
+            scores += REPEAT_WEIGHT * (history > 0)
+
+        if self.popularity.max() > 0:
+            scores += POPULARITY_WEIGHT * self.popularity / self.popularity.max()
+
+        candidates = np.flatnonzero(allowed)
+        if not candidates.size:
+            return []
+        k = min(k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for pos in top.tolist():
+            item = MOCK_MENU_DB[self.item_ids[pos]]
+            reasons = []
+            if pos in pref_hits:
+                reasons.append(f"matches your love for {pref_hits[pos]}")
+            if history.any() and self.co_purchase[history > 0, pos].sum() > 0:
+                partner = self.item_ids[int(np.argmax(self.co_purchase[:, pos] * (history > 0)))]
+                reasons.append(f"often ordered with {MOCK_MENU_DB[partner]['name']}")
+            if history[pos] > 0:
+                reasons.append("you've ordered it before")
+            if not reasons:
+                reasons.append("one of our best-sellers")
+            results.append({
+                "item_id": self.item_ids[pos],
+                "name": item["name"],
+                "price": item["price"],
+                "score": round(float(scores[pos]), 3),
+                "reasons": reasons,
+            })
+        return results
+
+
+def rebuild():
+    """Rebuilds the whole model from the menu and order history."""
+    global _MODEL, _STALE
+    with _LOCK:
+        _MODEL = _Model()
+        _STALE = False
+    return _MODEL
+
+
+def recommend(customer_id: str, preferences: list = None, k: int = 3) -> list:
+    """Top-k available items for a customer, each with a score and reasons."""
+    model = _MODEL
+    if model is None or _STALE:
+        model = rebuild()
+    return model.recommend(customer_id, preferences, k)
+
+
+@subscribe(ORDER_CREATED)
+def _on_order_created(order: dict, **_):
+    with _LOCK:
+        if _MODEL is not None and not _STALE:
+            if order.get("id") in _MODEL.counted:
+                _MODEL.counted.discard(order.get("id"))
+            else:
+                _MODEL.add_order(order)
+
+
+@subscribe(MENU_UPDATED)
+def _on_menu_updated(**_):
+    global _STALE
+    _STALE = True
+
+
+if __name__ == "__main__":
+    model = rebuild()
+    print(f"Recommendation model rebuilt: {len(model.item_ids)} items, {int(model.popularity.sum())} units from {len(MOCK_ORDER_DB)} orders.")
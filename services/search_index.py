@@ -0,0 +1,312 @@
+# services/search_index.py
+"""
+Full-text search over customers, orders and feedback for the dashboard.
+
+    from services.search_index import search
+    search("bola", kinds=["customer"], limit=20, offset=0)
+
+Indexed fields, by weight:
+
+    id     customer id (phone), order id, feedback log_id                 x3
+    name   customer name and email; the customer of an order / feedback  x2
+    text   order item names, feedback message                            x1
+
+Text is lowercased and split into word tokens of two or more characters. A
+query term matches the token equal to it and tokens starting with it (the
+first PREFIX_EXPANSIONS in alphabetical order). Every term has to match; a
+document scores the sum over terms of its best match, field weight x idf
+(x PREFIX_FACTOR for a longer token). Ties go to the most recently indexed.
+
+Postings are one int array per token (document number * 4 + field). A query
+accumulates scores in numpy arrays over all document numbers, so its cost is
+a few vector operations per matched token, not Python work per document.
+
+Kept current from ORDER_CREATED / ORDER_UPDATED, CUSTOMER_UPDATED,
+CUSTOMERS_MERGED and STATE_RELOADED (deletions by other workers). The
+feedback log only grows, so new entries are indexed when a search runs. A
+changed document gets a new number and the old one is marked dead; once dead
+numbers pass a quarter of the index it is rebuilt.
+
+Built on the first search. Rebuild and time a query:
+    python -m services.search_index "red velvet"
+"""
+import bisect
+import functools
+import math
+import re
+import threading
+from array import array
+
+import numpy as np
+
+from Mock_data.mock_data import MOCK_CUSTOMER_DB, MOCK_ORDER_DB
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED, CUSTOMER_UPDATED, CUSTOMERS_MERGED, STATE_RELOADED
+from services.feedback_log import get_feedback_log
+
+KINDS = ("customer", "order", "feedback")
+F_ID, F_NAME, F_TEXT = 0, 1, 2
+FIELD_WEIGHTS = np.array([3.0, 2.0, 1.0, 0.0], dtype=np.float32)
+PREFIX_EXPANSIONS = 256
+PREFIX_FACTOR = 0.7
+RECENT_TOKENS_MAX = 1024
+
+_WORD = re.compile(r"\w+")
+
+_LOCK = threading.RLock()
+_BUILT = False
+_POSTINGS = {}        # token -> array of doc * 4 + field
+_VOCAB = []           # sorted tokens, for prefix lookups
+_RECENT = []          # tokens added since _VOCAB was last sorted
+_DOCS = []            # doc -> (kind, key)
+_DOC_OF = {}          # (kind, key) -> live doc
+_SIGNATURES = {}      # (kind, key) -> hash of the indexed tokens
+_ALIVE = bytearray()  # doc -> 1 while it is the live version
+_KIND = bytearray()   # doc -> index in KINDS
+_DEAD = 0
+_FEEDBACK_SEEN = 0    # feedback log positions indexed so far
+
+
+@functools.lru_cache(maxsize=65536)
+def _split(text: str) -> tuple:
+    # Cached: item names, statuses and first names repeat across many documents
+    return tuple(t for t in _WORD.findall(text.lower()) if len(t) >= 2)
+
+
+def _tokens(text) -> tuple:
+    return _split(str(text)) if text else ()
+
+
+def _fields(kind: str, record: dict) -> dict:
+    """token -> best (lowest) field it appears in."""
+    if kind == "customer":
+        fields = ((F_ID, [record.get("id")]), (F_NAME, [record.get("name"), record.get("email")]))
+    elif kind == "order":
+        fields = ((F_ID, [record.get("id")]), (F_NAME, [record.get("customer_id")]),
+                  (F_TEXT, [it.get("name") or it.get("item_id") for it in record.get("items", [])]))
+    else:
+        fields = ((F_ID, [record.get("log_id")]), (F_NAME, [record.get("user_id")]), (F_TEXT, [record.get("message")]))
+    best = {}
+    for field, values in fields:
+        for value in values:
+            for token in _tokens(value):
+                best.setdefault(token, field)
+    return best
+
+
+def _remove(ref: tuple):
+    global _DEAD
+    doc = _DOC_OF.pop(ref, None)
+    _SIGNATURES.pop(ref, None)
+    if doc is not None:
+        _ALIVE[doc] = 0
+        _DEAD += 1
+
+
+def _put(kind: str, key, record: dict):
+    """(Re)indexes a document; a no-op if its tokens haven't changed."""
+    global _VOCAB
+    ref = (kind, key)
+    tokens = _fields(kind, record)
+    signature = hash(frozenset(tokens.items()))
+    if _SIGNATURES.get(ref) == signature and ref in _DOC_OF:
+        return
+    _remove(ref)
+    doc = len(_DOCS)
+    _DOCS.append(ref)
+    _ALIVE.append(1)
+    _KIND.append(KINDS.index(kind))
+    _DOC_OF[ref] = doc
+    _SIGNATURES[ref] = signature
+    for token, field in tokens.items():
+        postings = _POSTINGS.get(token)
+        if postings is None:
+            postings = _POSTINGS[token] = array("q")
+            _RECENT.append(token)
+        postings.append(doc * 4 + field)
+    if _BUILT and len(_RECENT) > RECENT_TOKENS_MAX:
+        # Mostly sorted already, so this is close to a linear merge (rebuild() sorts once at the end)
+        _VOCAB.extend(_RECENT)
+        _VOCAB.sort()
+        _RECENT.clear()
+
+
+def _index_feedback():
+    global _FEEDBACK_SEEN
+    for position, entry in get_feedback_log().entries_since(_FEEDBACK_SEEN):
+        _put("feedback", position, entry)
+        _FEEDBACK_SEEN = position + 1
+
+
+def rebuild() -> int:
+    """Indexes every customer, order and feedback entry from scratch."""
+    global _BUILT, _DEAD, _FEEDBACK_SEEN, _VOCAB
+    with _LOCK:
+        _BUILT = False
+        for container in (_POSTINGS, _DOC_OF, _SIGNATURES):
+            container.clear()
+        _DOCS.clear()
+        _RECENT.clear()
+        _ALIVE[:] = b""
+        _KIND[:] = b""
+        _DEAD, _FEEDBACK_SEEN = 0, 0
+        for customer_id, customer in list(MOCK_CUSTOMER_DB.items()):
+            _put("customer", customer_id, customer)
+        for order_id, order in list(MOCK_ORDER_DB.items()):
+            _put("order", order_id, order)
+        _index_feedback()
+        _VOCAB = sorted(_POSTINGS)
+        _RECENT.clear()
+        _BUILT = True
+        return len(_DOC_OF)
+
+
+def _ensure_current():
+    with _LOCK:
+        if not _BUILT or (_DEAD > 1000 and _DEAD * 4 > len(_DOCS)):
+            rebuild()
+        else:
+            _index_feedback()
+
+
+# --- Incremental maintenance ---
+# Before the first search there is nothing to maintain: rebuild() will see everything.
+
+@subscribe(ORDER_CREATED)
+@subscribe(ORDER_UPDATED)
+def _on_order_changed(order: dict, **_):
+    with _LOCK:
+        if _BUILT:
+            _put("order", order["id"], order)
+
+
+@subscribe(CUSTOMER_UPDATED)
+def _on_customer_updated(customer_id: str, **_):
+    with _LOCK:
+        if _BUILT:
+            customer = MOCK_CUSTOMER_DB.get(customer_id)
+            if customer is None:
+                _remove(("customer", customer_id))
+            else:
+                _put("customer", customer_id, customer)
+
+
+@subscribe(CUSTOMERS_MERGED)
+def _on_customers_merged(target_id: str, merged_ids: list, **_):
+    with _LOCK:
+        if not _BUILT:
+            return
+        for old_id in merged_ids:
+            _remove(("customer", old_id))
+            # Their orders now carry target_id; find them through the old id's postings
+            for token in _tokens(old_id):
+                for posting in list(_POSTINGS.get(token, ())):
+                    kind, key = _DOCS[posting >> 2]
+                    if kind == "order" and _ALIVE[posting >> 2] and key in MOCK_ORDER_DB:
+                        _put("order", key, MOCK_ORDER_DB[key])
+        if target_id in MOCK_CUSTOMER_DB:
+            _put("customer", target_id, MOCK_CUSTOMER_DB[target_id])
+
+
+@subscribe(STATE_RELOADED)
+def _on_state_reloaded(deleted: dict, **_):
+    with _LOCK:
+        if _BUILT:
+            for kind, collection in (("customer", "customers"), ("order", "orders")):
+                for key in deleted.get(collection, ()):
+                    _remove((kind, key))
+
+
+# --- Searching ---
+
+def _expand(term: str) -> list:
+    """(token, factor) for the tokens a query term matches."""
+    start = bisect.bisect_left(_VOCAB, term)
+    matches = []
+    for token in _VOCAB[start:start + PREFIX_EXPANSIONS]:
+        if not token.startswith(term):
+            break
+        matches.append(token)
+    matches.extend(t for t in _RECENT if t.startswith(term))
+    return [(token, 1.0 if token == term else PREFIX_FACTOR) for token in matches[:PREFIX_EXPANSIONS]]
+
+
+def _score(terms: list, kinds: set) -> np.ndarray:
+    """Score per document number (0 = no match). Views on the postings don't outlive the call."""
+    n = len(_DOCS)
+    live = max(1, n - _DEAD)
+    total = None
+    for term in terms:
+        score = np.zeros(n, dtype=np.float32)
+        for token, factor in _expand(term):
+            postings = np.frombuffer(_POSTINGS[token], dtype=np.int64)
+            docs = postings >> 2
+            weight = FIELD_WEIGHTS[postings & 3] * np.float32(math.log(1 + live / len(postings)) * factor)
+            np.maximum(score[docs], weight, out=weight)
+            score[docs] = weight
+        if total is None:
+            total = score
+        else:
+            total += score
+            total[score == 0] = 0
+    total *= np.frombuffer(_ALIVE, dtype=np.uint8)
+    if set(KINDS) - kinds:
+        total *= np.isin(np.frombuffer(_KIND, dtype=np.uint8), [KINDS.index(k) for k in kinds])
+    return total
+
+
+def _result(kind: str, key, score: float):
+    if kind == "customer":
+        record = MOCK_CUSTOMER_DB.get(key)
+        if record is None:
+            return None
+        return {"type": kind, "id": key, "score": score, "title": record.get("name") or key,
+                "subtitle": " · ".join(v for v in (key, record.get("email")) if v)}
+    if kind == "order":
+        record = MOCK_ORDER_DB.get(key)
+        if record is None:
+            return None
+        items = ", ".join(f"{it.get('quantity', 1)}x {it.get('name') or it.get('item_id')}" for it in record.get("items", []))
+        return {"type": kind, "id": key, "score": score, "title": f"{key} · {record.get('status', '')}",
+                "subtitle": f"{record.get('customer_id', '')} · {items}", "timestamp": record.get("timestamp")}
+    entry = get_feedback_log().read(key)
+    message = entry.get("message") or ""
+    return {"type": kind, "id": entry.get("log_id") or str(key), "score": score,
+            "title": f"{entry.get('sentiment') or 'Neutral'} feedback from {entry.get('user_id', '')}",
+            "subtitle": message if len(message) <= 160 else message[:157] + "...", "timestamp": entry.get("timestamp")}
+
+
+def search(query: str, kinds=None, limit: int = 20, offset: int = 0) -> dict:
+    """{"query", "total", "offset", "limit", "results": [{type, id, score, title, subtitle}]}, best first."""
+    terms = list(dict.fromkeys(_tokens(query)))
+    kinds = set(kinds or KINDS) & set(KINDS)
+    page = {"query": query, "total": 0, "offset": offset, "limit": limit, "results": []}
+    if not terms or not kinds:
+        return page
+    _ensure_current()
+    with _LOCK:
+        total = _score(terms, kinds)
+        candidates = np.flatnonzero(total)
+        page["total"] = len(candidates)
+        if offset >= len(candidates):
+            return page
+        # Newer documents (higher numbers) win ties
+        keys = total[candidates].astype(np.float64) + candidates / (len(_DOCS) + 1) * 1e-3
+        wanted = min(offset + limit, len(candidates))
+        top = np.argpartition(-keys, wanted - 1)[:wanted] if wanted < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-keys[top], kind="stable")][offset:wanted]
+        hits = [(_DOCS[candidates[i]], round(float(total[candidates[i]]), 3)) for i in top]
+    page["results"] = [r for r in (_result(kind, key, score) for (kind, key), score in hits) if r is not None]
+    return page
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    started = time.perf_counter()
+    print(f"Search index rebuilt: {rebuild()} documents in {time.perf_counter() - started:.2f}s")
+    query = " ".join(sys.argv[1:]) or "cupcake"
+    started = time.perf_counter()
+    found = search(query, limit=10)
+    print(f"'{query}': {found['total']} matches in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for r in found["results"]:
+        print(f"  [{r['type']}] {r['title']} - {r['subtitle']} ({r['score']})")
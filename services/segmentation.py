@@ -0,0 +1,512 @@
+# services/segmentation.py
+"""
+Customer segments and the re-engagement campaign job.
+
+    from services.segmentation import segment_counts, segment_members, run_campaigns
+    segment_counts()                  # {"lapsed_14": 120, "lapsed_30": 80, ..., "first_timers": 300}
+    segment_members("lapsed_30")      # customer ids, longest lapsed first
+    run_campaigns()                   # queues the messages that are due, returns how many
+
+Customers are held as numpy columns (last order time, loyalty points, order
+count, has an email, campaign stage reached) plus an index of the rows sorted
+by last order time. Lapsed segments and first-timer follow-ups are contiguous
+slices of that index found by binary search, so a campaign run over hundreds
+of thousands of customers is a few vectorized passes rather than a walk over
+MOCK_CUSTOMER_DB.
+
+Segments (a customer can be in several):
+    lapsed_<N>     last order at least N days ago and less than the next
+                   threshold in SEGMENT_LAPSED_DAYS
+    high_loyalty   loyalty points at CRM_CONFIG.HIGH_LOYALTY_TIER or above
+    first_timers   exactly one order
+
+Campaign stages escalate while a customer stays away: the first-timer
+follow-up (FIRST_TIMER_FOLLOWUP_DAYS after their only order), then one message
+per lapsed threshold. Each stage goes out at most once per last order, so
+ordering again starts over; a customer who is already further along only gets
+the latest stage. High-loyalty customers get the VIP wording.
+
+Messages are sent by services.notifications at its throttled rate and
+recorded in CAMPAIGN_LOG_DIR/campaigns.jsonl: a "queued" entry claims the
+customer's stage when the message is queued, a "sent" entry marks it done once
+the email has gone out, and a "failed" entry drops the claim. A stage that
+was never sent (failed, or queued when the process exited) is due again on
+the next run, after its claim lapses (CLAIM_MS). Workers sharing the data
+(STATE_BACKEND=sqlite) share the log and take turns under a file lock, so a
+customer is queued once however many workers run the job.
+
+Columns are built on first use and kept current from customer and order
+events: changed customers are re-read and re-slotted into the sorted index in
+one batch on the next read.
+
+    python -m services.segmentation           # segment sizes
+    python -m services.segmentation --run     # queue due campaigns once and send them
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per log
+    fcntl = None
+
+import numpy as np
+
+from config import CRM_CONFIG
+from Mock_data.mock_data import DATA_FILE, MOCK_CUSTOMER_DB
+from services.events import subscribe, ORDER_CREATED, ORDER_UPDATED, CUSTOMER_UPDATED, CUSTOMERS_MERGED, STATE_RELOADED
+from services.customer_stats import get_customer_stats
+from services.loyalty_ledger import get_loyalty_ledger
+from services import notifications
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+MS_PER_DAY = 86_400_000
+NO_TIME = np.iinfo(np.int64).min   # never ordered (NaT as int64)
+
+LAPSED_DAYS = sorted(CRM_CONFIG.SEGMENT_LAPSED_DAYS)
+LAPSED = [f"lapsed_{days}" for days in LAPSED_DAYS]
+SEGMENTS = [*LAPSED, "high_loyalty", "first_timers"]
+# Campaign stages in escalation order; a customer's stage code is its index + 1 (0: nothing sent)
+STAGES = ["first_timers", *LAPSED]
+STAGE_CODES = {name: code for code, name in enumerate(STAGES, 1)}
+HIGH_LOYALTY_POINTS = dict(CRM_CONFIG.LOYALTY_TIERS).get(CRM_CONFIG.HIGH_LOYALTY_TIER, 0)
+# A queued message can wait at most a full queue's drain time; after that (plus a run) its claim lapses
+CLAIM_MS = int((CRM_CONFIG.NOTIFY_QUEUE_MAX / CRM_CONFIG.NOTIFY_RATE_PER_SECOND + CRM_CONFIG.CAMPAIGN_INTERVAL_SECONDS) * 1000)
+
+MESSAGES = {
+    "first_timers": (
+        "Thanks for your first order, {name}!",
+        "Hello {name},\n\nThank you for trying Ellas Cupcakery! We hope you loved it. "
+        "Your favourites are ready whenever you fancy another treat.\n\nEllas Cupcakery",
+    ),
+    "lapsed": (
+        "We miss you, {name}!",
+        "Hello {name},\n\nIt's been {days} days since your last treat. The ovens are warm and "
+        "there are new flavours on the menu. Come and say hi!\n\nEllas Cupcakery",
+    ),
+    "lapsed_vip": (
+        "{name}, your {points} loyalty points are waiting",
+        "Hello {name},\n\nIt's been {days} days since your last visit. As one of our most loyal "
+        "customers you have {points} points to spend, so treat yourself!\n\nEllas Cupcakery",
+    ),
+}
+
+_LOCK = threading.RLock()
+_BUILT = False
+_IDS = []          # row -> customer id
+_ROWS = {}         # customer id -> row
+_COL = {}          # column name -> numpy array by row: last, points, orders, email, stage, alive
+_INDEX = {"last": np.empty(0, np.int64), "rows": np.empty(0, np.int64)}   # alive rows sorted by last order
+_STALE = set()     # customer ids to re-read on the next read
+_CONTACTED = {}    # customer id -> (stage code, last order ms it was sent for), from the campaign log
+_CLAIMED = {}      # customer id -> (stage code, last order ms, claim expiry ms) of a message queued, not yet sent
+
+
+def _campaign_dir() -> str:
+    # Next to the data file by default, so scratch datasets get scratch logs
+    return CRM_CONFIG.CAMPAIGN_LOG_DIR or os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "campaigns")
+
+
+def _to_ms(values: list) -> np.ndarray:
+    """ISO timestamps (or None) as int64 ms, parsed in one pass; unreadable ones count as never."""
+    try:
+        return np.array([v or "NaT" for v in values], dtype="datetime64[ms]").astype(np.int64)
+    except ValueError:
+        return np.array([_one_ms(v) for v in values], dtype=np.int64)
+
+
+def _one_ms(value) -> int:
+    try:
+        return int(np.datetime64(value or "NaT", "ms").astype(np.int64))
+    except ValueError:
+        return NO_TIME
+
+
+# --- Campaign log ---
+
+class CampaignLog:
+    """Append-only record of queued and sent campaign messages, one JSON line each."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._offset = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, "campaigns.jsonl")
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+
+    def read(self, from_start: bool = False) -> list:
+        """Entries appended since the last read (all of them with from_start)."""
+        if from_start:
+            self._offset = 0
+        if os.path.getsize(self.path) <= self._offset:
+            return []
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing it
+                    break
+                self._offset += len(line)
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Segmentation: Skipping unreadable campaign log line")
+        return entries
+
+    @contextmanager
+    def writing(self):
+        """Exclusive across threads and processes."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def append(self, entries: list):
+        if not entries:
+            return
+        self._file.write(b"".join(json.dumps(e).encode("utf-8") + b"\n" for e in entries))
+        self._file.flush()
+        # Everything before is already read (the writer caught up under the lock)
+        self._offset = self._file.tell()
+
+
+_LOG = None
+_LOG_LOCK = threading.Lock()
+
+
+def get_campaign_log() -> CampaignLog:
+    global _LOG
+    if _LOG is None:
+        with _LOG_LOCK:
+            if _LOG is None:
+                log = CampaignLog(_campaign_dir())
+                log.open()
+                _LOG = log
+    return _LOG
+
+
+def _apply_log(entries: list):
+    for entry in entries:
+        code = STAGE_CODES.get(entry.get("stage"))
+        customer_id = entry.get("customer_id")
+        if not code or not customer_id:
+            continue
+        last_ms = entry.get("last_order_ms")
+        event = entry.get("event", "sent")
+        if event == "queued":
+            _CLAIMED[customer_id] = (code, last_ms, _one_ms(entry.get("queued_at")) + CLAIM_MS)
+            continue
+        claimed = _CLAIMED.get(customer_id)
+        if claimed and claimed[:2] == (code, last_ms):
+            del _CLAIMED[customer_id]
+        if event != "sent":
+            continue
+        previous = _CONTACTED.get(customer_id)
+        if previous and previous[1] == last_ms and previous[0] >= code:
+            continue
+        _CONTACTED[customer_id] = (code, last_ms)
+        row = _ROWS.get(customer_id)
+        if _BUILT and row is not None and _COL["last"][row] == last_ms:
+            _COL["stage"][row] = max(_COL["stage"][row], code)
+
+
+def _claimed(customer_id: str, code: int, last_ms: int, now_ms: int) -> bool:
+    """True if this stage (or a later one) is already queued for the customer's last order."""
+    claimed = _CLAIMED.get(customer_id)
+    return bool(claimed) and claimed[0] >= code and claimed[1] == last_ms and claimed[2] > now_ms
+
+
+def _contacted_stage(customer_id: str, last_ms: int) -> int:
+    contacted = _CONTACTED.get(customer_id)
+    return contacted[0] if contacted and contacted[1] == last_ms else 0
+
+
+# --- Columns and the sorted index ---
+
+def _columns(customers: list) -> dict:
+    count = len(customers)
+    stats = [get_customer_stats(customer_id) for customer_id, _ in customers]
+    last = _to_ms([c.get("last_order_date") for _, c in customers])
+    return {
+        "last": last,
+        "points": np.fromiter((int(c.get("loyalty_points") or 0) for _, c in customers), np.int64, count),
+        "orders": np.fromiter((s["order_count"] if s else 0 for s in stats), np.int32, count),
+        "email": np.fromiter((bool(c.get("email")) for _, c in customers), bool, count),
+        "stage": np.fromiter((_contacted_stage(cid, ms) for (cid, _), ms in zip(customers, last.tolist())), np.int8, count),
+        "alive": np.ones(count, bool),
+    }
+
+
+def _sort():
+    rows = np.argsort(_COL["last"], kind="stable")
+    rows = rows[_COL["alive"][rows]]
+    _INDEX["rows"] = rows
+    _INDEX["last"] = _COL["last"][rows]
+
+
+def rebuild() -> int:
+    """Recomputes the columns and sorted index from MOCK_CUSTOMER_DB and the campaign log."""
+    global _BUILT
+    # From here on the customer records' loyalty_points mirror the ledger
+    get_loyalty_ledger()
+    log = get_campaign_log()
+    with _LOCK:
+        _BUILT = False
+        _CONTACTED.clear()
+        _CLAIMED.clear()
+        _apply_log(log.read(from_start=True))
+        customers = list(MOCK_CUSTOMER_DB.items())
+        _IDS[:] = [customer_id for customer_id, _ in customers]
+        _ROWS.clear()
+        _ROWS.update((customer_id, row) for row, customer_id in enumerate(_IDS))
+        _COL.update(_columns(customers))
+        _STALE.clear()
+        _sort()
+        _BUILT = True
+    return len(_IDS)
+
+
+def _refresh():
+    """Re-reads customers changed since the last read and moves them in the sorted index."""
+    with _LOCK:
+        if not _STALE:
+            return
+        stale = list(_STALE)
+        _STALE.clear()
+        new = [cid for cid in stale if cid not in _ROWS and cid in MOCK_CUSTOMER_DB]
+        if new:
+            _ROWS.update((cid, row) for row, cid in enumerate(new, len(_IDS)))
+            _IDS.extend(new)
+            for name, column in _COL.items():
+                _COL[name] = np.concatenate([column, np.zeros(len(new), column.dtype)])
+        stale = [cid for cid in stale if cid in _ROWS]
+        rows = np.array([_ROWS[cid] for cid in stale], np.int64)
+        keep = ~np.isin(_INDEX["rows"], rows)
+        _INDEX["rows"], _INDEX["last"] = _INDEX["rows"][keep], _INDEX["last"][keep]
+
+        customers = [(cid, MOCK_CUSTOMER_DB.get(cid)) for cid in stale]
+        present = [(cid, c) for cid, c in customers if c is not None]
+        _COL["alive"][rows] = [c is not None for _, c in customers]
+        if present:
+            present_rows = np.array([_ROWS[cid] for cid, _ in present], np.int64)
+            for name, values in _columns(present).items():
+                _COL[name][present_rows] = values
+            # Merge the re-read customers back in: sort them, then insert at their binary-search positions
+            order = np.argsort(_COL["last"][present_rows], kind="stable")
+            present_rows = present_rows[order]
+            keys = _COL["last"][present_rows]
+            positions = np.searchsorted(_INDEX["last"], keys, side="right")
+            _INDEX["rows"] = np.insert(_INDEX["rows"], positions, present_rows)
+            _INDEX["last"] = np.insert(_INDEX["last"], positions, keys)
+        # Deleted (merged) customers leave dead rows behind; start afresh once they pile up
+        if len(present) < len(customers) and np.count_nonzero(~_COL["alive"]) * 4 > len(_IDS):
+            rebuild()
+
+
+def _ensure_built():
+    if not _BUILT:
+        with _LOCK:
+            if not _BUILT:
+                rebuild()
+    _refresh()
+
+
+# --- Incremental maintenance ---
+# Handlers only note who changed; records are re-read in one batch on the next read.
+
+def _mark(*customer_ids):
+    with _LOCK:
+        if _BUILT:
+            _STALE.update(cid for cid in customer_ids if cid)
+
+
+@subscribe(ORDER_CREATED)
+@subscribe(ORDER_UPDATED)
+def _on_order_changed(order: dict, **_):
+    # Order count and last order date, or points once it's paid
+    _mark(order.get("customer_id"))
+
+
+@subscribe(CUSTOMER_UPDATED)
+def _on_customer_updated(customer_id: str, **_):
+    _mark(customer_id)
+
+
+@subscribe(CUSTOMERS_MERGED)
+def _on_customers_merged(target_id: str, merged_ids: list, **_):
+    _mark(target_id, *merged_ids)
+
+
+@subscribe(STATE_RELOADED)
+def _on_state_reloaded(deleted: dict, **_):
+    _mark(*deleted.get("customers", []))
+
+
+# --- Segments ---
+
+def _now_ms(now: datetime.datetime = None) -> int:
+    return _one_ms((now or datetime.datetime.now()).isoformat())
+
+
+def _lapsed_bounds(now_ms: int) -> list:
+    """[(segment, start, end)] positions in the sorted index, in LAPSED order (the longest lapsed sort first)."""
+    index_last = _INDEX["last"]
+    # Customers who never ordered sort first
+    first = int(np.searchsorted(index_last, NO_TIME, side="right"))
+    ends = np.searchsorted(index_last, [now_ms - days * MS_PER_DAY for days in LAPSED_DAYS], side="right").tolist()
+    starts = ends[1:] + [first]
+    return [(name, max(start, first), end) for name, start, end in zip(LAPSED, starts, ends)]
+
+
+def _segments(now_ms: int) -> dict:
+    segments = {name: _INDEX["rows"][start:end] for name, start, end in _lapsed_bounds(now_ms)}
+    alive = _COL["alive"]
+    segments["high_loyalty"] = np.flatnonzero(alive & (_COL["points"] >= HIGH_LOYALTY_POINTS))
+    segments["first_timers"] = np.flatnonzero(alive & (_COL["orders"] == 1))
+    return segments
+
+
+def segment_counts(now: datetime.datetime = None) -> dict:
+    _ensure_built()
+    with _LOCK:
+        return {name: len(rows) for name, rows in _segments(_now_ms(now)).items()}
+
+
+def segment_members(segment: str, limit: int = 100, now: datetime.datetime = None) -> list:
+    """Customer ids in a segment; lapsed segments longest lapsed first."""
+    if segment not in SEGMENTS:
+        raise ValueError(f"Unknown segment {segment!r}; expected one of {', '.join(SEGMENTS)}")
+    _ensure_built()
+    with _LOCK:
+        rows = _segments(_now_ms(now))[segment][:limit]
+        return [_IDS[row] for row in rows.tolist()]
+
+
+# --- Campaigns ---
+
+def _due(now_ms: int):
+    """(rows, stage codes) of customers with an email whose campaign stage is ahead of what they were sent."""
+    index_last = _INDEX["last"]
+    first = int(np.searchsorted(index_last, NO_TIME, side="right"))
+    end = int(np.searchsorted(index_last, now_ms - CRM_CONFIG.FIRST_TIMER_FOLLOWUP_DAYS * MS_PER_DAY, side="right"))
+    rows, last = _INDEX["rows"][first:end], index_last[first:end]
+    stage = np.zeros(len(rows), np.int8)
+    stage[_COL["orders"][rows] == 1] = STAGE_CODES["first_timers"]
+    for name, days in zip(LAPSED, LAPSED_DAYS):
+        stage[last <= now_ms - days * MS_PER_DAY] = STAGE_CODES[name]
+    due = (stage > _COL["stage"][rows]) & _COL["email"][rows]
+    return rows[due], stage[due]
+
+
+def _message(stage: str, customer: dict, days: int) -> tuple:
+    points = int(customer.get("loyalty_points") or 0)
+    template = stage
+    if stage != "first_timers":
+        template = "lapsed_vip" if points >= HIGH_LOYALTY_POINTS else "lapsed"
+    subject, body = MESSAGES[template]
+    fields = {"name": customer.get("name") or "there", "days": days, "points": points}
+    return subject.format(**fields), body.format(**fields)
+
+
+def _record(entries: list):
+    """Appends entries to the campaign log and applies them, after catching up with other workers."""
+    log = get_campaign_log()
+    with log.writing():
+        with _LOCK:
+            _apply_log(log.read())
+            _apply_log(entries)
+        log.append(entries)
+
+
+def _on_sent(entry: dict):
+    """on_done for a queued message: marks its stage sent, or drops the claim so the next run retries it."""
+    def done(sent: bool):
+        _record([{**entry, "event": "sent" if sent else "failed", "done_at": datetime.datetime.now().isoformat()}])
+    return done
+
+
+def run_campaigns(now: datetime.datetime = None) -> int:
+    """Queues every due campaign message on the throttled sender. Returns how many were queued."""
+    now = now or datetime.datetime.now()
+    now_ms = _now_ms(now)
+    log = get_campaign_log()
+    entries = []
+    with log.writing():
+        _ensure_built()
+        with _LOCK:
+            # Other workers' runs and sends since ours
+            _apply_log(log.read())
+            rows, stages = _due(now_ms)
+            due = [(_IDS[row], int(_COL["last"][row]), code) for row, code in zip(rows.tolist(), stages.tolist())]
+            due = [(customer_id, last_ms, code) for customer_id, last_ms, code in due if not _claimed(customer_id, code, last_ms, now_ms)]
+        for customer_id, last_ms, code in due:
+            customer = MOCK_CUSTOMER_DB.get(customer_id)
+            if not customer or not customer.get("email"):
+                continue
+            stage = STAGES[code - 1]
+            subject, body = _message(stage, customer, (now_ms - last_ms) // MS_PER_DAY)
+            entry = {"customer_id": customer_id, "stage": stage, "last_order_ms": last_ms, "queued_at": now.isoformat()}
+            # The sender reports back through _record, which waits for this run to release the log
+            with _LOCK:
+                _apply_log([{**entry, "event": "queued"}])
+            if not notifications.enqueue(customer["email"], subject, body, campaign=stage, on_done=_on_sent(entry)):
+                with _LOCK:
+                    _CLAIMED.pop(customer_id, None)
+                logger.warning("Segmentation: Notification queue is full; %s messages left for the next run", len(due) - len(entries))
+                break
+            entries.append({**entry, "event": "queued"})
+        log.append(entries)
+    if entries:
+        logger.info("Segmentation: Queued %s campaign messages", len(entries))
+    return len(entries)
+
+
+def _scheduler(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            run_campaigns()
+        except Exception as e:
+            logger.exception("Segmentation: campaign run failed: %s", e)
+
+
+_SCHEDULER_STARTED = False
+
+
+def start_scheduler():
+    """Background thread running the campaign job every CAMPAIGN_INTERVAL_SECONDS."""
+    global _SCHEDULER_STARTED
+    with _LOCK:
+        if _SCHEDULER_STARTED:
+            return
+        _SCHEDULER_STARTED = True
+    threading.Thread(target=_scheduler, args=(CRM_CONFIG.CAMPAIGN_INTERVAL_SECONDS,), name="campaign-scheduler", daemon=True).start()
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(f"Segments rebuilt for {rebuild()} customers.")
+    for name, count in segment_counts().items():
+        print(f"{name}: {count}")
+    if "--run" in sys.argv:
+        print(f"Queued {run_campaigns()} campaign messages; sending...")
+        notifications.drain()
@@ -0,0 +1,110 @@
+# services/shared_state.py
+"""
+Keeps this process in step with the other workers (STATE_BACKEND=sqlite).
+
+    sync()                       # start of every request (api middleware)
+    with transaction(): ...      # read-check-write sections: ordering, payments, dashboard edits
+    @transactional               # the same, as a decorator
+
+Changes committed by other processes are applied to the in-memory collections
+by Mock_data.state_store and published here as the events local code
+publishes: ORDER_CREATED / ORDER_UPDATED for orders, CUSTOMER_UPDATED,
+MENU_UPDATED and PROMOS_UPDATED, then STATE_RELOADED listing everything that
+changed.
+
+With the default json backend there is one process and these are no-ops.
+
+Derived views rebuilt from MOCK_ORDER_DB also see orders whose ORDER_CREATED
+is still on its way (stored by ProcessOrder or pulled, not yet published);
+orders_in_flight() names them so the view can skip their event.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+
+from Mock_data.mock_data import COLLECTIONS, STATE_STORE
+from services.events import publish, ORDER_CREATED, ORDER_UPDATED, CUSTOMER_UPDATED, MENU_UPDATED, PROMOS_UPDATED, STATE_RELOADED
+
+
+_IN_FLIGHT = set()      # ids of orders in MOCK_ORDER_DB whose ORDER_CREATED hasn't been published
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def order_stored(order_id: str):
+    """Call before a new order goes into MOCK_ORDER_DB; order_published() once its ORDER_CREATED is out."""
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT.add(order_id)
+
+
+def order_published(order_id: str):
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT.discard(order_id)
+
+
+def orders_in_flight() -> set:
+    """Orders already in MOCK_ORDER_DB whose ORDER_CREATED is still to come.
+
+    A view rebuilt from MOCK_ORDER_DB reads this after taking its snapshot:
+    the snapshot orders listed here get counted twice unless their event is skipped.
+    """
+    with _IN_FLIGHT_LOCK:
+        pulled = STATE_STORE.pending_new("orders") if STATE_STORE is not None else set()
+        return pulled | _IN_FLIGHT
+
+
+def _drain() -> list:
+    # Drained orders move to _IN_FLIGHT in the same step, so orders_in_flight() never misses one
+    with _IN_FLIGHT_LOCK:
+        changes = STATE_STORE.drain()
+        _IN_FLIGHT.update(rid for collection, rid, record, previous in changes
+                          if collection == "orders" and record is not None and previous is None)
+    return changes
+
+
+def _publish(changes: list):
+    if not changes:
+        return
+    changed, deleted = {}, {}
+    for collection, record_id, record, previous in changes:
+        (deleted if record is None else changed).setdefault(collection, []).append(record_id)
+        if collection == "orders" and record is not None:
+            if previous is None:
+                publish(ORDER_CREATED, order=record)
+                order_published(record_id)
+            else:
+                publish(ORDER_UPDATED, order=record, changes={k: record.get(k) for k in previous}, previous=previous)
+        elif collection == "customers" and record is not None:
+            publish(CUSTOMER_UPDATED, customer_id=record_id)
+        elif collection == "menu":
+            publish(MENU_UPDATED, item_id=record_id)
+        elif collection == "promos":
+            publish(PROMOS_UPDATED, promo_id=record_id)
+    publish(STATE_RELOADED, changed=changed, deleted=deleted)
+
+
+def sync():
+    """Applies and publishes other workers' changes. Skipped while this process is mid-transaction
+    (the transaction pulls them itself), so it never blocks a request."""
+    if STATE_STORE is None:
+        return
+    STATE_STORE.pull(COLLECTIONS, blocking=False)
+    _publish(_drain())
+
+
+@contextmanager
+def transaction():
+    """Runs the block holding the shared store's write lock, with every other worker's changes applied."""
+    if STATE_STORE is None:
+        yield
+        return
+    with STATE_STORE.transaction(COLLECTIONS):
+        _publish(_drain())
+        yield
+
+
+def transactional(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with transaction():
+            return func(*args, **kwargs)
+    return wrapper
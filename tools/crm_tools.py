@@ -1,10 +1,22 @@
 # tools/crm_tools.py
 from langchain.tools import tool
-from Mock_data.mock_data import MOCK_CUSTOMER_DB, MOCK_MENU_DB, MOCK_ORDER_DB, MOCK_PROMO_DB, MOCK_FEEDBACK_LOG, persist_changes
-import uuid
+from config import CRM_CONFIG
+from Mock_data.mock_data import MOCK_CUSTOMER_DB, MOCK_MENU_DB, MOCK_ORDER_DB, persist_changes
+from services.events import publish, ORDER_CREATED, ORDER_UPDATED, CUSTOMER_UPDATED
+from services.shared_state import transactional, order_stored, order_published
+from services.recommendations import recommend
+from services.promotions import best_promotion, eligible_promotions, iter_promos
+from services.ids import new_id, normalize_id
+from services.feedback_log import append_feedback
+from services.loyalty_ledger import balance as loyalty_balance
+from services.inventory import available, reserve, release, start_reservation, apply_order_change
+from services import delivery_slots
+from services.logger import get_logger
 import datetime
 from typing import List, Dict, Optional
 
+logger = get_logger(__name__)
+
 # --- CORE RETRIEVAL TOOLS ---
 
 @tool
@@ -16,7 +28,8 @@ def GetCustomerProfile(user_id: str) -> dict:
     if not customer_data:
         # DO NOT RETURN NEW USER HERE. Just return empty/not found to let the agent decide.
         return {} 
-    return customer_data
+    # Points come from the loyalty ledger; the record only carries a copy
+    return {**customer_data, "loyalty_points": loyalty_balance(user_id)}
 
 @tool
 def GetMenuAndPrice(query: str = "") -> list[dict]:
@@ -34,6 +47,9 @@ def GetMenuAndPrice(query: str = "") -> list[dict]:
     for item_id, item_data in MOCK_MENU_DB.items():
         if not item_data['is_available']:
             continue
+        stock_left = available(item_id)  # None = not stock-tracked
+        if stock_left == 0:
+            continue
             
         if return_all:
             match = True
@@ -49,6 +65,8 @@ def GetMenuAndPrice(query: str = "") -> list[dict]:
                 "is_available": item_data['is_available'],
                 "ingredients": item_data['ingredients']
             })
+            if stock_left is not None:
+                results[-1]["stock_left"] = stock_left
             
     return results if results else [{"message": f"No products found matching '{query}'."}]
 
@@ -57,7 +75,7 @@ def UpdateDeliveryStatus(order_id: str) -> dict:
     """
     Checks the current delivery status of a submitted order.
     """
-    order_data = MOCK_ORDER_DB.get(order_id)
+    order_data = MOCK_ORDER_DB.get(order_id) or MOCK_ORDER_DB.get(normalize_id(order_id))
     if not order_data:
         return {"error": f"Order ID '{order_id}' not found. Please check your ID."}
     
@@ -71,10 +89,13 @@ def UpdateDeliveryStatus(order_id: str) -> dict:
 # --- ACTION & PROACTIVE TOOLS ---
 
 @tool
-def ProcessOrder(user_id: str, items: list[dict]) -> dict:
+@transactional
+def ProcessOrder(user_id: str, items: list[dict], delivery_window: str = "") -> dict:
     """
     Creates a new order record. 
     Required: 'items' list with 'item_id'.
+    Optional: 'delivery_window' as returned by GetDeliveryTimes (e.g. "12:00–14:00" or "2026-10-20 12:00–14:00");
+    the earliest window with room is booked otherwise.
     Note: Payment is NOT processed here. It is marked as 'Pending Payment'.
     """
     if user_id == "9012345678":
@@ -115,7 +136,7 @@ def ProcessOrder(user_id: str, items: list[dict]) -> dict:
                  return {"error": f"Item '{item.get('name')}' not found in menu. Please check the name."}
 
         menu_item = MOCK_MENU_DB.get(item_id)
-        quantity = item.get('quantity', 1)
+        quantity = int(item.get('quantity', 1))
         
         if not menu_item['is_available']:
             return {"error": f"Item {menu_item['name']} is currently Out of Stock."}
@@ -131,56 +152,104 @@ def ProcessOrder(user_id: str, items: list[dict]) -> dict:
     if not processed_items:
         return {"error": "No valid items were identified. Please specify the exact menu item name (e.g., 'Red Velvet Cupcake')."}
 
-    import time
-    new_order_id = f"O-{int(time.time())}" # Use O-Timestamp format consistently
+    # Apply the best eligible promotion (promos don't stack)
+    subtotal = total_price
+    cart = {
+        "subtotal": subtotal,
+        "items": [{"item_id": it["item_id"], "quantity": it["quantity"], "price": it["price_at_order"]} for it in processed_items]
+    }
+    promo = best_promotion(MOCK_CUSTOMER_DB.get(user_id) or {"id": user_id}, cart)
+    discount = promo["discount"] if promo else 0.0
+    total_price = subtotal - discount
+
+    new_order_id = new_id("O") # Time-sortable, unique even for many orders per second
     current_time = datetime.datetime.now().isoformat()
+
+    # Hold the stock before the order exists, so concurrent orders can't oversell
+    stock_error = reserve(new_order_id, processed_items)
+    if stock_error:
+        return {"error": stock_error}
     
-    new_order = {
-        "id": new_order_id,
-        "customer_id": user_id,
-        "items": processed_items,
-        "status": "Pending Payment", 
-        "payment_status": "Unpaid",
-        "timestamp": current_time,
-        "total": total_price
-    }
+    try:
+        new_order = {
+            "id": new_order_id,
+            "customer_id": user_id,
+            "items": processed_items,
+            "status": "Pending Payment", 
+            "payment_status": "Unpaid",
+            "timestamp": current_time,
+            "subtotal": subtotal,
+            "discount": discount,
+            "promo_id": promo["promo"].get("id") if promo else None,
+            "total": total_price
+        }
+        if promo and promo["free_item"]:
+            new_order["free_item"] = promo["free_item"]
+
+        slot_error = delivery_slots.book(new_order, delivery_window)
+        if slot_error:
+            release({"id": new_order_id})
+            return {"error": slot_error}
+        start_reservation(new_order)
     
-    MOCK_ORDER_DB[new_order_id] = new_order
+        order_stored(new_order_id)
+        MOCK_ORDER_DB[new_order_id] = new_order
     
-    # Check if we need to update customer profile (e.g. last order date)
-    if user_id not in MOCK_CUSTOMER_DB:
-        # Create a new profile for this implicit user so we can track the order date
-        MOCK_CUSTOMER_DB[user_id] = {
-            "id": user_id,
-            "name": "New Customer", 
-            "email": "",
-            "preferences": [],
-            "loyalty_points": 0,
-            "last_order_date": current_time, # Store full ISO timestamp for better sorting
-            "is_first_time": True
-        }
-    else:
-        # Update existing user
-        MOCK_CUSTOMER_DB[user_id]['last_order_date'] = current_time
-        MOCK_CUSTOMER_DB[user_id]['is_first_time'] = False
+        # Check if we need to update customer profile (e.g. last order date)
+        if user_id not in MOCK_CUSTOMER_DB:
+            # Create a new profile for this implicit user so we can track the order date
+            MOCK_CUSTOMER_DB[user_id] = {
+                "id": user_id,
+                "name": "New Customer", 
+                "email": "",
+                "preferences": [],
+                "loyalty_points": 0,
+                "last_order_date": current_time, # Store full ISO timestamp for better sorting
+                "is_first_time": True
+            }
+        else:
+            # Update existing user
+            MOCK_CUSTOMER_DB[user_id]['last_order_date'] = current_time
+            MOCK_CUSTOMER_DB[user_id]['is_first_time'] = False
         
-    # NOTE: Loyalty points are now awarded ONLY when payment is confirmed in the admin dashboard.
+        # NOTE: Loyalty points are now awarded ONLY when payment is confirmed in the admin dashboard.
     
-    persist_changes() # Save to disk
+        persist_changes() # Save to disk
+    except Exception:
+        # Nothing gets stored: hand the held stock back instead of leaving it reserved until expiry
+        MOCK_ORDER_DB.pop(new_order_id, None)
+        order_published(new_order_id)
+        release({"id": new_order_id})
+        delivery_slots.release(new_order_id)
+        raise
+    publish(ORDER_CREATED, order=new_order)
+    order_published(new_order_id)
+    publish(CUSTOMER_UPDATED, customer_id=user_id)
     
     # --- EMAIL HOOK (Simulated) ---
-    print(f"📧 [SMTP] Sending New Order Notification to ella@cupcakery.com for Order {new_order_id}...")
+    logger.info("[SMTP] Sending New Order Notification to ella@cupcakery.com for Order %s...", new_order_id)
     # real SMTP code would go here:
     # send_email("ella@cupcakery.com", "New Order Received", f"Order {new_order_id} needs attention.")
     
-    print(f"DEBUG: ProcessOrder execution successful. Order {new_order_id} created for {user_id}. Total: {total_price}")
+    logger.info("ProcessOrder execution successful. Order %s created for %s. Total: %s", new_order_id, user_id, total_price)
+
+    promo_note = ""
+    if promo:
+        promo_name = promo["promo"].get("name", "Promotion")
+        if discount:
+            promo_note = f" {promo_name} applied: -₦{discount:,.2f}."
+        elif promo["free_item"]:
+            promo_note = f" {promo_name}: a free {promo['free_item']} is included."
+    delivery_note = f" Delivery: {delivery_slots.slot_label(new_order['delivery_slot'])}."
 
     return {
         "message": "Order Placed Successfully.",
         "order_id": new_order_id,
         "total_price": f"₦{total_price:,.2f}",
+        "discount": f"₦{discount:,.2f}",
         "status": "Pending Payment",
-        "instruction": f"The price of this order is ₦{total_price:,.2f}. Please kindly make payment to: {{bank_details}}. Your order will be created upon payment confirmation. Order ID: {new_order_id}."
+        "delivery_slot": new_order["delivery_slot"],
+        "instruction": f"The price of this order is ₦{total_price:,.2f}.{promo_note}{delivery_note} Please kindly make payment to: {{bank_details}}. Your order will be created upon payment confirmation. Order ID: {new_order_id}."
     }
 
 @tool
@@ -188,7 +257,7 @@ def LogFeedbackAndComplaint(user_id: str, message: str, sentiment: str = "Neutra
     """
     Logs customer feedback.
     """
-    log_id = f"L-{str(uuid.uuid4())[:4]}"
+    log_id = new_id("L")
     log_entry = {
         "log_id": log_id,
         "timestamp": datetime.datetime.now().isoformat(),
@@ -197,53 +266,49 @@ def LogFeedbackAndComplaint(user_id: str, message: str, sentiment: str = "Neutra
         "sentiment": sentiment
     }
     
-    MOCK_FEEDBACK_LOG.append(log_entry)
-    persist_changes()
+    append_feedback(log_entry)  # one appended line, not a data.json rewrite
     
-    if sentiment.lower() in ["crisis", "negative"]:
-        print(f"🚨 ALERT: Negative Feedback from {user_id}: {message}")
+    if sentiment.lower() in CRM_CONFIG.CRITICAL_SENTIMENT:
+        logger.warning("ALERT: Negative Feedback from %s: %s", user_id, message)
         
     return {"confirmation": "Feedback logged successfully."}
 
 @tool
-def SuggestPersonalizedMeal(customer_preferences: List[str], last_order_date: str) -> dict:
+def SuggestPersonalizedMeal(customer_preferences: List[str], last_order_date: str, user_id: str = "") -> dict:
     """
     Suggests a highly personalized and available pastry based on customer 
     preferences and order history.
     """
-    target_preference = next((p for p in customer_preferences if p in ["Chocolate", "Vegan", "No Nuts"]), None)
-    
-    suggestion = None
-    for item_id, item_data in MOCK_MENU_DB.items():
-        if target_preference and target_preference in item_data['ingredients'] and item_data['is_available']:
-            suggestion = item_data
-            break
+    suggestions = recommend(user_id, customer_preferences, k=3)
 
-    if suggestion:
-        reasoning = f"Based on your love for {target_preference} pastries, we recommend our {suggestion['name']} (₦{suggestion['price']:,.2f})."
-        return {"suggestion_name": suggestion['name'], "reasoning": reasoning}
+    if suggestions:
+        top = suggestions[0]
+        reasoning = f"We recommend our {top['name']} (₦{top['price']:,.2f}): {'; '.join(top['reasons'])}."
+        return {"suggestion_name": top['name'], "reasoning": reasoning, "suggestions": suggestions}
     
-    return {"suggestion_name": "General Recommendation", "reasoning": "We recommend checking out our current best-seller: Red Velvet Cupcake."}
+    return {"suggestion_name": "General Recommendation", "reasoning": "Nothing on the menu matches right now. Please check back soon!"}
 
 @tool
-def SearchPromotions(customer_preferences: List[str] = None) -> list[dict]:
+def SearchPromotions(customer_preferences: List[str] = None, user_id: str = "") -> list[dict]:
     """
     Searches for and returns active promotions, optionally filtering them 
     based on customer preferences for targeted deals.
     """
-    active_promos = [p for p in MOCK_PROMO_DB if p['active']]
-    
-    if not customer_preferences:
-        return active_promos
+    if not customer_preferences and not user_id:
+        return [p for p in iter_promos() if p.get('active')]
 
+    customer = MOCK_CUSTOMER_DB.get(user_id) or {"id": user_id, "preferences": []}
     targeted_promos = []
-    for promo in active_promos:
-        if any(tag in customer_preferences for tag in promo.get('target_tags', [])):
-            targeted_promos.append(promo)
+    for entry in eligible_promotions(customer, extra_tags=customer_preferences):
+        promo = {k: v for k, v in entry["promo"].items() if k not in ("rules", "target_tags")}
+        if entry["conditions"]:
+            promo["conditions"] = entry["conditions"]
+        targeted_promos.append(promo)
             
     return targeted_promos if targeted_promos else [{"message": "No targeted promotions currently available."}]
 
 @tool
+@transactional
 def UpdateCustomerProfile(user_id: str, name: str = None, email: str = None) -> dict:
     """
     Updates the customer's profile with new information (name or email) provided in the chat.
@@ -267,6 +332,7 @@ def UpdateCustomerProfile(user_id: str, name: str = None, email: str = None) ->
             MOCK_CUSTOMER_DB[user_id]["email"] = email
             
     persist_changes()
+    publish(CUSTOMER_UPDATED, customer_id=user_id)
     
     updated_profile = MOCK_CUSTOMER_DB[user_id]
     return {
@@ -278,6 +344,7 @@ def UpdateCustomerProfile(user_id: str, name: str = None, email: str = None) ->
     }
 
 @tool
+@transactional
 def NotifyPaymentMade(user_id: str) -> dict:
     """
     Notifies the vendor that the customer claims to have made a payment.
@@ -294,25 +361,35 @@ def NotifyPaymentMade(user_id: str) -> dict:
             break
             
     if active_order_id:
-        MOCK_ORDER_DB[active_order_id]['payment_status'] = 'Customer Claimed Paid'
+        order = MOCK_ORDER_DB[active_order_id]
+        previous = {"payment_status": order.get('payment_status')}
+        order['payment_status'] = 'Customer Claimed Paid'
+        apply_order_change(order, previous)  # a claimed order keeps its stock until confirmed
         persist_changes()
+        publish(ORDER_UPDATED, order=order, changes={"payment_status": 'Customer Claimed Paid'}, previous=previous)
         return {"message": "Vendor notified of payment. Please wait for confirmation."}
         
     return {"message": "No pending payment order found to notify."}
 
 @tool
-def GetDeliveryTimes() -> dict:
+def GetDeliveryTimes(date: str = "") -> dict:
     """
-    Returns available delivery windows for the day.
+    Returns delivery windows that still have room, for the given date (YYYY-MM-DD)
+    or the first day with availability.
     """
+    days = delivery_slots.availability()
+    if date:
+        days = [d for d in days if d["date"] == date.strip()]
+    cutoff = delivery_slots.setting("delivery_same_day_cutoff")
+    if not days:
+        return {"windows": [], "note": f"No delivery windows available{' on ' + date if date else ''}. Please try another day."}
+    day = days[0]
     return {
-        "windows": [
-            "10:00–12:00",
-            "12:00–14:00",
-            "14:00–16:00",
-            "16:00–18:00"
-        ],
-        "note": "Same-day delivery for orders confirmed before 12:00."
+        "date": day["date"],
+        "windows": list(day["windows"]),
+        "remaining": day["windows"],
+        "note": f"Windows for {delivery_slots.day_label(day['date'])}. "
+                f"Same-day delivery for orders confirmed before {cutoff}."
     }
 
 # Package all tools for the LangGraph
@@ -6,6 +6,7 @@ class AgentState(TypedDict):
     user_id: str
     input_query: str
     chat_history: List[BaseMessage]
+    history_summary: str  # Rolling summary of turns older than chat_history
     customer_profile: Dict[str, Any]
     tools_to_run: List[Dict[str, Any]]
     tool_output: List[Any]  # Can be list of strings or JSON structures
@@ -1,5 +1,6 @@
 from langgraph.graph import StateGraph, END
 from workflows.agent_state import AgentState
+from services.metrics import traced_node
 from agents.agent_core import (
     identify_user_node,
     intent_classifier_node,
@@ -29,11 +30,11 @@ def build_crm_graph(llm_client):
     """
     workflow = StateGraph(AgentState)
 
-    # 1. Add Nodes
-    workflow.add_node("identify_user", identify_user_node)
-    workflow.add_node("intent_classifier", intent_classifier_node)
-    workflow.add_node("tool_executor", tool_executor_node)
-    workflow.add_node("response_generator", response_generator_node)
+    # 1. Add Nodes (each one is timed as a stage, see services.metrics)
+    workflow.add_node("identify_user", traced_node("identify_user", identify_user_node))
+    workflow.add_node("intent_classifier", traced_node("intent_classifier", intent_classifier_node))
+    workflow.add_node("tool_executor", traced_node("tool_executor", tool_executor_node))
+    workflow.add_node("response_generator", traced_node("response_generator", response_generator_node))
 
     # 2. Add Edges (The Flow)
     